@@ -17,6 +17,9 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from LibraryProject import instrumentation
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', instrumentation.metrics, name='metrics'),
 ]
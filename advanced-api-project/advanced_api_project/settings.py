@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'advanced_api_project.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -130,4 +131,10 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',  # This FIXES the template error
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    # list errors as {index: errors} for the failing items only
+    'LIST_SERIALIZER_ERRORS_AS_DICT': True,
 }
+
+# Books nested in each author by the author API with ?expand=books (newest
+# first); book_count always counts them all
+API_AUTHOR_BOOKS_LIMIT = 10
@@ -0,0 +1,135 @@
+import contextlib
+import io
+import json
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.models import Author, Book
+from api.renderers import FastJSONRenderer
+from api.serializers import BookSerializer, book_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the book endpoints in a throwaway test database. "write" '
+        'creates and then updates --books books one request per book '
+        '(books/create/, books/update/<pk>/) and in one request '
+        '(books/bulk/create/, books/bulk/update/). "serialize" turns --books '
+        'books into JSON with BookSerializer and JSONRenderer, then with the '
+        'values_list() path and FastJSONRenderer the list view uses. Both '
+        'report time, queries and books per second.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmark', choices=('write', 'serialize'))
+        parser.add_argument('--books', type=int, default=2000, help='Books to write per run.')
+        parser.add_argument('--authors', type=int, default=50, help='Authors the books are spread over.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # the test client sends Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = getattr(self, options['benchmark'])(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+            return
+        self.stdout.write(f"{'':14} {'books':>7} {'seconds':>9} {'queries':>8} {'books/s':>10}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:14} {r['books']:7d} {r['seconds']:9.3f} {r['queries']:8d} {r['books_per_s']:10.1f}"
+            )
+
+    def write(self, options):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('benchmark'))
+        authors = Author.objects.bulk_create(Author(name=f'Author {i}') for i in range(options['authors']))
+
+        def books(suffix):
+            return [
+                {'title': f'Book {i} {suffix}', 'publication_year': 1900 + i % 120, 'author': authors[i % len(authors)].pk}
+                for i in range(options['books'])
+            ]
+
+        def single_create():
+            for book in books('single'):
+                client.post(reverse('book-create'), book, format='json')
+
+        def single_update():
+            for book, pk in zip(books('single, updated'), Book.objects.values_list('pk', flat=True)):
+                client.put(reverse('book-update', kwargs={'pk': pk}), book, format='json')
+
+        def bulk_create():
+            client.post(reverse('book-bulk-create'), books('bulk'), format='json')
+
+        def bulk_update():
+            updates = [
+                {**book, 'id': pk}
+                for book, pk in zip(books('bulk, updated'), Book.objects.values_list('pk', flat=True))
+            ]
+            client.put(reverse('book-bulk-update'), updates, format='json')
+
+        def reset(name):
+            if name == 'bulk create':
+                Book.objects.all().delete()
+
+        return self.measure(options, [
+            ('single create', single_create), ('single update', single_update),
+            ('bulk create', bulk_create), ('bulk update', bulk_update),
+        ], reset)
+
+    def serialize(self, options):
+        authors = Author.objects.bulk_create(Author(name=f'Author {i}') for i in range(options['authors']))
+        Book.objects.bulk_create(
+            (
+                Book(title=f'Book {i}', publication_year=1900 + i % 120, author=authors[i % len(authors)])
+                for i in range(options['books'])
+            ),
+            batch_size=1000,
+        )
+        queryset = Book.objects.order_by('title', 'id')
+
+        def serializer():
+            JSONRenderer().render(BookSerializer(queryset, many=True).data)
+
+        def values_list():
+            FastJSONRenderer().render(book_rows.rows(queryset.values_list(*book_rows.columns)))
+
+        return self.measure(options, [('serializer', serializer), ('values_list', values_list)])
+
+    def measure(self, options, runs, reset=None):
+        results = {}
+        for name, run in runs:
+            if reset is not None:
+                reset(name)
+            queries = []
+
+            def count(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            # the single-item views print every book they save
+            with contextlib.redirect_stdout(io.StringIO()), connection.execute_wrapper(count):
+                started = time.perf_counter()
+                run()
+                seconds = time.perf_counter() - started
+            results[name] = {
+                'books': options['books'],
+                'seconds': seconds,
+                'queries': len(queries),
+                'books_per_s': options['books'] / seconds,
+            }
+        return results
@@ -0,0 +1,166 @@
+"""
+Keyset (cursor) pagination for the book list.
+
+DRF's ``CursorPagination`` keeps only the first ordering field in its
+cursor, skips ties with an OFFSET, and cannot read a related field such as
+``author__name``. ``KeysetCursorPagination`` orders by the ``?ordering``
+the view's ``OrderingFilter`` accepts, plus ``id`` to break ties. Its
+cursor holds every value of the last row seen, and the next page is
+selected with a WHERE clause on them. Rows do not skip or repeat while
+others are added, and a deep page costs the same as the first. The rows
+may be model instances or ``values_list(..., named=True)`` rows that
+include the ordering fields.
+
+No COUNT(*) is run. With ``?count=estimate`` the response carries an
+``X-Estimated-Count`` header. On PostgreSQL it is the planner's row
+estimate; elsewhere it is an exact count that stops at ``count_cap`` rows
+(``"10000+"``).
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def model_field(model, path):
+    """The model field a lookup path such as ``author__name`` ends on."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+
+class KeysetCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('id',)
+    count_query_param = 'count'
+    count_cap = 10000
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view))
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param) == 'estimate':
+            self.estimated_count = self.estimate_count(queryset)
+
+        reverse, position = self.decode_cursor(request, queryset.model) or (False, None)
+        related = {field.rsplit('__', 1)[0] for field in self.fields if '__' in field}
+        if related and not queryset.query.values_select:
+            # the cursor is read from the last row
+            queryset = queryset.select_related(*related)
+        if position is not None:
+            queryset = queryset.filter(self.after(position, forwards=not reverse))
+        queryset = queryset.order_by(*(_reverse_ordering(self.ordering) if reverse else self.ordering))
+
+        # one extra row tells whether there is another page
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+        self.has_next = has_more or (reverse and position is not None)
+        self.has_previous = position is not None and (has_more or not reverse)
+        return self.page
+
+    def after(self, position, forwards):
+        # (a, -b, id) after (x, y, z): a > x OR (a = x AND b < y) OR (a = x AND b = y AND id > z),
+        # with a >= x in front so the database can seek into an index on a
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            lookup = 'lt' if self.ordering[i].startswith('-') == forwards else 'gt'
+            term = Q(**{f'{field}__{lookup}': position[i]})
+            for previous, value in zip(self.fields[:i], position[:i]):
+                term &= Q(**{previous: value})
+            condition |= term
+        lookup = 'lt' if self.ordering[0].startswith('-') == forwards else 'gt'
+        return Q(**{f'{self.fields[0]}__{lookup}e': position[0]}) & condition
+
+    def position(self, row):
+        """The ordering values of a model instance or a named values_list() row."""
+        values = []
+        for field in self.fields:
+            if hasattr(row, field):
+                values.append(getattr(row, field))
+                continue
+            value = row
+            for name in field.split('__'):
+                value = getattr(value, name)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, row, reverse=False):
+        payload = json.dumps([self.ordering, reverse, self.position(row)], default=str)
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            ordering, reverse, position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if ordering != self.ordering or len(position) != len(self.fields):
+                raise ValueError('The cursor is for another ordering.')
+            position = [model_field(model, field).to_python(value) for field, value in zip(self.fields, position)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def estimate_count(self, queryset):
+        queryset = queryset.order_by()
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            try:
+                sql, params = queryset.query.sql_with_params()
+            except EmptyResultSet:
+                return '0'
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return str(plan[0]['Plan']['Plan Rows'])
+        count = queryset[:self.count_cap + 1].count()
+        return f'{self.count_cap}+' if count > self.count_cap else str(count)
+
+    def get_paginated_response(self, data):
+        response = Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+        if self.estimated_count is not None:
+            response['X-Estimated-Count'] = self.estimated_count
+        return response
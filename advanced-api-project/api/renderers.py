@@ -0,0 +1,103 @@
+"""
+Renderers for the read and export endpoints.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    ``JSONRenderer`` through orjson when it is installed, for the same
+    compact UTF-8 output several times faster. Types orjson does not know
+    (lazy strings, Decimal, ...) go through DRF's encoder. Indented output,
+    ASCII-only output and a missing orjson fall back to ``JSONRenderer``.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=self.encoder_class().default)
+        # escaped like JSONRenderer does, so the output stays a JavaScript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def dumps(data):
+    """Compact UTF-8 JSON, through orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=JSONEncoder().default)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def batches(items, size):
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    One JSON document per line. ``stream`` yields the output in chunks of
+    ``batch_size`` items for a StreamingHttpResponse.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+    batch_size = 1000
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.stream(data if isinstance(data, list) else [data]))
+
+    def stream(self, items, fields=None):
+        for batch in batches(items, self.batch_size):
+            yield b''.join(dumps(item) + b'\n' for item in batch)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    A header row of ``fields``, then one row per item. ``render`` takes the
+    fields from the first item; ``stream`` yields the output in chunks of
+    ``batch_size`` rows for a StreamingHttpResponse.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    batch_size = 1000
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not data:
+            return b''
+        items = data if isinstance(data, list) else [data]
+        # validation errors hold a list of messages per field
+        items = [
+            {key: '; '.join(map(str, value)) if isinstance(value, list) else value for key, value in item.items()}
+            for item in items
+        ]
+        return b''.join(self.stream(items, list(items[0])))
+
+    def stream(self, items, fields):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fields, extrasaction='ignore')
+        writer.writeheader()
+        for batch in batches(items, self.batch_size):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # no rows: just the header
+            yield buffer.getvalue().encode()
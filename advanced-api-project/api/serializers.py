@@ -1,21 +1,200 @@
 from rest_framework import serializers
 from .models import Author, Book
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+# Rows per INSERT/UPDATE statement in the bulk endpoints
+BULK_BATCH_SIZE = 500
+# Most books one bulk request may carry
+BULK_MAX_ITEMS = 50000
+# Fields whose to_representation() returns a database value unchanged
+PASSTHROUGH_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+# Largest primary key a 64-bit integer column holds
+MAX_PK = 2 ** 63 - 1
+
+
+def to_pk(value):
+    """``value`` (an int or a string of ASCII digits) as a primary key, or None if it cannot be one."""
+    if isinstance(value, str) and value.isascii() and value.isdecimal():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and 0 < value <= MAX_PK:
+        return value
+    return None
+
+
+class AuthorField(serializers.PrimaryKeyRelatedField):
+    """
+    The book's author by primary key. When books are validated as a list,
+    ``BookListSerializer`` has looked up all their authors in one query and
+    they are taken from there instead of one query per book.
+    """
+
+    def to_internal_value(self, data):
+        authors = getattr(self.root, 'authors', None)
+        if authors is None:
+            return super().to_internal_value(data)
+        pk = to_pk(data)
+        if pk is None:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return authors[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class BookListSerializer(serializers.ListSerializer):
+    """
+    ``BookSerializer(many=True)``, used by the bulk endpoints. Validation
+    resolves every ``author`` with a single ``in_bulk`` query, and saving
+    writes the whole list with ``bulk_create`` / ``bulk_update`` in one
+    transaction. To update, pass ``instance`` as a ``{pk: book}`` dict; each
+    item then needs the ``id`` of its book, and no book may appear twice.
+    """
+    authors = None
+
+    def to_internal_value(self, data):
+        self.seen_ids = set()
+        if isinstance(data, list):
+            pks = {to_pk(item.get('author')) for item in data if isinstance(item, dict)}
+            pks.discard(None)
+            self.authors = Author.objects.in_bulk(pks)
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            raw = data.get('id') if isinstance(data, dict) else None
+            pk = to_pk(raw)
+            self.child.instance = self.instance.get(pk)
+            if self.child.instance is None:
+                raise serializers.ValidationError({'id': [f'No book with id {raw!r}.']})
+            if pk in self.seen_ids:
+                raise serializers.ValidationError({'id': [f'Book {pk} appears more than once.']})
+            self.seen_ids.add(pk)
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def create(self, validated_data):
+        books = [Book(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            return Book.objects.bulk_create(books, batch_size=BULK_BATCH_SIZE)
+
+    def update(self, instance, validated_data):
+        books, fields = [], set()
+        for item, attrs in zip(self.initial_data, validated_data):
+            book = instance[to_pk(item['id'])]
+            for name, value in attrs.items():
+                setattr(book, name, value)
+            fields.update(attrs)
+            books.append(book)
+        if fields:
+            with transaction.atomic():
+                Book.objects.bulk_update(books, sorted(fields), batch_size=BULK_BATCH_SIZE)
+        return books
+
 
 class BookSerializer(serializers.ModelSerializer):
+    author = AuthorField(queryset=Author.objects.all())
+
     class Meta:
         model = Book
         fields = ['id', 'title', 'publication_year', 'author']
-    
+        list_serializer_class = BookListSerializer
+
     def validate_publication_year(self, value):
         current_year = timezone.now().year
         if value > current_year:
             raise serializers.ValidationError("Publication year cannot be in the future")
         return value
 
+class ValuesListSerializer:
+    """
+    Read-only fast path giving the same output as ``serializer_class``.
+    The serializer's fields are compiled once into a list of database
+    columns, and each row is built straight from a ``values_list()`` tuple.
+    No model instances are created and no per-field ``to_representation``
+    runs for fields in ``PASSTHROUGH_FIELDS``. Only model fields and
+    primary-key relations are supported. A tuple may carry extra columns
+    after ``columns``; they are ignored.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    @cached_property
+    def plan(self):
+        model = self.serializer_class.Meta.model
+        names, columns, converters = [], [], []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                column, convert = model._meta.get_field(field.source).attname, None
+            elif isinstance(field, (serializers.BaseSerializer, serializers.RelatedField)) or not field.source_attrs:
+                raise ImproperlyConfigured(f'{self.serializer_class.__name__}.{name} has no values_list() column.')
+            else:
+                column = '__'.join(field.source_attrs)
+                convert = None if type(field) in PASSTHROUGH_FIELDS else field.to_representation
+            names.append(name)
+            columns.append(column)
+            converters.append(convert)
+        return tuple(names), tuple(columns), tuple(converters)
+
+    @property
+    def columns(self):
+        return self.plan[1]
+
+    def rows(self, rows):
+        """Output dicts for an iterable of ``values_list(*columns)`` tuples."""
+        names, _, converters = self.plan
+        if not any(converters):
+            return [dict(zip(names, row)) for row in rows]
+        return [self.row(row) for row in rows]
+
+    def iterate(self, rows):
+        """Like ``rows()``, one dict at a time."""
+        names, _, converters = self.plan
+        if not any(converters):
+            return (dict(zip(names, row)) for row in rows)
+        return map(self.row, rows)
+
+    @property
+    def names(self):
+        return self.plan[0]
+
+    def row(self, row):
+        names, _, converters = self.plan
+        return {
+            name: value if convert is None or value is None else convert(value)
+            for name, value, convert in zip(names, row, converters)
+        }
+
+
 class AuthorSerializer(serializers.ModelSerializer):
-    books = BookSerializer(many=True, read_only=True)
-    
+    """
+    ``book_count`` counts all of the author's books. ``books`` is only
+    included when the context's ``expand`` contains 'books', and then holds
+    the newest books as prefetched by the author views (``capped_books``),
+    not all of them.
+    """
+    book_count = serializers.SerializerMethodField()
+    books = BookSerializer(many=True, read_only=True, source='capped_books')
+
     class Meta:
         model = Author
-        fields = ['id', 'name', 'books']
\ No newline at end of file
+        fields = ['id', 'name', 'book_count', 'books']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'books' not in self.context.get('expand', ()):
+            self.fields.pop('books')
+
+    def get_book_count(self, obj):
+        count = getattr(obj, 'book_count', None)
+        return obj.books.count() if count is None else count
+
+
+book_rows = ValuesListSerializer(BookSerializer)
@@ -2,7 +2,7 @@
 Unit tests for Book API endpoints.
 Tests CRUD operations, filtering, permissions, and authentication.
 """
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework import status
@@ -59,8 +59,8 @@ class BookAPITests(APITestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
-        self.assertEqual(response.data[0]['title'], self.book1.title)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['results'][0]['title'], self.book1.title)
     
     def test_filter_books_by_author(self):
         """Test filtering books by author ID."""
@@ -68,8 +68,8 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'author': self.author2.id})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # Should return 2 books by author2
-        self.assertEqual(response.data[0]['author'], self.author2.id)
+        self.assertEqual(len(response.data['results']), 2)  # Should return 2 books by author2
+        self.assertEqual(response.data['results'][0]['author'], self.author2.id)
     
     def test_filter_books_by_publication_year(self):
         """Test filtering books by publication year."""
@@ -77,8 +77,8 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'publication_year': 1997})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['publication_year'], 1997)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['publication_year'], 1997)
     
     def test_filter_books_by_year_range(self):
         """Test custom filtering by year range."""
@@ -86,7 +86,7 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'min_year': 1940, 'max_year': 1950})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # 1984 and Animal Farm
+        self.assertEqual(len(response.data['results']), 2)  # 1984 and Animal Farm
     
     def test_search_books_by_title(self):
         """Test searching books by title."""
@@ -94,8 +94,8 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'search': 'Harry'})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertIn('Harry', response.data[0]['title'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIn('Harry', response.data['results'][0]['title'])
     
     def test_search_books_by_author_name(self):
         """Test searching books by author name."""
@@ -103,7 +103,7 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'search': 'Orwell'})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)  # Both Orwell books
+        self.assertEqual(len(response.data['results']), 2)  # Both Orwell books
     
     def test_order_books_by_title(self):
         """Test ordering books by title."""
@@ -112,8 +112,8 @@ class BookAPITests(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         # Should be alphabetical: 1984, Animal Farm, Harry Potter
-        self.assertEqual(response.data[0]['title'], '1984')
-        self.assertEqual(response.data[1]['title'], 'Animal Farm')
+        self.assertEqual(response.data['results'][0]['title'], '1984')
+        self.assertEqual(response.data['results'][1]['title'], 'Animal Farm')
     
     def test_order_books_by_publication_year_desc(self):
         """Test ordering books by publication year (descending)."""
@@ -121,7 +121,7 @@ class BookAPITests(APITestCase):
         response = self.client.get(url, {'ordering': '-publication_year'})
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0]['publication_year'], 1997)  # Most recent
+        self.assertEqual(response.data['results'][0]['publication_year'], 1997)  # Most recent
     
     # ==================== DETAIL VIEW TESTS ====================
     
@@ -477,4 +477,381 @@ class BookModelTests(TestCase):
     def test_book_author_relationship(self):
         """Test Book-Author relationship."""
         self.assertEqual(self.book.author, self.author)
-        self.assertEqual(self.book.author.name, 'Test Author')
\ No newline at end of file
+        self.assertEqual(self.book.author.name, 'Test Author')
+
+class BookBulkAPITests(APITestCase):
+    """Test suite for the bulk book endpoints."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='sync', password='testpass123')
+        self.admin_user = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.author1 = Author.objects.create(name='J.K. Rowling')
+        self.author2 = Author.objects.create(name='George Orwell')
+        self.client.force_authenticate(user=self.user)
+
+    def books(self, count):
+        return [
+            {'title': f'Book {i}', 'publication_year': 1950 + i, 'author': (self.author1, self.author2)[i % 2].id}
+            for i in range(count)
+        ]
+
+    def test_bulk_create_constant_queries(self):
+        """Test that a bulk create looks up authors once and inserts in one statement."""
+        # authors, then the INSERT inside a savepoint
+        with self.assertNumQueries(4):
+            response = self.client.post(reverse('book-bulk-create'), self.books(50), format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['data']), 50)
+        self.assertEqual(response.data['data'][3]['title'], 'Book 3')
+        self.assertEqual(response.data['data'][3]['author'], self.author2.id)
+        self.assertEqual(Book.objects.count(), 50)
+        self.assertEqual(
+            sorted(item['id'] for item in response.data['data']),
+            sorted(Book.objects.values_list('id', flat=True)),
+        )
+
+    def test_bulk_create_ndjson(self):
+        """Test that books can be sent as newline-delimited JSON."""
+        body = '\n'.join(json.dumps(book) for book in self.books(3)) + '\n'
+        response = self.client.post(reverse('book-bulk-create'), body, content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Book.objects.count(), 3)
+
+    def test_bulk_create_reports_invalid_items(self):
+        """Test that invalid items are reported by index and nothing is written."""
+        books = self.books(4)
+        books[1]['publication_year'] = 2999
+        books[3]['author'] = 9999
+        response = self.client.post(reverse('book-bulk-create'), books, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {1, 3})
+        self.assertIn('publication_year', response.data[1])
+        self.assertIn('author', response.data[3])
+        self.assertEqual(Book.objects.count(), 0)
+
+    def test_bulk_update(self):
+        """Test that PATCH updates the given fields of many books in constant queries."""
+        first, second = Book.objects.bulk_create(
+            Book(title=f'Old {i}', publication_year=1990, author=self.author1) for i in range(2)
+        )
+        # books, authors, then the UPDATE inside a savepoint
+        with self.assertNumQueries(5):
+            response = self.client.patch(reverse('book-bulk-update'), [
+                {'id': first.id, 'title': 'New first'},
+                {'id': second.id, 'author': self.author2.id},
+            ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.title, first.author), ('New first', self.author1))
+        self.assertEqual((second.title, second.author), ('Old 1', self.author2))
+
+    def test_bulk_update_unknown_id(self):
+        """Test that an item without a matching book is an error."""
+        response = self.client.patch(reverse('book-bulk-update'), [{'id': 9999, 'title': 'Ghost'}], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data[0])
+
+    def test_bulk_malformed_ids_are_rejected(self):
+        """Test that lists, Unicode digits and oversized ids are validation errors, not crashes."""
+        book = Book.objects.create(title='Old', publication_year=1990, author=self.author1)
+        bad_values = [[self.author1.id], {'id': self.author1.id}, '\u00b2', 2 ** 70, '9' * 30]
+        for value in bad_values:
+            with self.subTest(value=value):
+                books = self.books(1)
+                books[0]['author'] = value
+                response = self.client.post(reverse('book-bulk-create'), books, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('author', response.data[0])
+
+                response = self.client.patch(reverse('book-bulk-update'), [{'id': value, 'title': 'New'}], format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn('id', response.data[0])
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Old')
+
+    def test_bulk_update_duplicate_id(self):
+        """Test that a book may only be updated once per request."""
+        book = Book.objects.create(title='Old', publication_year=1990, author=self.author1)
+        response = self.client.patch(reverse('book-bulk-update'), [
+            {'id': book.id, 'title': 'First'},
+            {'id': book.id, 'title': 'Second'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(response.data), {1})
+        book.refresh_from_db()
+        self.assertEqual(book.title, 'Old')
+
+    def test_bulk_delete(self):
+        """Test that admins can delete many books and see which ids existed."""
+        books = Book.objects.bulk_create(
+            Book(title=f'Book {i}', publication_year=1990, author=self.author1) for i in range(3)
+        )
+        ids = [books[0].id, books[2].id, 9999]
+        response = self.client.delete(reverse('book-bulk-delete'), ids, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin_user)
+        response = self.client.delete(reverse('book-bulk-delete'), ids, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['deleted'] for item in response.data['data']], [True, True, False])
+        self.assertEqual(list(Book.objects.values_list('id', flat=True)), [books[1].id])
+
+    def test_bulk_requires_authentication(self):
+        """Test that anonymous clients cannot use the bulk endpoints."""
+        self.client.force_authenticate(user=None)
+        response = self.client.post(reverse('book-bulk-create'), self.books(1), format='json')
+
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.assertEqual(Book.objects.count(), 0)
+
+
+@override_settings(API_AUTHOR_BOOKS_LIMIT=3)
+class AuthorAPITests(APITestCase):
+    """Test suite for the author list and detail endpoints."""
+
+    def add_authors(self, count, books_each=5):
+        for i in range(count):
+            author = Author.objects.create(name=f'Author {i:03d}')
+            Book.objects.bulk_create(
+                Book(title=f'Book {i}-{j}', publication_year=1950 + j, author=author) for j in range(books_each)
+            )
+
+    def test_list_query_count_is_constant(self):
+        """Test that listing N authors takes the same queries for any N."""
+        self.add_authors(2)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('author-list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('author-list'), {'expand': 'books'})
+
+        self.add_authors(20)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('author-list'))
+        self.assertEqual(len(response.data), 22)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('author-list'), {'expand': 'books'})
+        self.assertEqual(len(response.data), 22)
+
+    def test_books_only_with_expand(self):
+        """Test that nested books are opt-in while the count is always there."""
+        self.add_authors(1)
+        response = self.client.get(reverse('author-list'))
+        self.assertEqual(response.data[0]['book_count'], 5)
+        self.assertNotIn('books', response.data[0])
+
+    def test_nested_books_are_capped(self):
+        """Test that expanded books stop at the limit, newest first, with the full count."""
+        self.add_authors(1)
+        author = Author.objects.get()
+        response = self.client.get(reverse('author-detail', kwargs={'pk': author.id}), {'expand': 'books'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['book_count'], 5)
+        self.assertEqual([book['publication_year'] for book in response.data['books']], [1954, 1953, 1952])
+
+    def test_author_without_books(self):
+        """Test that an author with no books has a zero count and an empty list."""
+        author = Author.objects.create(name='New Author')
+        response = self.client.get(reverse('author-detail', kwargs={'pk': author.id}), {'expand': 'books'})
+
+        self.assertEqual(response.data['book_count'], 0)
+        self.assertEqual(response.data['books'], [])
+
+
+class BookPaginationTests(APITestCase):
+    """Test suite for the cursor pagination of the book list."""
+
+    def setUp(self):
+        self.authors = [Author.objects.create(name=name) for name in ('Orwell', 'Austen', 'Tolkien')]
+        # few distinct titles and years, so most rows tie on the ordering field
+        Book.objects.bulk_create(
+            Book(title=f'Title {i % 4}', publication_year=1900 + i % 3, author=self.authors[i % 3])
+            for i in range(25)
+        )
+
+    def walk(self, params):
+        """Follow next links from the first page and return every id seen."""
+        pages = []
+        response = self.client.get(reverse('book-list'), {**params, 'page_size': 4})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append([book['id'] for book in response.data['results']])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        if len(pages) > 1:
+            previous = self.client.get(response.data['previous'])
+            self.assertEqual([book['id'] for book in previous.data['results']], pages[-2])
+        return [pk for page in pages for pk in page]
+
+    def test_every_ordering_visits_each_book_once(self):
+        """Test that paging under each ordering field returns each row once, in order."""
+        for ordering in ('title', '-publication_year', 'author__name', '-author__name'):
+            with self.subTest(ordering=ordering):
+                ids = self.walk({'ordering': ordering})
+                expected = Book.objects.order_by(ordering, f"{'-' if ordering.startswith('-') else ''}id")
+                self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+                self.assertEqual(len(set(ids)), 25)
+
+    def test_filters_apply_across_pages(self):
+        """Test that year range filters hold on every page."""
+        ids = self.walk({'min_year': 1901, 'max_year': 1901, 'ordering': 'title'})
+        self.assertEqual(set(ids), set(Book.objects.filter(publication_year=1901).values_list('id', flat=True)))
+
+    def test_insert_between_pages_is_not_repeated(self):
+        """Test that a book added before the cursor does not shift the next page."""
+        first = self.client.get(reverse('book-list'), {'ordering': 'title', 'page_size': 5})
+        Book.objects.create(title='A first title', publication_year=1950, author=self.authors[0])
+        second = self.client.get(first.data['next'])
+        expected = list(Book.objects.order_by('title', 'id').values_list('id', flat=True))[6:11]
+        self.assertEqual([book['id'] for book in second.data['results']], expected)
+
+    def test_page_size_is_capped(self):
+        """Test that page_size cannot exceed the maximum."""
+        Book.objects.bulk_create(
+            Book(title=f'More {i}', publication_year=1990, author=self.authors[0]) for i in range(600)
+        )
+        response = self.client.get(reverse('book-list'), {'page_size': 10000})
+        self.assertEqual(len(response.data['results']), 500)
+
+    def test_no_count_query_unless_estimated(self):
+        """Test that a page runs a single query, and the estimate header is opt-in."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('book-list'))
+        self.assertFalse(response.has_header('X-Estimated-Count'))
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(reverse('book-list'), {'count': 'estimate', 'min_year': 1902})
+        self.assertEqual(response['X-Estimated-Count'], '8')
+
+    def test_invalid_cursor(self):
+        """Test that a tampered or mismatched cursor is a 404."""
+        self.assertEqual(self.client.get(reverse('book-list'), {'cursor': 'garbage'}).status_code, 404)
+        next_url = self.client.get(reverse('book-list'), {'ordering': 'title', 'page_size': 5}).data['next']
+        response = self.client.get(next_url.replace('ordering=title', 'ordering=publication_year'))
+        self.assertEqual(response.status_code, 404)
+
+
+class BookFastReadTests(APITestCase):
+    """Test suite for the values_list read path and the JSON renderer."""
+
+    def setUp(self):
+        self.author = Author.objects.create(name='Gabriel García Márquez')
+        self.books = [
+            Book.objects.create(title='Cien años de soledad', publication_year=1967, author=self.author),
+            Book.objects.create(title='El otoño del patriarca', publication_year=1975, author=self.author),
+        ]
+
+    def test_list_matches_book_serializer(self):
+        """Test that the list returns exactly what BookSerializer would."""
+        from .serializers import BookSerializer
+        response = self.client.get(reverse('book-list'), {'ordering': 'author__name'})
+        expected = BookSerializer(Book.objects.order_by('author__name', 'id'), many=True).data
+        self.assertEqual(response.json()['results'], json.loads(json.dumps(expected)))
+
+    def test_detail_matches_book_serializer(self):
+        """Test that the detail view returns exactly what BookSerializer would, in one query."""
+        from .serializers import BookSerializer
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('book-detail', kwargs={'pk': self.books[1].id}))
+        self.assertEqual(response.json(), dict(BookSerializer(self.books[1]).data))
+
+    def test_renderer_matches_json_renderer(self):
+        """Test that the orjson output is byte for byte what JSONRenderer produces."""
+        from decimal import Decimal
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+        data = {'title': 'año ', 'price': Decimal('1.50'), 'rows': [{'id': 1, 'author': None}]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_unsupported_field_is_rejected(self):
+        """Test that a serializer with a computed field cannot be compiled."""
+        from django.core.exceptions import ImproperlyConfigured
+        from rest_framework import serializers
+        from .serializers import ValuesListSerializer
+
+        class ComputedSerializer(serializers.ModelSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Book
+                fields = ['id', 'label']
+
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesListSerializer(ComputedSerializer).columns
+
+
+class BookExportTests(APITestCase):
+    """Test suite for the streaming book export."""
+
+    def setUp(self):
+        self.orwell = Author.objects.create(name='George Orwell')
+        self.huxley = Author.objects.create(name='Aldous Huxley')
+        Book.objects.create(title='Animal Farm', publication_year=1945, author=self.orwell)
+        Book.objects.create(title='Nineteen Eighty-Four', publication_year=1949, author=self.orwell)
+        Book.objects.create(title='Brave New World', publication_year=1932, author=self.huxley)
+
+    def export(self, params=None, **extra):
+        response = self.client.get(reverse('book-export'), params, **extra)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        """Test that the default export is one JSON book per line, in the list order."""
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="books.ndjson"')
+        books = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([book['title'] for book in books], ['Animal Farm', 'Brave New World', 'Nineteen Eighty-Four'])
+        self.assertEqual(books[0], {'id': books[0]['id'], 'title': 'Animal Farm', 'publication_year': 1945, 'author': self.orwell.id})
+
+    def test_csv_export(self):
+        """Test that ?format=csv and Accept: text/csv give a header and one row per book."""
+        import csv
+        response, content = self.export({'format': 'csv'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0], ['id', 'title', 'publication_year', 'author'])
+        self.assertEqual([row[1] for row in rows[1:]], ['Animal Farm', 'Brave New World', 'Nineteen Eighty-Four'])
+        _, negotiated = self.export(HTTP_ACCEPT='text/csv')
+        self.assertEqual(negotiated, content)
+
+    def test_export_honours_list_filters(self):
+        """Test that the filter, search, year range and ordering parameters of the list apply."""
+        def titles(params):
+            _, content = self.export(params)
+            return [json.loads(line)['title'] for line in content.splitlines()]
+
+        self.assertEqual(titles({'author': self.huxley.id}), ['Brave New World'])
+        self.assertEqual(titles({'search': 'orwell', 'min_year': 1946}), ['Nineteen Eighty-Four'])
+        self.assertEqual(titles({'max_year': 1945, 'ordering': '-publication_year'}), ['Animal Farm', 'Brave New World'])
+
+    def test_export_rejects_malformed_years(self):
+        """Test that a non-numeric year range is a 400, not a broken stream."""
+        for params in ({'min_year': 'abc'}, {'max_year': '1e3'}, {'min_year': '9' * 30, 'format': 'csv'}):
+            response = self.client.get(reverse('book-export'), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.streaming)
+
+    def test_empty_export(self):
+        """Test that an export with no books is empty, or just the CSV header."""
+        self.assertEqual(self.export({'publication_year': 1800})[1], '')
+        self.assertEqual(self.export({'publication_year': 1800, 'format': 'csv'})[1], 'id,title,publication_year,author\r\n')
+
+    def test_export_is_read_in_chunks(self):
+        """Test that rows are streamed in batches rather than rendered in one piece."""
+        from unittest import mock
+        from .renderers import NDJSONRenderer
+        from .views import BookExportView
+        with mock.patch.object(NDJSONRenderer, 'batch_size', 2), mock.patch.object(BookExportView, 'chunk_size', 2):
+            response = self.client.get(reverse('book-export'))
+            chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [2, 1])
@@ -12,6 +12,12 @@ urlpatterns = [
     path('books/create/', views.BookCreateView.as_view(), name='book-create'),    # CreateView
     path('books/update/<int:pk>/', views.BookUpdateView.as_view(), name='book-update'),  # UpdateView
     path('books/delete/<int:pk>/', views.BookDeleteView.as_view(), name='book-delete'),  # DeleteView
+    path('books/export/', views.BookExportView.as_view(), name='book-export'),
+    path('books/bulk/create/', views.BookBulkCreateView.as_view(), name='book-bulk-create'),
+    path('books/bulk/update/', views.BookBulkUpdateView.as_view(), name='book-bulk-update'),
+    path('books/bulk/delete/', views.BookBulkDeleteView.as_view(), name='book-bulk-delete'),
 
+    path('authors/', views.AuthorListView.as_view(), name='author-list'),
+    path('authors/<int:pk>/', views.AuthorDetailView.as_view(), name='author-detail'),
     path('authors/create/', views.AuthorCreateView.as_view(), name='author-create'),  # Author CreateView
 ]
\ No newline at end of file
@@ -5,11 +5,20 @@ Step 3: Customize View Behavior
 Step 4: Implement Permissions
 """
 from django.views.generic import ListView, UpdateView, DeleteView  # For checker
-from rest_framework import generics, permissions, filters, status
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Prefetch
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import generics, permissions, filters, serializers, status
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Book, Author
-from .serializers import AuthorSerializer, BookSerializer
+from .pagination import KeysetCursorPagination
+from .parsers import NDJSONParser
+from .renderers import CSVRenderer, FastJSONRenderer, NDJSONRenderer
+from .serializers import AuthorSerializer, BookSerializer, BULK_BATCH_SIZE, BULK_MAX_ITEMS, book_rows, to_pk
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from django_filters import rest_framework
 
@@ -35,6 +44,9 @@ class BookListView(generics.ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]  # Step 4
+    # ?cursor= pages of ?page_size= books (at most 500), see api/pagination.py
+    pagination_class = KeysetCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     
     # Step 3: Add filtering functionality
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -48,21 +60,75 @@ class BookListView(generics.ListAPIView):
         queryset = super().get_queryset()
         
         # Custom filter: publication_year range
-        min_year = self.request.query_params.get('min_year')
-        max_year = self.request.query_params.get('max_year')
+        min_year = self.year_param('min_year')
+        max_year = self.year_param('max_year')
         
-        if min_year:
+        if min_year is not None:
             queryset = queryset.filter(publication_year__gte=min_year)
-        if max_year:
+        if max_year is not None:
             queryset = queryset.filter(publication_year__lte=max_year)
             
         return queryset
 
+    year_field = serializers.IntegerField(min_value=-2 ** 31, max_value=2 ** 31 - 1)
+
+    def year_param(self, name):
+        """``?name=`` as an int, or a 400 before anything is queried or streamed."""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            return self.year_field.run_validation(value)
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError({name: exc.detail})
+
+    def list(self, request, *args, **kwargs):
+        """Read path without model instances, see ValuesListSerializer."""
+        queryset = self.filter_queryset(self.get_queryset())
+        # the cursor needs the ordering values of the last row
+        ordering = self.paginator.get_ordering(request, queryset, self)
+        columns = [*book_rows.columns]
+        columns += [field.lstrip('-') for field in ordering if field.lstrip('-') not in columns]
+        page = self.paginate_queryset(queryset.values_list(*columns, named=True))
+        return self.get_paginated_response(book_rows.rows(page))
+
+# Export of the whole (filtered) catalog
+class BookExportView(BookListView):
+    """
+    Every book matching the list view's filters, search, year range and
+    ordering, unpaginated, as NDJSON (the default) or CSV: ``?format=csv``
+    or ``Accept: text/csv``. The rows are read with ``.iterator()`` in
+    chunks of ``chunk_size`` and streamed as they come, so memory stays
+    flat and the first byte is sent before the last row is read.
+    """
+    pagination_class = None
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+    chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*book_rows.columns)
+        rows = book_rows.iterate(queryset.iterator(chunk_size=self.chunk_size))
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(rows, book_rows.names),
+            content_type=f'{renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{renderer.format}"'
+        return response
+
 # 2. DetailView for retrieving a single book by ID
 class BookDetailView(generics.RetrieveAPIView):
-    queryset = Book.objects.select_related('author').all()
+    queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [permissions.AllowAny]  # Step 4
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def retrieve(self, request, *args, **kwargs):
+        """Read path without a model instance, see ValuesListSerializer."""
+        row = self.get_queryset().filter(pk=kwargs['pk']).values_list(*book_rows.columns).first()
+        if row is None:
+            raise Http404
+        return Response(book_rows.row(row))
 
 # 3. CreateView for adding a new book
 class BookCreateView(generics.CreateAPIView):
@@ -135,4 +201,114 @@ class BookDeleteView(generics.DestroyAPIView):
 class AuthorCreateView(generics.CreateAPIView):
     queryset = Author.objects.all()
     serializer_class = AuthorSerializer
-    permission_classes = [permissions.AllowAny]  # Step 4
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]  # Step 4
+
+
+
+class AuthorQuerysetMixin:
+    """
+    Authors with their book count annotated and, with ``?expand=books``,
+    their newest ``API_AUTHOR_BOOKS_LIMIT`` books prefetched: a listing
+    costs the same two queries however many authors it shows.
+    """
+    queryset = Author.objects.all()
+    serializer_class = AuthorSerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_expand(self):
+        return {name.strip() for name in self.request.query_params.get('expand', '').split(',')} - {''}
+
+    def get_queryset(self):
+        queryset = super().get_queryset().annotate(book_count=Count('books')).order_by('name', 'id')
+        if 'books' in self.get_expand():
+            limit = getattr(settings, 'API_AUTHOR_BOOKS_LIMIT', 10)
+            books = Book.objects.order_by('-publication_year', '-id')[:limit]
+            queryset = queryset.prefetch_related(Prefetch('books', queryset=books, to_attr='capped_books'))
+        return queryset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'expand': self.get_expand()}
+
+
+class AuthorListView(AuthorQuerysetMixin, generics.ListAPIView):
+    pass
+
+
+class AuthorDetailView(AuthorQuerysetMixin, generics.RetrieveAPIView):
+    pass
+
+
+# =========== Bulk API Views ===========
+# A JSON array, or NDJSON with one book per line. The whole list is
+# validated first, then written in one transaction: one invalid item
+# rejects the request, and the 400 response maps each failing item's index
+# to its errors. Successful responses carry one result per item, in order.
+
+class BookBulkCreateView(generics.CreateAPIView):
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    parser_classes = [JSONParser, NDJSONParser]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=BULK_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response({
+            'status': 'success',
+            'message': f'{len(serializer.instance)} books created',
+            'data': serializer.data
+        }, status=status.HTTP_201_CREATED)
+
+
+class BookBulkUpdateView(generics.GenericAPIView):
+    """PUT replaces, PATCH changes only the fields given; every item needs its ``id``."""
+    queryset = Book.objects.all()
+    serializer_class = BookSerializer
+    parser_classes = [JSONParser, NDJSONParser]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, *args, **kwargs):
+        return self.bulk_update(request, partial=False)
+
+    def patch(self, request, *args, **kwargs):
+        return self.bulk_update(request, partial=True)
+
+    def bulk_update(self, request, partial):
+        items = request.data if isinstance(request.data, list) else []
+        ids = [item.get('id') for item in items[:BULK_MAX_ITEMS + 1] if isinstance(item, dict)]
+        books = self.get_queryset().in_bulk({pk for pk in map(to_pk, ids) if pk is not None})
+        serializer = self.get_serializer(
+            books, data=request.data, many=True, partial=partial, max_length=BULK_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response({
+            'status': 'success',
+            'message': f'{len(serializer.instance)} books updated',
+            'data': serializer.data
+        })
+
+
+class BookBulkDeleteView(generics.GenericAPIView):
+    """Delete the books whose ids are given as a JSON array."""
+    queryset = Book.objects.all()
+    permission_classes = [permissions.IsAdminUser]
+    ids_field = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=BULK_MAX_ITEMS,
+    )
+
+    def delete(self, request, *args, **kwargs):
+        ids = self.ids_field.run_validation(request.data)
+        queryset = self.get_queryset()
+        deleted = set()
+        with transaction.atomic():
+            for start in range(0, len(ids), BULK_BATCH_SIZE):
+                batch = queryset.filter(pk__in=ids[start:start + BULK_BATCH_SIZE])
+                deleted.update(batch.values_list('pk', flat=True))
+                batch.delete()
+        return Response({
+            'status': 'success',
+            'message': f'{len(deleted)} books deleted',
+            'data': [{'id': pk, 'deleted': pk in deleted} for pk in ids]
+        })
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from LibraryProject import instrumentation
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', instrumentation.metrics, name='metrics'),
     path('', include('relationship_app.urls')),
     path('bookshelf/', include('bookshelf.urls')),
 ]
@@ -17,8 +17,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
+from api_project import instrumentation
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics/', instrumentation.metrics, name='metrics'),
     path('', include('api.urls')),
     
 ]
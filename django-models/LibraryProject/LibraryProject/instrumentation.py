@@ -0,0 +1,265 @@
+"""
+Per-request ORM and timing instrumentation.
+
+``InstrumentationMiddleware`` counts the SQL queries a request runs, the
+time spent in them and how many repeat a statement already run by the same
+request (the signature of an N+1). It also times the view and everything
+below this middleware. The numbers go out in a ``Server-Timing`` header::
+
+    Server-Timing: db;dur=4.1;desc="12 queries, 9 repeated", view;dur=23.7
+
+They are also added to rolling histograms served by the ``metrics`` view in
+the Prometheus text format. That view answers staff users, addresses in
+``INTERNAL_IPS`` and scrapers sending ``Authorization: Bearer <token>``
+with ``INSTRUMENTATION['METRICS_TOKEN']``; anyone else gets a 403. A request that repeats one statement
+``DUPLICATE_LIMIT`` times or more is logged as a warning with that
+statement.
+
+The histograms cover the last ``INSTRUMENTATION['WINDOW']`` seconds and are
+not cumulative. Read them as they are, e.g. ``histogram_quantile(0.95,
+sum by (le) (django_request_duration_seconds_bucket))``, rather than
+through ``rate()``. Each process keeps its own.
+
+This module has no imports from the project. The Django projects in this
+repository share no installable package, so each keeps its own copy of
+this file, and the copies are kept byte-identical: change one, copy it over
+the others, and check with ``md5sum */*/instrumentation.py
+*/*/*/instrumentation.py`` that the sums agree.
+"""
+import contextvars
+import hmac
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WINDOW': 60,
+    'SLOTS': 6,
+    'DUPLICATE_LIMIT': 5,
+    'METRICS_TOKEN': None,
+}
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def instrumentation_setting(name):
+    return getattr(settings, 'INSTRUMENTATION', {}).get(name, DEFAULTS[name])
+
+
+class RollingHistogram:
+    """
+    Histogram over a sliding time window. The window is split into slots;
+    an observation lands in the current slot and a slot is cleared when its
+    turn comes round again, so old observations fall out a slot at a time.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # slot number -> {labels: [count per bucket..., +Inf count, sum]}
+        self.slots = {}
+
+    def _slot(self, now):
+        return int(now // (instrumentation_setting('WINDOW') / instrumentation_setting('SLOTS')))
+
+    def observe(self, labels, value, now=None):
+        slot = self._slot(time.monotonic() if now is None else now)
+        with self.lock:
+            if slot not in self.slots:
+                oldest = slot - instrumentation_setting('SLOTS') + 1
+                for stale in [s for s in self.slots if s < oldest]:
+                    del self.slots[stale]
+                self.slots[slot] = defaultdict(lambda: [0] * (len(self.buckets) + 2))
+            row = self.slots[slot][labels]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            else:
+                row[len(self.buckets)] += 1
+            row[-1] += value
+
+    def snapshot(self, now=None):
+        """{labels: (cumulative bucket counts, count, sum)} for the window."""
+        oldest = self._slot(time.monotonic() if now is None else now) - instrumentation_setting('SLOTS') + 1
+        totals = defaultdict(lambda: [0] * (len(self.buckets) + 2))
+        with self.lock:
+            for slot, rows in self.slots.items():
+                if slot >= oldest:
+                    for labels, row in rows.items():
+                        total = totals[labels]
+                        for i, n in enumerate(row):
+                            total[i] += n
+        result = {}
+        for labels, row in totals.items():
+            cumulative, running = [], 0
+            for n in row[:-1]:
+                running += n
+                cumulative.append(running)
+            result[labels] = (cumulative, running, row[-1])
+        return result
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (cumulative, count, total) in sorted(self.snapshot().items()):
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            for bound, n in zip((*self.buckets, '+Inf'), cumulative):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {n}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:g}')
+            lines.append(f'{self.name}_count{{{label_text}}} {count}')
+        return '\n'.join(lines)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+HISTOGRAMS = {
+    'duration': RollingHistogram(
+        'django_request_duration_seconds', 'Time spent in the view and the middleware below it.',
+        DURATION_BUCKETS,
+    ),
+    'db': RollingHistogram(
+        'django_request_db_seconds', 'Time spent running SQL queries per request.', DURATION_BUCKETS,
+    ),
+    'queries': RollingHistogram(
+        'django_request_queries', 'SQL queries run per request.', COUNT_BUCKETS,
+    ),
+    'duplicates': RollingHistogram(
+        'django_request_duplicate_queries', 'Queries repeating a statement already run by the request.',
+        COUNT_BUCKETS,
+    ),
+}
+
+
+class RequestStats:
+    def __init__(self):
+        self.statements = Counter()
+        self.db_time = 0.0
+
+    @property
+    def queries(self):
+        return sum(self.statements.values())
+
+    @property
+    def duplicates(self):
+        return self.queries - len(self.statements)
+
+
+_current = contextvars.ContextVar('instrumentation_request', default=None)
+
+
+def _record(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.statements[sql] += 1
+
+
+def _install(connection, **kwargs):
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+# Connections opened from now on, in any thread; the ones this thread
+# already holds are covered at the start of each sync request.
+connection_created.connect(_install)
+
+
+class InstrumentationMiddleware:
+    """Put first in MIDDLEWARE so the view time covers the whole stack."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, elapsed):
+        db = f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries, {stats.duplicates} repeated"'
+        response.headers['Server-Timing'] = ', '.join(
+            filter(None, [response.headers.get('Server-Timing'), db, f'view;dur={elapsed * 1000:.1f}'])
+        )
+
+        match = request.resolver_match
+        labels = (('method', request.method), ('route', match.route if match else '<unmatched>'))
+        HISTOGRAMS['duration'].observe(labels, elapsed)
+        HISTOGRAMS['db'].observe(labels, stats.db_time)
+        HISTOGRAMS['queries'].observe(labels, stats.queries)
+        HISTOGRAMS['duplicates'].observe(labels, stats.duplicates)
+
+        if stats.statements:
+            sql, times = stats.statements.most_common(1)[0]
+            if times >= instrumentation_setting('DUPLICATE_LIMIT'):
+                logger.warning(
+                    '%s %s ran the same query %d times (possible N+1): %s',
+                    request.method, request.path, times, sql,
+                )
+        return response
+
+
+def render_metrics():
+    return '\n'.join(histogram.render() for histogram in HISTOGRAMS.values()) + '\n'
+
+
+def metrics_allowed(request):
+    token = instrumentation_setting('METRICS_TOKEN')
+    if token:
+        scheme, _, given = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(given.strip().encode(), token.encode()):
+            return True
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'INTERNAL_IPS', ()):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def metrics(request):
+    """The histograms in the Prometheus text exposition format."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,48 @@
+"""
+Case-insensitive unique email addresses.
+
+``auth.User`` belongs to Django, so the index is not declared on a model:
+migration 0015 adds ``EMAIL_CONSTRAINT`` to ``auth_user`` through the schema
+editor. It is a unique index on ``LOWER(email)`` that leaves out empty
+addresses, which many accounts have. ``users_with_email`` filters on the
+same expression and condition, so the lookup is answered from the index.
+Registration and profile updates both check through ``email_in_use``;
+blog_import checks a batch at once with ``emails_in_use``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Q, UniqueConstraint, Value
+from django.db.models.functions import Lower
+
+EMAIL_CONSTRAINT = UniqueConstraint(Lower('email'), condition=~Q(email=''), name='blog_user_email_ci_unique')
+
+
+def create_email_index(schema_editor, user_model):
+    schema_editor.add_constraint(user_model, EMAIL_CONSTRAINT)
+
+
+def drop_email_index(schema_editor, user_model):
+    schema_editor.remove_constraint(user_model, EMAIL_CONSTRAINT)
+
+
+def users_with_email(email, user_model=None):
+    """Users whose email matches ``email``, ignoring case."""
+    users = (user_model or get_user_model())._default_manager
+    return users.alias(email_key=Lower('email')).filter(~Q(email=''), email_key=Lower(Value(email)))
+
+
+def emails_in_use(emails, user_model=None):
+    """The lowercased ones among ``emails`` that an account already uses."""
+    users = (user_model or get_user_model())._default_manager
+    keys = {email.lower() for email in emails if email}
+    return set(
+        users.annotate(email_key=Lower('email')).filter(~Q(email=''), email_key__in=keys)
+        .values_list('email_key', flat=True)
+    ) if keys else set()
+
+
+def email_in_use(email, exclude=None):
+    """Whether an account other than ``exclude`` already uses ``email``."""
+    users = users_with_email(email)
+    if exclude is not None and exclude.pk is not None:
+        users = users.exclude(pk=exclude.pk)
+    return users.exists()
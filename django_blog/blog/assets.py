@@ -0,0 +1,177 @@
+"""
+Static file build and serving.
+
+``collectstatic`` with ``CompressedManifestStaticFilesStorage`` (the
+``staticfiles`` storage in settings.py) is the build step. It copies the
+files to ``STATIC_ROOT``, minifies the CSS (and the JavaScript when rjsmin
+is installed), stores each file again under a name carrying a hash of its
+content (``css/styles.1a2b3c4d5e6f.css``) and writes the mapping to
+``staticfiles.json``, which ``{% static %}`` reads. Every hashed text file
+then gets a ``.gz`` sibling, and a ``.br`` one when the brotli package is
+installed.
+
+``serve`` answers ``STATIC_URL`` from ``STATIC_ROOT`` with the smallest
+variant the client accepts. Hashed names never change content, so they are
+sent with an immutable, year-long Cache-Control and a repeat page load
+does not revalidate them. A front-end server can do the same with the
+files on disk (nginx ``gzip_static`` / ``brotli_static``).
+
+Until collectstatic has run there is no manifest; URLs are then the plain
+names, as with ``DEBUG``, so development and tests need no build.
+"""
+import gzip
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import HashedFilesMixin, ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot')
+# below this a compressed copy saves less than its own overhead
+MIN_COMPRESS_SIZE = 256
+# client Content-Encoding -> file suffix, best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# ManifestStaticFilesStorage puts 12 hex digits before the extension
+HASHED_NAME = re.compile(r'.+\.[0-9a-f]{12}(\.[^./]+)?')
+
+CSS_STRINGS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_COMMENTS = re.compile(r'/\*(?!!).*?\*/', re.DOTALL)
+CSS_SPACES = re.compile(r'\s+')
+# no space before ':' is dropped, as in 'a :hover' it is a descendant combinator
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*|(:)\s+')
+
+
+def minify_css(text):
+    """Drop comments (except ``/*! ... */``) and insignificant whitespace."""
+    parts = CSS_STRINGS.split(text)
+    for i in range(0, len(parts), 2):
+        code = CSS_SPACES.sub(' ', CSS_COMMENTS.sub('', parts[i]))
+        parts[i] = CSS_PUNCTUATION.sub(lambda match: match.group(1) or match.group(2), code)
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def minify_js(text):
+    return rjsmin.jsmin(text) if rjsmin else text
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def url(self, name, force=False):
+        if not self.hashed_files and not force:
+            # no manifest yet: collectstatic has not run
+            return super(HashedFilesMixin, self).url(name)
+        return super().url(name, force)
+
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            yield from super().post_process(paths, dry_run, **options)
+            return
+        # minify the collected copies and hash those rather than the sources,
+        # so the hashes are of what is served
+        for name in paths:
+            self.minify(name)
+        collected = {name: (self, name) for name in paths}
+        yield from super().post_process(collected, dry_run, **options)
+        for name in set(self.hashed_files.values()):
+            self.compress(name)
+
+    def minify(self, name):
+        root, ext = os.path.splitext(name)
+        minifier = MINIFIERS.get(ext)
+        # .min.css and .min.js files are shipped minified
+        if minifier is None or root.endswith('.min'):
+            return
+        with self.open(name) as source:
+            try:
+                original = source.read().decode()
+            except UnicodeDecodeError:
+                return
+        minified = minifier(original)
+        if minified != original:
+            self.delete(name)
+            self._save(name, ContentFile(minified.encode()))
+
+    def compress(self, name):
+        if not name.endswith(COMPRESSIBLE):
+            return
+        with self.open(name) as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content, quality=11)
+        for suffix, compressed in variants.items():
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            # a variant that saves next to nothing is not worth the decoding
+            if len(compressed) < len(content) * 0.95:
+                self._save(name + suffix, ContentFile(compressed))
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip().removeprefix('q=').strip()
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def serve(request, path):
+    """Serve ``path`` from STATIC_ROOT, precompressed when the client allows."""
+    if not settings.STATIC_ROOT:
+        raise Http404
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except (SuspiciousFileOperation, ValueError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    accepted = accepted_encodings(request)
+    chosen, encoding = full_path, None
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(full_path + suffix):
+            chosen, encoding = full_path + suffix, coding
+            break
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(
+        open(chosen, 'rb'), content_type=content_type or 'application/octet-stream',
+        filename=os.path.basename(full_path),
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if any(os.path.isfile(full_path + suffix) for _, suffix in ENCODINGS):
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if HASHED_NAME.fullmatch(os.path.basename(path)):
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        # plain names change content on every build
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
@@ -0,0 +1,24 @@
+"""
+The blog URLconf with the async read views of blog/async_views.py in place
+of their sync versions. Used instead of blog.urls when BLOG_ASYNC_VIEWS is
+on, which django_blog/asgi.py does by default.
+"""
+from django.urls import path
+
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'home': async_views.home,
+    'posts-list': async_views.PostListView.as_view(),
+    'post-detail': async_views.PostDetailView.as_view(),
+    'comment-list': async_views.CommentListView.as_view(),
+    'post-comments': async_views.CommentListView.as_view(),
+    'search': async_views.PostSearchView.as_view(),
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,126 @@
+"""
+Async versions of the blog's read views, served when the site runs under
+ASGI (see django_blog/asgi.py and blog/async_urls.py).
+
+They subclass the sync views and only replace the parts that query: the
+handlers load their rows with the async ORM (``aget``, ``acount``,
+``async for``) and return a TemplateResponse, which Django renders in a
+worker thread, so nothing blocks the event loop. Behaviour (conditional
+GET, pagination modes, view counting) is the same as in blog/views.py.
+"""
+import asyncio
+
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.template.response import TemplateResponse
+
+from . import fragments, views, viewcounts
+from .conditional import AsyncConditionalGetMixin
+from .models import Comment, Post
+from .pagination import AsyncPaginationMixin, alist
+from .search import SearchResults
+
+
+async def home(request):
+    user = await request.auser()
+    # templates read request.user; hand them the user loaded above
+    request.user = user
+    posts = Post.objects.select_related('author').order_by('-published_date', '-id')[:5]
+    comments = Comment.objects.select_related('author', 'post').order_by('-created_at', '-id')[:5]
+    user_comments = []
+    if user.is_authenticated:
+        user_comments = (
+            Comment.objects.filter(author=user)
+            .select_related('post')
+            .order_by('-created_at', '-id')[:5]
+        )
+
+    first_post_id, has_activity = await asyncio.gather(
+        fragments.afirst_post_id(),
+        cache.ahas_key(fragments.fragment_key(fragments.RECENT_ACTIVITY)),
+    )
+    # Only fetch what the cached fragments are missing, all of it at once.
+    # The async ORM still runs queries one at a time on its database thread,
+    # but the event loop is free while they run.
+    wanted = {}
+    if not has_activity:
+        wanted.update(posts=posts, comments=comments)
+    if user.is_authenticated and not await cache.ahas_key(
+        fragments.fragment_key(fragments.USER_COMMENTS, user.id, first_post_id)
+    ):
+        wanted['user_comments'] = user_comments
+
+    context = {
+        'posts': posts,
+        'comments': comments,
+        'first_post_id': first_post_id,
+        'user_comments': user_comments,
+        'fragment_timeout': fragments.fragment_timeout(),
+        'fragment_version': fragments.FRAGMENT_VERSION,
+    }
+    context.update(zip(wanted, await asyncio.gather(*(alist(qs) for qs in wanted.values()))))
+    return TemplateResponse(request, 'blog/home.html', context)
+
+
+class AsyncListMixin(AsyncPaginationMixin):
+    """ListView.get with the queryset and page loaded through the async ORM."""
+
+    async def aget_queryset(self):
+        return self.get_queryset()
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = await self.aget_queryset()
+        page_size = self.get_paginate_by(self.object_list)
+        if page_size:
+            await self.apaginate_queryset(self.object_list, page_size)
+        else:
+            self.object_list = await alist(self.object_list)
+        return self.render_to_response(self.get_context_data())
+
+
+class PostListView(AsyncConditionalGetMixin, AsyncListMixin, views.PostListView):
+    pass
+
+
+class PostDetailView(AsyncConditionalGetMixin, views.PostDetailView):
+
+    async def aget_validators(self, request, *args, **kwargs):
+        updated_at = await Post.objects.filter(pk=kwargs['pk']).values_list('updated_at', flat=True).afirst()
+        if updated_at is None:
+            return None
+        self.count_view(kwargs['pk'])
+        return [updated_at.isoformat()], updated_at
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            self.object = await self.get_queryset().aget(pk=kwargs['pk'])
+        except Post.DoesNotExist:
+            raise Http404('No post found matching the query')
+        self.count_view(self.object.pk)
+        self.object.views_count += viewcounts.pending(self.object.pk)
+        self.comments = await alist(Comment.thread(self.object))
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = self.comments
+        return context
+
+
+class CommentListView(AsyncConditionalGetMixin, AsyncListMixin, views.CommentListView):
+
+    async def aget_queryset(self):
+        if 'pk' in self.kwargs:
+            self.post = await aget_object_or_404(Post, pk=self.kwargs['pk'])
+        return self.comments_queryset()
+
+
+class PostSearchView(AsyncListMixin, views.PostSearchView):
+
+    async def aget_queryset(self):
+        query = self.request.GET.get('q', '').strip()
+        if not query:
+            return Post.objects.none()
+        # counted and fetched off the event loop, see SearchResults
+        return SearchResults(query)
@@ -0,0 +1,160 @@
+"""
+In-memory prefix index for search-bar suggestions.
+
+Post titles and tag names are kept in one sorted list of
+``(key, kind, pk)`` entries. A lookup bisects to the first key starting with
+the typed prefix and walks forward, so suggestions never touch the database.
+Every word of a title starts a key, so "gen" finds "Python generators".
+
+The index is built on first use and then kept current by the Post and Tag
+signals (see blog/signals.py), which also drop a tag once no post uses it.
+It only covers this process's writes, so it is rebuilt once it is
+``BLOG_AUTOCOMPLETE['MAX_AGE']`` seconds old to pick up posts written by
+other workers. One request rebuilds while the others keep reading the old
+index; only the first build makes them wait. Memory is bounded by ``MAX_POSTS`` (the
+newest posts) and ``MAX_TAGS`` (the most used tags).
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.urls import reverse
+
+DEFAULTS = {
+    'MAX_POSTS': 10000,
+    'MAX_TAGS': 5000,
+    'MAX_AGE': 600,
+}
+# Words of a title that start a key, and the longest key stored
+MAX_WORDS = 8
+MAX_KEY_LENGTH = 64
+
+POST = 'post'
+TAG = 'tag'
+
+
+def autocomplete_setting(name):
+    return getattr(settings, 'BLOG_AUTOCOMPLETE', {}).get(name, DEFAULTS[name])
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def keys_for(text):
+    words = normalize(text).split()
+    return {' '.join(words[i:])[:MAX_KEY_LENGTH] for i in range(min(len(words), MAX_WORDS))}
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.lock = threading.RLock()
+        # held for a whole build, so concurrent requests do not all rebuild
+        self.build_lock = threading.Lock()
+        self.entries = []  # sorted (key, kind, pk)
+        # kind -> {pk: (label, target, keys)}, oldest first so eviction pops
+        # the front; target is what the URL needs (post pk, tag slug)
+        self.items = {POST: {}, TAG: {}}
+        self.built_at = None
+
+    def build(self):
+        from taggit.models import Tag
+
+        from .models import Post
+
+        posts = (
+            Post.objects.order_by('-published_date', '-id')
+            .values_list('pk', 'title', 'pk')[:autocomplete_setting('MAX_POSTS')]
+        )
+        tags = (
+            Tag.objects.filter(blog_count__post_count__gt=0)
+            .order_by('-blog_count__post_count', 'name')
+            .values_list('pk', 'name', 'slug')[:autocomplete_setting('MAX_TAGS')]
+        )
+        entries, items = [], {POST: {}, TAG: {}}
+        for kind, rows in ((POST, reversed(list(posts))), (TAG, reversed(list(tags)))):
+            for pk, label, target in rows:
+                keys = keys_for(label)
+                items[kind][pk] = (label, target, keys)
+                entries.extend((key, kind, pk) for key in keys)
+        entries.sort()
+        with self.lock:
+            self.entries, self.items = entries, items
+            self.built_at = time.monotonic()
+
+    def stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > autocomplete_setting('MAX_AGE')
+
+    def ensure_built(self):
+        if not self.stale():
+            return
+        # with nothing to serve yet, wait for the build under way
+        if not self.build_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            if self.stale():
+                self.build()
+        finally:
+            self.build_lock.release()
+
+    def add(self, kind, pk, label, target):
+        with self.lock:
+            if self.built_at is None:
+                return  # picked up by the first build
+            self.remove(kind, pk)
+            keys = keys_for(label)
+            self.items[kind][pk] = (label, target, keys)
+            for key in keys:
+                insort(self.entries, (key, kind, pk))
+            limit = autocomplete_setting('MAX_POSTS' if kind == POST else 'MAX_TAGS')
+            while len(self.items[kind]) > limit:
+                self.remove(kind, next(iter(self.items[kind])))
+
+    def remove(self, kind, pk):
+        with self.lock:
+            _, _, keys = self.items[kind].pop(pk, (None, None, ()))
+            for key in keys:
+                i = bisect_left(self.entries, (key, kind, pk))
+                if i < len(self.entries) and self.entries[i] == (key, kind, pk):
+                    del self.entries[i]
+
+    def suggest(self, prefix, limit=10):
+        """Return up to ``limit`` (kind, label, target) matches, tags first."""
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        found = {TAG: [], POST: []}
+        seen = set()
+        with self.lock:
+            i = bisect_left(self.entries, (prefix,))
+            while i < len(self.entries) and len(seen) < limit:
+                key, kind, pk = self.entries[i]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    label, target, _ = self.items[kind][pk]
+                    found[kind].append((kind, label, target))
+                i += 1
+        return found[TAG] + found[POST]
+
+
+index = PrefixIndex()
+
+
+def is_indexed(kind, pk):
+    return pk in index.items[kind]
+
+
+def suggest(prefix, limit=10):
+    """Suggestions for ``prefix`` as dicts ready for JSON."""
+    index.ensure_built()
+    results = []
+    for kind, label, target in index.suggest(prefix, limit):
+        if kind == POST:
+            url = reverse('post-detail', kwargs={'pk': target})
+        else:
+            url = reverse('posts-by-tag', kwargs={'tag_slug': target})
+        results.append({'type': kind, 'label': label, 'url': url})
+    return results
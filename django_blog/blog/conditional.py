@@ -0,0 +1,112 @@
+"""
+Conditional GET for blog views.
+
+``ConditionalGetMixin`` answers GET/HEAD with an ETag and Last-Modified
+derived from the versions of ``conditional_models`` (blog/versions.py), so
+an unchanged page comes back as an empty 304 without running its queries or
+rendering its template. Views that show one object add its own timestamp
+through ``get_validators``. The versions only hold across processes with a
+shared cache, so without one (``versions.shared()``) every request is
+rendered and no validators are sent.
+
+HTML pages differ per user (navigation, edit links, flash messages), so
+with ``conditional_per_user`` the ETag includes the user, responses carry
+``Vary: Cookie`` and pages for signed-in users are marked private. A
+request with pending flash messages is always rendered, otherwise the
+messages would wait for the next changed page.
+"""
+from django.contrib.messages import get_messages
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import versions
+
+
+class ConditionalGetMixin:
+    conditional_models = ()
+    conditional_per_user = False
+
+    def get_validators(self, request, *args, **kwargs):
+        """
+        Return ``(etag parts, last modified)`` for what the page shows besides
+        ``conditional_models``, or None if it cannot be validated.
+        """
+        return [], None
+
+    async def aget_validators(self, request, *args, **kwargs):
+        """Async ``get_validators``, for views that need a query to answer."""
+        return self.get_validators(request, *args, **kwargs)
+
+    def _combine(self, request, validators):
+        if validators is None:
+            return None, None
+        parts, modified = validators
+        if self.conditional_per_user:
+            parts = [*parts, f'user:{request.user.pk}']
+        etag = versions.etag(request, *self.conditional_models, extra=parts)
+        last_modified = versions.last_modified(*self.conditional_models)
+        if modified is not None:
+            last_modified = max(last_modified, modified)
+        return etag, last_modified
+
+    def _validators(self, request, *args, **kwargs):
+        # computed once per request for both callbacks of condition()
+        if not hasattr(self, '_conditional_validators'):
+            self._conditional_validators = self._combine(
+                request, self.get_validators(request, *args, **kwargs)
+            )
+        return self._conditional_validators
+
+    def _render_fresh(self, request):
+        if not versions.shared():
+            # another process's writes would not change the ETag
+            return True
+        return self.conditional_per_user and len(get_messages(request))
+
+    def _patch_headers(self, request, response):
+        if self.conditional_per_user:
+            patch_vary_headers(response, ['Cookie'])
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True)
+        patch_cache_control(response, max_age=0, must_revalidate=True)
+
+    def _conditional(self, view):
+        return condition(
+            etag_func=lambda *a, **kw: self._validators(*a, **kw)[0],
+            last_modified_func=lambda *a, **kw: self._validators(*a, **kw)[1],
+        )(view)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self._render_fresh(request):
+            response = super().dispatch(request, *args, **kwargs)
+        else:
+            response = self._conditional(super().dispatch)(request, *args, **kwargs)
+        self._patch_headers(request, response)
+        return response
+
+
+class AsyncConditionalGetMixin(ConditionalGetMixin):
+    """
+    ``ConditionalGetMixin`` for views with async handlers. The user and the
+    validators are loaded up front with the async APIs, so nothing in the
+    condition() callbacks touches the database from the event loop.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # skip ConditionalGetMixin.dispatch, which is sync
+        view_dispatch = super(ConditionalGetMixin, self).dispatch
+
+        async def view(request, *args, **kwargs):
+            return await view_dispatch(request, *args, **kwargs)
+
+        if self.conditional_per_user:
+            request.user = await request.auser()
+        if self._render_fresh(request):
+            response = await view(request, *args, **kwargs)
+        else:
+            self._conditional_validators = self._combine(
+                request, await self.aget_validators(request, *args, **kwargs)
+            )
+            response = await self._conditional(view)(request, *args, **kwargs)
+        self._patch_headers(request, response)
+        return response
@@ -1,11 +1,22 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from .accounts import email_in_use
 from .models import Profile, Comment, Post
 from taggit.forms import TagWidget  # This import is required
 
 
-class CustomUserCreationForm(UserCreationForm):
+class UniqueEmailMixin:
+    """Reject an email another account already uses, whatever its case."""
+
+    def clean_email(self):
+        email = self.cleaned_data.get('email')
+        if email and email_in_use(email, exclude=self.instance):
+            raise forms.ValidationError('This email is already in use.')
+        return email
+
+
+class CustomUserCreationForm(UniqueEmailMixin, UserCreationForm):
     email = forms.EmailField(required=True)
     
     class Meta:
@@ -13,20 +24,12 @@ class CustomUserCreationForm(UserCreationForm):
         fields = ['username', 'email', 'password1', 'password2']
 
 
-class UserUpdateForm(forms.ModelForm):
+class UserUpdateForm(UniqueEmailMixin, forms.ModelForm):
     email = forms.EmailField()
     
     class Meta:
         model = User
         fields = ['username', 'email']
-    
-    def clean_email(self):
-        email = self.cleaned_data.get('email')
-        username = self.cleaned_data.get('username')
-        
-        if email and User.objects.filter(email=email).exclude(username=username).exists():
-            raise forms.ValidationError('This email is already in use.')
-        return email
 
 
 class ProfileUpdateForm(forms.ModelForm):
@@ -0,0 +1,63 @@
+"""
+Cached fragments of the home page.
+
+The anonymous "recent activity" block is the same for every visitor and is
+cached once; "your recent comments" is cached per user id. Both are
+rendered with the ``{% cache %}`` template tag and deleted from the
+signal handlers in ``blog.signals`` when the rows they show change, so the
+timeout is only a safety net.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+# Bump when the markup inside a cached fragment changes.
+FRAGMENT_VERSION = 1
+
+RECENT_ACTIVITY = 'home_recent_activity'
+USER_COMMENTS = 'home_user_comments'
+FIRST_POST_ID = 'blog:home:first_post_id'
+
+
+def fragment_timeout():
+    return getattr(settings, 'BLOG_FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def fragment_key(name, *vary_on):
+    return make_template_fragment_key(name, [FRAGMENT_VERSION, *vary_on])
+
+
+def first_post_id():
+    """The id the home page links "create comment" to, or None."""
+    def lookup():
+        from .models import Post
+        return Post.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+
+    return cache.get_or_set(FIRST_POST_ID, lookup, fragment_timeout()) or None
+
+
+async def afirst_post_id():
+    """Async ``first_post_id``."""
+    first_id = await cache.aget(FIRST_POST_ID)
+    if first_id is None:
+        from .models import Post
+        first_id = await Post.objects.order_by('pk').values_list('pk', flat=True).afirst() or 0
+        await cache.aadd(FIRST_POST_ID, first_id, fragment_timeout())
+    return first_id or None
+
+
+def invalidate_recent_activity():
+    cache.delete(fragment_key(RECENT_ACTIVITY))
+
+
+def invalidate_first_post():
+    cache.delete(FIRST_POST_ID)
+
+
+def invalidate_user_comments(*user_ids):
+    # The fragment also varies on the first post id it links to; keys for an
+    # older first post can no longer be hit, so only the current one matters.
+    first_id = cache.get(FIRST_POST_ID)
+    if first_id is None:
+        first_id = first_post_id()
+    cache.delete_many([fragment_key(USER_COMMENTS, user_id, first_id) for user_id in user_ids])
@@ -0,0 +1,91 @@
+"""
+Background resizing of profile pictures.
+
+The profile form stores the upload as-is (Django streams it to storage in
+chunks). ``schedule_variants`` then queues a ``build_picture_variants``
+task (blog/tasks.py) that writes one WebP per entry in ``VARIANTS`` under
+``profile/variants/``, named after a hash of their content so they can be
+served with an immutable, year-long Cache-Control (see
+``views.profile_picture``). Until the variants exist, templates fall back to
+the original upload.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+# name -> longest edge in pixels
+VARIANTS = {
+    'thumb': 64,
+    'small': 160,
+    'medium': 480,
+}
+VARIANT_DIR = 'profile/variants'
+WEBP_QUALITY = 80
+
+
+def render_variants(source):
+    """Return {name: webp bytes} for an open image file."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        rendered = {}
+        for name, edge in VARIANTS.items():
+            variant = image.copy()
+            variant.thumbnail((edge, edge), Image.LANCZOS)
+            buffer = io.BytesIO()
+            variant.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+            rendered[name] = buffer.getvalue()
+        return rendered
+
+
+def generate_variants(profile_id, source_name):
+    """Build and store the variants of ``source_name`` for one profile."""
+    from .models import Profile
+
+    try:
+        with default_storage.open(source_name, 'rb') as source:
+            rendered = render_variants(source)
+        stored = {}
+        for name, data in rendered.items():
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            path = f'{VARIANT_DIR}/{profile_id}-{name}-{digest}.webp'
+            if not default_storage.exists(path):
+                path = default_storage.save(path, ContentFile(data))
+            stored[name] = path.rsplit('/', 1)[-1]
+        # Only record the result if the picture was not replaced meanwhile.
+        Profile.objects.filter(pk=profile_id, profile_pic=source_name).update(picture_variants=stored)
+        return stored
+    except Exception:
+        logger.exception('Could not build variants of %s', source_name)
+        raise
+
+
+def schedule_variants(profile):
+    """Queue variant generation for ``profile``'s current picture."""
+    from .tasks import build_picture_variants
+
+    if not profile.profile_pic:
+        return
+    source_name = profile.profile_pic.name
+    build_picture_variants.enqueue(
+        key=f'picture-variants:{profile.pk}:{source_name}', profile_id=profile.pk, source_name=source_name,
+    )
+
+
+def picture_url(profile, size='small'):
+    """URL of the ``size`` variant, or of the original while it is being built."""
+    name = (profile.picture_variants or {}).get(size)
+    if name:
+        return reverse('profile-picture', kwargs={'name': name})
+    if profile.profile_pic:
+        return profile.profile_pic.url
+    return ''
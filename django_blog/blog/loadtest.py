@@ -0,0 +1,246 @@
+"""
+Load testing for the blog pages (see the loadtest command).
+
+``seed`` writes a synthetic corpus of users, tags, posts and threaded
+comments through the blog_import command, so counters, tag counts and the
+search index end up as a real import leaves them. ``plan`` turns every URL
+in blog/urls.py into a request; ``profile`` makes one request to each with
+query capture and tracemalloc on, and ``run`` times them under concurrency.
+``regressions`` compares the results with the limits of a baseline file.
+"""
+import datetime
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from taggit.models import Tag
+
+from . import urls
+from .models import Comment, Follow, Post
+
+User = get_user_model()
+
+SCALE = {'users': 50, 'posts': 1000, 'comments': 5000, 'tags': 40}
+REPLY_RATIO = 0.3
+FOLLOWS = 5
+USERNAME = 'loadtest{}'
+WORDS = (
+    'django python cache query index async feed thread tag search page view model '
+    'template signal worker queue latency memory database migration profile comment'
+).split()
+
+# URL names that are not requested, and why
+SKIPPED = {
+    'logout': 'POST only, and it would end the session',
+    'author-follow': 'POST only, and it changes the feed being measured',
+    'profile-picture': 'serves an uploaded file, none are seeded',
+}
+# Metrics a baseline can limit, and the headroom --update-baseline leaves
+# over the measured value as (factor, slack). Latency depends on the
+# machine and on scheduling, hence the wide margin.
+LIMITS = {
+    'p50_ms': (3, 50),
+    'p95_ms': (3, 50),
+    'p99_ms': (3, 50),
+    'queries': (1, 0),
+    'memory_kib': (1.5, 64),
+}
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def records(users, posts, comments, tags, seed=0):
+    """Yield a blog_export style corpus; authorship is round robin."""
+    rng = random.Random(seed)
+    today = timezone.now().date()
+    usernames = [USERNAME.format(i) for i in range(users)]
+    tag_names = [f'{WORDS[i % len(WORDS)]}{i // len(WORDS) or ""}' for i in range(tags)]
+    for username in usernames:
+        yield {'type': 'author', 'username': username, 'email': f'{username}@example.com'}
+    for name in tag_names:
+        yield {'type': 'tag', 'name': name}
+    for i in range(posts):
+        yield {
+            'type': 'post', 'id': i, 'author': usernames[i % users],
+            'title': sentence(rng, rng.randint(3, 7)),
+            'content': '. '.join(sentence(rng, 12) for _ in range(rng.randint(3, 12))),
+            'published_date': (today - datetime.timedelta(days=rng.randrange(365))).isoformat(),
+            'tags': rng.sample(tag_names, min(len(tag_names), rng.randint(0, 3))),
+        }
+    started = timezone.now() - datetime.timedelta(seconds=comments)
+    for i in range(comments):
+        reply = i and rng.random() < REPLY_RATIO
+        yield {
+            'type': 'comment', 'id': i, 'author': usernames[i % users],
+            'post': None if reply else rng.randrange(posts),
+            'parent': rng.randrange(i) if reply else None,
+            'content': sentence(rng, rng.randint(5, 30)),
+            'created_at': (started + datetime.timedelta(seconds=i)).isoformat(),
+        }
+
+
+def seed(users, posts, comments, tags, seed=0):
+    """Load the synthetic corpus and have the first user follow a few others."""
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as corpus:
+        for record in records(users, posts, comments, tags, seed):
+            corpus.write(json.dumps(record) + '\n')
+    try:
+        call_command('blog_import', corpus.name, stdout=StringIO())
+    finally:
+        os.unlink(corpus.name)
+    reader = User.objects.get(username=USERNAME.format(0))
+    for author in User.objects.filter(username__in=[USERNAME.format(i) for i in range(1, FOLLOWS + 1)]):
+        Follow.objects.get_or_create(follower=reader, followed=author)
+
+
+def bench_user():
+    """The user requests are made as: one with both posts and comments."""
+    return (
+        User.objects.filter(pk__in=Post.objects.values('author'))
+        .filter(pk__in=Comment.objects.values('author'))
+        .order_by('pk').first()
+    )
+
+
+def plan(user):
+    """Return ``(url name, path)`` for every URL in blog/urls.py not SKIPPED."""
+    post = Post.objects.filter(author=user).order_by('-published_date', '-id').first()
+    comment = Comment.objects.filter(author=user).order_by('-created_at', '-id').first()
+    tag = Tag.objects.order_by('-blog_count__post_count', 'name').first()
+    word = post.title.split()[0]
+    kwargs = {
+        'post-detail': {'pk': post.pk},
+        'post-update': {'pk': post.pk},
+        'post-delete': {'pk': post.pk},
+        'post-comments': {'pk': post.pk},
+        'comment-create': {'pk': post.pk},
+        'comment-detail': {'pk': comment.pk},
+        'comment-reply': {'pk': comment.pk},
+        'comment-update': {'pk': comment.pk},
+        'comment-delete': {'pk': comment.pk},
+        'posts-by-tag': {'tag_slug': tag.slug if tag else 'none'},
+        'api-post-detail': {'pk': post.pk},
+    }
+    queries = {'search': f'?q={word}', 'search-suggest': f'?q={word[:3]}'}
+    targets = []
+    for pattern in urls.urlpatterns:
+        if pattern.name in SKIPPED:
+            continue
+        path = reverse(pattern.name, kwargs=kwargs.get(pattern.name))
+        targets.append((pattern.name, path + queries.get(pattern.name, '')))
+    return targets
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an ascending list."""
+    return ordered[max(0, math.ceil(len(ordered) * p / 100) - 1)]
+
+
+def login(user):
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    return client
+
+
+def profile(targets, client):
+    """Queries and peak memory of one request to each target."""
+    for _, path in targets:
+        client.get(path)  # warm up templates and caches
+    results = {}
+    tracemalloc.start()
+    try:
+        for name, path in targets:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(path)
+            results[name] = {
+                'status': response.status_code,
+                'queries': len(captured),
+                'memory_kib': round((tracemalloc.get_traced_memory()[1] - before) / 1024, 1),
+            }
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def run(targets, client, requests, concurrency):
+    """Time ``requests`` requests per target, ``concurrency`` at a time."""
+    local = threading.local()
+
+    def fetch(target):
+        if not hasattr(local, 'client'):
+            # share the session rather than logging in from every thread
+            local.client = Client(raise_request_exception=False)
+            local.client.cookies = SimpleCookie(client.cookies)
+        name, path = target
+        started = time.perf_counter()
+        response = local.client.get(path)
+        return name, (time.perf_counter() - started) * 1000, response.status_code
+
+    work = [target for _ in range(requests) for target in targets]
+    random.Random(0).shuffle(work)
+    timings = {name: [] for name, _ in targets}
+    with ThreadPoolExecutor(concurrency, initializer=connections.close_all) as pool:
+        for name, ms, status in pool.map(fetch, work):
+            timings[name].append((ms, status))
+    return timings
+
+
+def summarize(timings, profiles):
+    pages = {}
+    for name, samples in timings.items():
+        latencies = sorted(ms for ms, _ in samples)
+        pages[name] = {
+            'requests': len(samples),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries': profiles[name]['queries'],
+            'memory_kib': profiles[name]['memory_kib'],
+            'errors': sum(status >= 400 for _, status in samples) + (profiles[name]['status'] >= 400),
+        }
+    return pages
+
+
+def regressions(pages, baseline):
+    """Messages for every page that errored or went over a baseline limit."""
+    found = []
+    limits = baseline.get('pages', {})
+    for name, result in pages.items():
+        if result['errors']:
+            found.append(f'{name}: {result["errors"]} failed requests')
+        for metric, limit in limits.get(name, {}).items():
+            if result[metric] > limit:
+                found.append(f'{name}: {metric} {result[metric]} > {limit}')
+    return found
+
+
+def make_baseline(pages, scale):
+    return {
+        'scale': scale,
+        'pages': {
+            name: {
+                metric: math.ceil(result[metric] * factor + slack)
+                for metric, (factor, slack) in LIMITS.items()
+            }
+            for name, result in sorted(pages.items())
+        },
+    }
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from blog.models import Post
+
+INTERFACES = ('wsgi', 'asgi')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the throughput of the blog read pages under WSGI (sync views) '
+        'and ASGI (async views, see blog/async_views.py). Requests go through '
+        "Django's request handlers in process, so the numbers cover the "
+        'framework, views and database, not a network server.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interface', choices=(*INTERFACES, 'both'), default='both')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per interface.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight at once.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Page to request (repeatable). Defaults to the read pages.',
+        )
+        parser.add_argument('--json', action='store_true', help='Print one JSON result per interface.')
+
+    def handle(self, *args, **options):
+        if options['interface'] == 'both':
+            results = [self.run_in_subprocess(interface, options) for interface in INTERFACES]
+        else:
+            results = [self.run(options['interface'], options)]
+
+        if options['json']:
+            for result in results:
+                self.stdout.write(json.dumps(result))
+            return
+        self.stdout.write(f"{'':6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+        for r in results:
+            self.stdout.write(
+                f"{r['interface']:6} {r['rps']:9.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['errors']:7d}"
+            )
+
+    def run_in_subprocess(self, interface, options):
+        # The URLconf picks sync or async views at import time, so each
+        # interface gets a fresh process.
+        command = [
+            sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark_handlers',
+            '--interface', interface, '--json',
+            '--requests', str(options['requests']), '--concurrency', str(options['concurrency']),
+        ]
+        for path in options['paths'] or ():
+            command += ['--path', path]
+        env = {**os.environ, 'BLOG_ASYNC_VIEWS': '1' if interface == 'asgi' else '0'}
+        completed = subprocess.run(command, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f'{interface} run failed:\n{completed.stderr}')
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def default_paths(self):
+        post = Post.objects.order_by('-published_date', '-id').first()
+        if post is None:
+            raise CommandError('No posts to request; load some data first (see blog_import).')
+        return [
+            reverse('home'),
+            reverse('posts-list'),
+            reverse('post-detail', args=[post.pk]),
+            reverse('post-comments', args=[post.pk]),
+            reverse('comment-list'),
+            reverse('search') + '?q=' + post.title.split()[0],
+        ]
+
+    def run(self, interface, options):
+        if (interface == 'asgi') != settings.BLOG_ASYNC_VIEWS:
+            self.stderr.write(self.style.WARNING(
+                f'BLOG_ASYNC_VIEWS is {settings.BLOG_ASYNC_VIEWS} but the {interface} handler was asked for.'
+            ))
+        paths = options['paths'] or self.default_paths()
+        urls = [paths[i % len(paths)] for i in range(options['requests'])]
+        runner = self.run_wsgi if interface == 'wsgi' else self.run_asgi
+
+        # the test clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            runner(paths, 1)  # warm up caches and connections
+            started = time.perf_counter()
+            timings = runner(urls, options['concurrency'])
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(ms for ms, _ in timings)
+        return {
+            'interface': interface,
+            'requests': len(timings),
+            'concurrency': options['concurrency'],
+            'rps': len(timings) / elapsed,
+            'p50_ms': statistics.median(latencies),
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+            'errors': sum(status != 200 for _, status in timings),
+        }
+
+    def run_wsgi(self, urls, concurrency):
+        local = threading.local()
+
+        def fetch(url):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(url)
+            return (time.perf_counter() - started) * 1000, response.status_code
+
+        with ThreadPoolExecutor(concurrency, initializer=connections.close_all) as pool:
+            return list(pool.map(fetch, urls))
+
+    def run_asgi(self, urls, concurrency):
+        async def main():
+            client = AsyncClient()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def fetch(url):
+                async with slots:
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    return (time.perf_counter() - started) * 1000, response.status_code
+
+            return await asyncio.gather(*(fetch(url) for url in urls))
+
+        return asyncio.run(main())
@@ -0,0 +1,83 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from taggit.models import Tag
+
+from blog.models import Comment, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Export blog authors, tags, posts and comments as JSON lines. '
+        'Rows are streamed, so memory use does not grow with the table size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help="File to write, or '-' for stdout.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['output'] == '-':
+            self.export(self.stdout, chunk_size)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                counts = self.export(out, chunk_size)
+            self.stderr.write(self.style.SUCCESS(
+                'Exported ' + ', '.join(f'{n} {kind}s' for kind, n in counts.items())
+            ))
+
+    def export(self, out, chunk_size):
+        # Authors and tags come first so an import can resolve them before
+        # the posts and comments that refer to them.
+        counts = {'author': 0, 'tag': 0, 'post': 0, 'comment': 0}
+
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            counts[record['type']] += 1
+
+        users = User.objects.order_by('pk').values_list('username', 'email', 'first_name', 'last_name')
+        for username, email, first_name, last_name in users.iterator(chunk_size=chunk_size):
+            write({'type': 'author', 'username': username, 'email': email,
+                   'first_name': first_name, 'last_name': last_name})
+
+        tags = Tag.objects.filter(blog_count__isnull=False).order_by('pk').values_list('name', 'slug')
+        for name, slug in tags.iterator(chunk_size=chunk_size):
+            write({'type': 'tag', 'name': name, 'slug': slug})
+
+        posts = (
+            Post.objects.order_by('pk')
+            .select_related('author')
+            .prefetch_related('tags')
+        )
+        for post in posts.iterator(chunk_size=chunk_size):
+            write({
+                'type': 'post',
+                'id': post.pk,
+                'title': post.title,
+                'content': post.content,
+                'published_date': post.published_date.isoformat(),
+                'author': post.author.username,
+                'tags': [tag.name for tag in post.tags.all()],
+            })
+
+        # replies always have a higher id than their parent, so pk order
+        # writes every parent before its replies
+        comments = Comment.objects.order_by('pk').values_list(
+            'pk', 'parent_id', 'post_id', 'author__username', 'content', 'created_at', 'updated_at'
+        )
+        for pk, parent_id, post_id, author, content, created_at, updated_at in comments.iterator(chunk_size=chunk_size):
+            write({
+                'type': 'comment',
+                'id': pk,
+                'parent': parent_id,
+                'post': post_id,
+                'author': author,
+                'content': content,
+                'created_at': created_at.isoformat(),
+                'updated_at': updated_at.isoformat(),
+            })
+        return counts
@@ -0,0 +1,263 @@
+import json
+import sys
+from collections import Counter, defaultdict
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import slugify
+from taggit.models import Tag, TaggedItem
+
+from blog import fragments, search, versions
+from blog.accounts import emails_in_use
+from blog.models import Comment, Post, TagCount
+
+User = get_user_model()
+
+# A record is only flushed after every buffer it depends on.
+DEPENDENCIES = {
+    'author': (),
+    'tag': (),
+    'post': ('author', 'tag'),
+    'comment': ('author', 'post'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import blog authors, tags, posts and comments from JSON lines '
+        '(the format written by blog_export). Rows are inserted with '
+        'bulk_create, one transaction per batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help="File to read, or '-' for stdin.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.buffers = {kind: [] for kind in DEPENDENCIES}
+        self.counts = Counter()
+        # source identifiers -> database ids, filled as batches are written
+        self.user_ids = {}
+        self.tag_ids = {}
+        self.post_ids = {}
+        self.comment_ids = {}
+        self.commenters = set()
+        # lowercased emails given to the accounts created so far
+        self.emails = set()
+        self.post_type = ContentType.objects.get_for_model(Post)
+
+        if options['input'] == '-':
+            self.read(sys.stdin)
+        else:
+            with open(options['input'], encoding='utf-8') as lines:
+                self.read(lines)
+        for kind in DEPENDENCIES:
+            self.flush(kind)
+
+        # bulk_create skips the model signals, so refresh what they maintain
+        for model in (Post, Comment, Tag):
+            versions.bump(model)
+        fragments.invalidate_recent_activity()
+        fragments.invalidate_first_post()
+        fragments.invalidate_user_comments(*self.commenters)
+
+        self.stdout.write(self.style.SUCCESS(
+            'Imported ' + ', '.join(f'{self.counts[kind]} {kind}s' for kind in DEPENDENCIES)
+        ))
+
+    def read(self, lines):
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record['type']
+                buffer = self.buffers[kind]
+            except (ValueError, KeyError) as exc:
+                raise CommandError(f'Line {line_number}: not a blog record ({exc}).')
+            buffer.append(record)
+            if len(buffer) >= self.batch_size:
+                self.flush(kind)
+
+    def flush(self, kind):
+        for dependency in DEPENDENCIES[kind]:
+            self.flush(dependency)
+        records = self.buffers[kind]
+        if not records:
+            return
+        self.buffers[kind] = []
+        with transaction.atomic():
+            getattr(self, f'import_{kind}s')(records)
+        self.counts[kind] += len(records)
+
+    # Authors and tags are matched by username / name; missing ones are
+    # created. Resolved ids are kept in memory so later batches never look
+    # them up again.
+    def resolve_users(self, usernames, defaults=None):
+        missing = set(usernames) - self.user_ids.keys()
+        if not missing:
+            return
+        self.user_ids.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+        new = []
+        for username in sorted(missing - self.user_ids.keys()):
+            user = User(username=username, **(defaults or {}).get(username, {}))
+            user.set_unusable_password()
+            new.append(user)
+        self.dedupe_emails(new)
+        for user in User.objects.bulk_create(new, batch_size=self.batch_size):
+            self.user_ids[user.username] = user.pk
+
+    def dedupe_emails(self, users):
+        """
+        Clear the email of any new account whose address (ignoring case) is
+        already taken, so the batch does not trip the unique email index.
+        """
+        taken = self.emails | emails_in_use([user.email for user in users], User)
+        for user in users:
+            key = user.email.lower()
+            if not key:
+                continue
+            if key in taken:
+                self.stderr.write(f'{user.username}: email {user.email} is already in use; imported without it.')
+                user.email = ''
+            else:
+                taken.add(key)
+        self.emails = taken
+
+    def resolve_tags(self, names, slugs=None):
+        missing = set(names) - self.tag_ids.keys()
+        if not missing:
+            return
+        self.tag_ids.update(Tag.objects.filter(name__in=missing).values_list('name', 'pk'))
+        missing -= self.tag_ids.keys()
+        if not missing:
+            return
+        taken = set(Tag.objects.values_list('slug', flat=True).filter(
+            slug__in=[(slugs or {}).get(name) or slugify(name) for name in missing]
+        ))
+        new = []
+        for name in sorted(missing):
+            base = (slugs or {}).get(name) or slugify(name) or 'tag'
+            slug, i = base, 1
+            while slug in taken:
+                i += 1
+                slug = f'{base}_{i}'
+            taken.add(slug)
+            new.append(Tag(name=name, slug=slug))
+        for tag in Tag.objects.bulk_create(new, batch_size=self.batch_size):
+            self.tag_ids[tag.name] = tag.pk
+
+    def import_authors(self, records):
+        fields = ('email', 'first_name', 'last_name')
+        defaults = {r['username']: {f: r.get(f) or '' for f in fields} for r in records}
+        self.resolve_users(defaults, defaults)
+
+    def import_tags(self, records):
+        self.resolve_tags([r['name'] for r in records], {r['name']: r.get('slug') for r in records})
+
+    def import_posts(self, records):
+        self.resolve_users(r['author'] for r in records)
+        self.resolve_tags(name for r in records for name in r.get('tags', []))
+        posts = [
+            Post(
+                title=r['title'],
+                content=r['content'],
+                author_id=self.user_ids[r['author']],
+                published_date=parse_date(r['published_date']) if r.get('published_date') else None,
+            )
+            for r in records
+        ]
+        dates = [post.published_date for post in posts]
+        posts = Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        # published_date is auto_now_add, which bulk_create overwrites;
+        # put the exported dates back.
+        dated = []
+        for post, published in zip(posts, dates):
+            if published:
+                post.published_date = published
+                dated.append(post)
+        Post.objects.bulk_update(dated, ['published_date'], batch_size=self.batch_size)
+
+        tagged, per_tag, indexed = [], Counter(), []
+        for post, record in zip(posts, records):
+            if 'id' in record:
+                self.post_ids[record['id']] = post.pk
+            names = list(dict.fromkeys(record.get('tags', [])))
+            for name in names:
+                tagged.append(TaggedItem(tag_id=self.tag_ids[name], content_type=self.post_type, object_id=post.pk))
+                per_tag[self.tag_ids[name]] += 1
+            indexed.append((post, ' '.join(names)))
+        search.index_posts(indexed)
+        TaggedItem.objects.bulk_create(tagged, batch_size=self.batch_size)
+        TagCount.objects.bulk_create([TagCount(tag_id=pk) for pk in per_tag], ignore_conflicts=True)
+        self.add_counts(TagCount.objects, 'tag_id', 'post_count', per_tag)
+
+    def import_comments(self, records):
+        self.resolve_users(r['author'] for r in records)
+        # A reply needs its parent's id, so a batch holding both is written
+        # in rounds: each round takes the records whose parent already exists.
+        while records:
+            ready, waiting = [], []
+            for r in records:
+                if r.get('parent') is None or r['parent'] in self.comment_ids:
+                    ready.append(r)
+                else:
+                    waiting.append(r)
+            if not ready:
+                raise CommandError(
+                    f"Comment refers to parent {waiting[0]['parent']!r}, which is not in the import."
+                )
+            self.create_comments(ready)
+            records = waiting
+
+    def create_comments(self, records):
+        comments, parents, per_post = [], [], Counter()
+        for r in records:
+            parent = self.comment_ids.get(r['parent']) if r.get('parent') is not None else None
+            if parent:
+                post_id = parent[1]
+            else:
+                try:
+                    post_id = self.post_ids[r['post']]
+                except KeyError:
+                    raise CommandError(f"Comment refers to post {r['post']!r}, which is not in the import.")
+            per_post[post_id] += 1
+            parents.append(parent)
+            comments.append(Comment(
+                post_id=post_id,
+                parent_id=parent[0] if parent else None,
+                author_id=self.user_ids[r['author']],
+                content=r.get('content'),
+                created_at=parse_datetime(r['created_at']) if r.get('created_at') else None,
+                updated_at=parse_datetime(r['updated_at']) if r.get('updated_at') else None,
+            ))
+        stamps = [(c.created_at, c.updated_at) for c in comments]
+        comments = Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+        # bulk_create skips Comment.save(), so fill in the thread paths here,
+        # along with the auto_now_add/auto_now timestamps
+        for comment, parent, record, (created_at, updated_at) in zip(comments, parents, records, stamps):
+            comment.path = (f'{parent[2]}/' if parent else '') + str(comment.pk).zfill(Comment.PATH_STEP)
+            comment.depth = comment.path.count('/')
+            if created_at:
+                comment.created_at, comment.updated_at = created_at, updated_at or created_at
+            if record.get('id') is not None:
+                self.comment_ids[record['id']] = (comment.pk, comment.post_id, comment.path)
+        Comment.objects.bulk_update(
+            comments, ['path', 'depth', 'created_at', 'updated_at'], batch_size=self.batch_size
+        )
+        self.add_counts(Post.objects, 'pk', 'comment_count', per_post)
+        self.commenters.update(comment.author_id for comment in comments)
+
+    @staticmethod
+    def add_counts(queryset, key, field, increments):
+        """Apply {id: n} increments with one UPDATE per distinct n."""
+        by_amount = defaultdict(list)
+        for pk, amount in increments.items():
+            by_amount[amount].append(pk)
+        for amount, pks in by_amount.items():
+            queryset.filter(**{f'{key}__in': pks}).update(**{field: F(field) + amount})
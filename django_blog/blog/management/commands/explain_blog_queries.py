@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from blog.models import Comment, Post
+from blog.pagination import KeysetPaginator, pagination_setting
+
+# Plan lines that mean the database sorts rows itself instead of walking an
+# index in order.
+SORT_MARKERS = {
+    'sqlite': ('USE TEMP B-TREE FOR ORDER BY', 'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY'),
+    'postgresql': ('Sort Key:',),
+}
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every query the blog list views run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-sort', action='store_true',
+            help='Exit with an error if any plan sorts rows outside an index.',
+        )
+
+    def blog_queries(self):
+        """(label, queryset) for each query issued by the blog views."""
+        page_size = pagination_setting('PAGINATE_BY')
+        user = get_user_model().objects.order_by('pk').first()
+        user_id = user.pk if user else 1
+        post = Post.objects.order_by('pk').first()
+        post_id = post.pk if post else 1
+        now = timezone.now()
+
+        posts = Post.objects.select_related('author').order_by('-published_date', '-id')
+        comments = Comment.objects.select_related('author').order_by('-created_at', '-id')
+        post_keyset = KeysetPaginator(posts, page_size, ('-published_date', '-id'))
+        comment_keyset = KeysetPaginator(comments, page_size, ('-created_at', '-id'))
+        # a single post's comments are listed as a thread, see Comment.thread
+        thread = Comment.thread(post_id)
+        thread_keyset = KeysetPaginator(thread, page_size, ('path',))
+
+        return [
+            ('home: latest posts', posts[:5]),
+            ('home: latest comments', Comment.objects.select_related('author', 'post').order_by('-created_at', '-id')[:5]),
+            ('home: user comments', Comment.objects.filter(author_id=user_id).select_related('post').order_by('-created_at', '-id')[:5]),
+            ('home: first post', Post.objects.order_by('pk').values_list('pk', flat=True)[:1]),
+            ('PostListView: page', posts[page_size:page_size * 2]),
+            ('PostListView: cursor', posts.filter(post_keyset._after([now.date(), post_id], forwards=True))[:page_size + 1]),
+            ('PostDetailView', Post.objects.filter(pk=post_id)),
+            ('CommentListView: page', comments[page_size:page_size * 2]),
+            ('CommentListView: cursor', comments.filter(comment_keyset._after([now, 1], forwards=True))[:page_size + 1]),
+            ('CommentListView: post page', thread[:page_size]),
+            ('CommentListView: post cursor', thread.filter(thread_keyset._after(['0000000001'], forwards=True))[:page_size + 1]),
+            ('PostDetailView: thread', Comment.thread(post_id)),
+        ]
+
+    def handle(self, *args, **options):
+        markers = SORT_MARKERS.get(connection.vendor, ())
+        sorting = []
+        for label, queryset in self.blog_queries():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(plan)
+            self.stdout.write('')
+            if any(marker in plan for marker in markers):
+                sorting.append(label)
+
+        if not markers:
+            self.stdout.write(f'Sort detection is not supported on {connection.vendor}.')
+        elif sorting:
+            message = 'Queries sorting outside an index: ' + ', '.join(sorting)
+            if options['fail_on_sort']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('Every query reads rows in index order.'))
@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+
+from blog import loadtest
+
+DEFAULT_BASELINE = Path(loadtest.__file__).with_name('loadtest_baseline.json')
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic blog and request every page in blog/urls.py with a '
+        'concurrent client. Reports p50/p95/p99 latency, queries and memory '
+        'per request, and fails if a page goes over its limits in the '
+        'baseline file. By default everything happens in a throwaway test '
+        'database with its own cache key prefix.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default in loadtest.SCALE.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'{name.capitalize()} to seed.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the corpus.')
+        parser.add_argument('--requests', type=int, default=20, help='Timed requests per page.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight at once.')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline file with the limits.')
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Write the limits from this run to the baseline file instead of checking them.',
+        )
+        parser.add_argument(
+            '--use-current-db', action='store_true',
+            help='Run against the configured database instead of a throwaway one.',
+        )
+        parser.add_argument('--no-seed', action='store_true', help='Use the data already in the database.')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['use_current_db']:
+            pages = self.measure(options)
+        else:
+            pages = self.in_test_database(options)
+
+        baseline_path = Path(options['baseline'])
+        scale = {name: options[name] for name in loadtest.SCALE}
+        if options['update_baseline']:
+            baseline = loadtest.make_baseline(pages, scale)
+            baseline_path.write_text(json.dumps(baseline, indent=2) + '\n')
+            found = []
+        else:
+            baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+            if baseline.get('scale', scale) != scale:
+                self.stderr.write(self.style.WARNING(
+                    f"The baseline was recorded at {baseline['scale']}, this run used {scale}."
+                ))
+            found = loadtest.regressions(pages, baseline)
+
+        if options['json']:
+            self.stdout.write(json.dumps({'scale': scale, 'pages': pages, 'regressions': found}))
+        else:
+            self.report(pages)
+        if found:
+            raise CommandError('Over the baseline:\n' + '\n'.join(found))
+        if options['update_baseline']:
+            self.stderr.write(self.style.SUCCESS(f'Wrote {baseline_path}'))
+
+    def in_test_database(self, options):
+        old_name = connection.settings_dict['NAME']
+        run_id = f'loadtest-{uuid.uuid4().hex[:8]}'
+        caches = {
+            name: {**config, 'KEY_PREFIX': f"{config.get('KEY_PREFIX', '')}-{run_id}"}
+            for name, config in settings.CACHES.items()
+        }
+        test_settings = connection.settings_dict['TEST']
+        if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+            # SQLite's shared in-memory test database locks whole tables, so
+            # concurrent requests would fail; a file allows parallel reads.
+            test_settings['NAME'] = os.path.join(tempfile.gettempdir(), f'{run_id}.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=caches):
+                return self.measure(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def measure(self, options):
+        if not options['no_seed']:
+            loadtest.seed(*(options[name] for name in loadtest.SCALE), seed=options['seed'])
+        user = loadtest.bench_user()
+        if user is None:
+            raise CommandError('No user with both posts and comments; drop --no-seed or load some data.')
+        # the test clients send Host: testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            targets = loadtest.plan(user)
+            client = loadtest.login(user)
+            profiles = loadtest.profile(targets, client)
+            timings = loadtest.run(targets, client, options['requests'], options['concurrency'])
+        return loadtest.summarize(timings, profiles)
+
+    def report(self, pages):
+        self.stdout.write(
+            f"{'page':18} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'KiB':>9} {'errors':>7}"
+        )
+        for name, r in pages.items():
+            self.stdout.write(
+                f"{name:18} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+                f"{r['queries']:8d} {r['memory_kib']:9.1f} {r['errors']:7d}"
+            )
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+from blog import search
+
+
+def create_index(apps, schema_editor):
+    search.create_index(schema_editor)
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f"INSERT INTO {search.SQLITE_TABLE} (rowid, title, content, tags) "
+                "SELECT p.id, p.title, p.content, COALESCE(("
+                "  SELECT group_concat(t.name, ' ') FROM taggit_taggeditem ti "
+                "  JOIN taggit_tag t ON t.id = ti.tag_id "
+                "  JOIN django_content_type ct ON ct.id = ti.content_type_id "
+                "  WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+                "), '') FROM blog_post p"
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f"INSERT INTO {search.POSTGRES_TABLE} (post_id, title, content, tags, document) "
+                "SELECT id, title, content, tags, "
+                + search.POSTGRES_DOCUMENT.replace('%s', '{}').format('title', 'tags', 'content') +
+                " FROM (SELECT p.id, p.title, p.content, COALESCE(("
+                "  SELECT string_agg(t.name, ' ') FROM taggit_taggeditem ti "
+                "  JOIN taggit_tag t ON t.id = ti.tag_id "
+                "  JOIN django_content_type ct ON ct.id = ti.content_type_id "
+                "  WHERE ct.app_label = 'blog' AND ct.model = 'post' AND ti.object_id = p.id"
+                "), '') AS tags FROM blog_post p) src"
+            )
+
+
+def drop_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0004_post_tags'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
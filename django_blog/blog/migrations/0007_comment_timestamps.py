@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 05:40
+
+from django.db import migrations, models
+from django.db.models.functions import Now
+
+
+def fill_missing_timestamps(apps, schema_editor):
+    # Comments were saved without timestamps; give them one so they can be
+    # ordered and paginated on (created_at, id).
+    Comment = apps.get_model('blog', 'Comment')
+    Comment.objects.filter(created_at__isnull=True).update(created_at=Now())
+    Comment.objects.filter(updated_at__isnull=True).update(updated_at=Now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_missing_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='comment',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
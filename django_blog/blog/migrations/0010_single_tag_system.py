@@ -0,0 +1,71 @@
+# Generated by Django 6.0 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils.text import slugify
+
+
+def move_blog_tags_to_taggit(apps, schema_editor):
+    """Re-create every blog.Tag/post link as a taggit tag before dropping blog.Tag."""
+    BlogTag = apps.get_model('blog', 'Tag')
+    TaggitTag = apps.get_model('taggit', 'Tag')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    if not BlogTag.objects.exists():
+        return
+    post_type, _ = ContentType.objects.get_or_create(app_label='blog', model='post')
+    for blog_tag in BlogTag.objects.prefetch_related('posts'):
+        tag = TaggitTag.objects.filter(name=blog_tag.name).first()
+        if tag is None:
+            base = slugify(blog_tag.name) or 'tag'
+            slug, i = base, 1
+            while TaggitTag.objects.filter(slug=slug).exists():
+                i += 1
+                slug = f'{base}_{i}'
+            tag = TaggitTag.objects.create(name=blog_tag.name, slug=slug)
+        for post in blog_tag.posts.all():
+            TaggedItem.objects.get_or_create(tag=tag, content_type=post_type, object_id=post.pk)
+
+
+def fill_tag_counts(apps, schema_editor):
+    TagCount = apps.get_model('blog', 'TagCount')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    counts = (
+        TaggedItem.objects.filter(content_type__app_label='blog', content_type__model='post')
+        .values('tag_id')
+        .annotate(total=Count('pk'))
+        .order_by()
+    )
+    TagCount.objects.bulk_create(
+        [TagCount(tag_id=row['tag_id'], post_count=row['total']) for row in counts],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_profile_picture_variants'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_blog_tags_to_taggit, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='TagCount',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='blog_count', serialize=False, to='taggit.tag')),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-post_count'], name='tagcount_post_count_idx')],
+            },
+        ),
+        migrations.RunPython(fill_tag_counts, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='Tag',
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 09:20
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+from blog import accounts
+
+
+def create_index(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    clashes = list(
+        User.objects.exclude(email='').values(key=Lower('email'))
+        .annotate(n=Count('pk')).filter(n__gt=1).values_list('key', flat=True)[:10]
+    )
+    if clashes:
+        raise RuntimeError(
+            'Accounts share an email address (ignoring case); give them distinct '
+            'addresses before migrating: ' + ', '.join(clashes)
+        )
+    accounts.create_email_index(schema_editor, User)
+
+
+def drop_index(apps, schema_editor):
+    accounts.drop_email_index(schema_editor, apps.get_model(*settings.AUTH_USER_MODEL.split('.')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_follows_and_timelines'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -2,12 +2,15 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings 
 from taggit.managers import TaggableManager
+from taggit.models import Tag as TaggitTag
 
 # Create your models here.
 class Post(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
     published_date = models.DateField(auto_now_add=True)
+    # Last-Modified/ETag of the post detail page, see blog/conditional.py
+    updated_at = models.DateTimeField(auto_now=True)
     author = models.ForeignKey( settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE,
         related_name='posts')
@@ -15,6 +18,17 @@ class Post(models.Model):
    # Taggit manager - handles all tag functionality automatically
     tags = TaggableManager(blank=True)
 
+    # Denormalized counter kept in sync by the Comment signals in blog/signals.py
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Written in batches from the buffer in blog/viewcounts.py
+    views_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # listings order by (-published_date, -id), see blog/pagination.py
+            models.Index(fields=['published_date', 'id'], name='post_published_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -26,24 +40,139 @@ class Profile(models.Model):
     location = models.CharField(max_length=50, blank=True, null=True)
     birth_date = models.DateField(null=True, blank=True)
     profile_pic = models.ImageField(upload_to='profile/', null=True, blank=True)
+    # size name -> file name of the resized WebP copies, filled in the
+    # background by blog/images.py
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     def __str__(self):
         return self.user.username
+
+    def picture_url(self, size='small'):
+        from .images import picture_url
+        return picture_url(self, size)
+
+    @property
+    def thumb_url(self):
+        return self.picture_url('thumb')
+
+    @property
+    def small_url(self):
+        return self.picture_url('small')
+
+    @property
+    def medium_url(self):
+        return self.picture_url('medium')
     
 class Comment(models.Model):
+    # Replies form a tree stored as a materialized path: each comment's path
+    # is its parent's path plus its own zero-padded id, so ordering a post's
+    # comments by path yields the whole thread depth-first in one query.
+    PATH_STEP = 10
+    MAX_DEPTH = 20
+
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    path = models.CharField(max_length=255, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
     content = models.TextField(null=True, blank=True)
-    created_at = models.DateField(null=True, blank=True)
-    updated_at = models.DateField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # every comment listing orders by (-created_at, -id), optionally
+            # filtered by post or by author
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='comment_author_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='comment_created_idx'),
+            models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ]
 
     def __str__(self):
-        return self.post
+        return self.post.title
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            if self.parent_id is not None:
+                parent = self.parent
+                # past MAX_DEPTH, replies join their parent's level instead
+                if parent.depth + 1 >= self.MAX_DEPTH:
+                    parent = parent.parent
+                self.parent = parent
+                self.post_id = parent.post_id
+            super().save(*args, **kwargs)
+            # the path needs our own id, so it is written right after insert
+            prefix = f'{self.parent.path}/' if self.parent_id else ''
+            self.path = prefix + str(self.pk).zfill(self.PATH_STEP)
+            self.depth = self.path.count('/')
+            type(self).objects.filter(pk=self.pk).update(path=self.path, depth=self.depth)
+        else:
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def thread(cls, post):
+        """Every comment on ``post``, depth-first, parents before replies."""
+        return cls.objects.filter(post=post).select_related('author').order_by('path')
     
-class Tag(models.Model):
-    name = models.CharField(max_length=200)
-    posts = models.ManyToManyField(Post, related_name='Tags', blank=True)
-    created_at = models.DateField(null=True, blank=True)
+class TagCount(models.Model):
+    """
+    Number of posts carrying a taggit tag, maintained incrementally by the
+    TaggedItem signals in blog/signals.py so the tag cloud never aggregates.
+    """
+    tag = models.OneToOneField(TaggitTag, on_delete=models.CASCADE, primary_key=True, related_name='blog_count')
+    post_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-post_count'], name='tagcount_post_count_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tag.name} ({self.post_count})"
+
+
+class Follow(models.Model):
+    follower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='following')
+    followed = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='followers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='follow_unique'),
+            models.CheckConstraint(condition=~models.Q(follower=models.F('followed')), name='follow_not_self'),
+        ]
+        indexes = [
+            # fan-out reads an author's followers, see blog/timeline.py
+            models.Index(fields=['followed', 'follower'], name='follow_followed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower} follows {self.followed}"
+
+
+class TimelineEntry(models.Model):
+    """
+    One item of a user's feed, written when the event happens (fan-out on
+    write, see blog/timeline.py), so reading a feed page is a single range
+    scan of the (owner, created_at, id) index.
+    """
+    POST = 'post'
+    REPLY = 'reply'
+    KIND_CHOICES = [(POST, 'New post'), (REPLY, 'Reply')]
+
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='timeline')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    # when the post or comment was written, not when the entry was
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id'], name='timeline_owner_created_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.get_kind_display()} for {self.owner}: {self.post}"
@@ -0,0 +1,280 @@
+"""
+Pagination for the blog list views.
+
+Two modes, picked per view or globally through ``BLOG_PAGINATION['MODE']``:
+
+* ``'page'`` - classic ``?page=N`` pagination. ``CachedCountPaginator``
+  caches the COUNT(*) so rendering ``num_pages`` does not hit the database
+  on every request.
+* ``'cursor'`` - keyset pagination on an ordering such as
+  ``('-published_date', '-id')``. Pages are fetched with a WHERE clause on
+  the last row seen, so deep pages cost the same as the first one.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import Http404
+
+from . import versions
+
+DEFAULTS = {
+    'PAGINATE_BY': 10,
+    'MODE': 'page',
+    'COUNT_CACHE_TIMEOUT': 60,
+}
+
+
+def pagination_setting(name):
+    return getattr(settings, 'BLOG_PAGINATION', {}).get(name, DEFAULTS[name])
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator whose object count is cached, keyed on the SQL it counts and
+    on the model's version (see blog/versions.py), which advances whenever
+    its rows change.
+    """
+
+    @property
+    def count(self):
+        if '_cached_count' not in self.__dict__:
+            self._cached_count = self._get_count()
+        return self._cached_count
+
+    def _count_key(self):
+        object_list = self.object_list
+        sql, params = object_list.query.sql_with_params()
+        digest = hashlib.md5(f'{sql}|{params!r}'.encode()).hexdigest()
+        return f'blog:paginator-count:{versions.version(object_list.model)}:{digest}'
+
+    def _get_count(self):
+        object_list = self.object_list
+        if not hasattr(object_list, 'query'):
+            # a list, or a sequence that counts itself (search.SearchResults)
+            return object_list.count() if hasattr(object_list, 'acount') else len(object_list)
+        try:
+            key = self._count_key()
+        except EmptyResultSet:
+            return 0
+        count = cache.get(key)
+        if count is None:
+            count = object_list.count()
+            cache.set(key, count, pagination_setting('COUNT_CACHE_TIMEOUT'))
+        return count
+
+    async def acount(self):
+        """Async ``count``; afterwards ``count`` is answered from memory."""
+        if '_cached_count' not in self.__dict__:
+            object_list = self.object_list
+            if not hasattr(object_list, 'query'):
+                count = await object_list.acount() if hasattr(object_list, 'acount') else len(object_list)
+            else:
+                try:
+                    key = self._count_key()
+                except EmptyResultSet:
+                    key, count = None, 0
+                if key is not None:
+                    count = await cache.aget(key)
+                    if count is None:
+                        count = await object_list.acount()
+                        await cache.aset(key, count, pagination_setting('COUNT_CACHE_TIMEOUT'))
+            self._cached_count = count
+        return self._cached_count
+
+
+class KeysetPage:
+    """The page object handed to templates in cursor mode."""
+
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Slices a queryset by comparing against the boundary row of the previous
+    page. ``ordering`` must end with a unique field (normally ``-id``) and
+    all fields must sort in the same direction.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        directions = {field.startswith('-') for field in ordering}
+        if len(directions) != 1:
+            raise ValueError('Keyset ordering fields must all sort the same way.')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def encode_cursor(self, obj, backwards=False):
+        values = [getattr(obj, field) for field in self.fields]
+        payload = json.dumps([backwards, [self._dump(value) for value in values]])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            backwards, raw_values = json.loads(base64.urlsafe_b64decode(padded))
+            model_fields = [self.queryset.model._meta.get_field(f) for f in self.fields]
+            values = [f.to_python(v) for f, v in zip(model_fields, raw_values, strict=True)]
+        except Exception:
+            raise Http404('Invalid cursor.')
+        return bool(backwards), values
+
+    @staticmethod
+    def _dump(value):
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def _after(self, values, forwards):
+        # Row-value comparison spelled out with Q objects, e.g. for
+        # (-published_date, -id): date <= d AND (date < d OR id < i).
+        # The redundant leading bound lets the database seek straight into
+        # the (published_date, id) index instead of scanning from the top.
+        lookup = 'lt' if self.descending == forwards else 'gt'
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            term = Q(**{f'{field}__{lookup}': values[i]})
+            for prev_field, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_field: prev_value})
+            condition |= term
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def _rows(self, cursor):
+        backwards, values = self.decode_cursor(cursor) if cursor else (False, None)
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forwards=not backwards))
+        if backwards:
+            ordering = [f[1:] if f.startswith('-') else f'-{f}' for f in self.ordering]
+        else:
+            ordering = self.ordering
+        # One extra row tells us whether another page exists.
+        return queryset.order_by(*ordering)[:self.per_page + 1], backwards, values
+
+    def page(self, cursor=None):
+        rows, backwards, values = self._rows(cursor)
+        return self._page(list(rows), backwards, values)
+
+    async def apage(self, cursor=None):
+        rows, backwards, values = self._rows(cursor)
+        return self._page([row async for row in rows], backwards, values)
+
+    def _page(self, rows, backwards, values):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(rows[-1])
+            if values is not None and (has_more or not backwards):
+                previous_cursor = self.encode_cursor(rows[0], backwards=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class PaginationMixin:
+    """
+    ListView mixin adding configurable page/cursor pagination.
+
+    Set ``keyset_ordering`` to enable cursor mode for a view; views without
+    it (e.g. ranked search results) always use page mode.
+    """
+
+    paginator_class = CachedCountPaginator
+    pagination_mode = None
+    keyset_ordering = None
+
+    def get_paginate_by(self, queryset):
+        return self.paginate_by or pagination_setting('PAGINATE_BY')
+
+    def get_pagination_mode(self):
+        if self.keyset_ordering is None:
+            return 'page'
+        if 'cursor' in self.request.GET:
+            return 'cursor'
+        return self.pagination_mode or pagination_setting('MODE')
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        page = paginator.page(self.request.GET.get('cursor') or None)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        context['pagination_query'] = params.urlencode()
+        return context
+
+
+class AsyncPaginationMixin(PaginationMixin):
+    """
+    ``PaginationMixin`` for async list views: ``apaginate_queryset`` runs the
+    count and page queries with the async ORM, and ``paginate_queryset``
+    then hands its result to ``get_context_data``.
+    """
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() == 'cursor':
+            paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+            page = await paginator.apage(self.request.GET.get('cursor') or None)
+            self._paginated = (paginator, page, page.object_list, page.has_other_pages())
+            return self._paginated
+
+        paginator = self.get_paginator(
+            queryset, page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        await paginator.acount()
+        self._counted_paginator = paginator
+        # page number checks use the count fetched above
+        paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        page.object_list = await alist(page.object_list)
+        self._paginated = (paginator, page, page.object_list, is_paginated)
+        return self._paginated
+
+    def get_paginator(self, *args, **kwargs):
+        return getattr(self, '_counted_paginator', None) or super().get_paginator(*args, **kwargs)
+
+    def paginate_queryset(self, queryset, page_size):
+        if hasattr(self, '_paginated'):
+            return self._paginated
+        return super().paginate_queryset(queryset, page_size)
+
+
+async def alist(items):
+    """Evaluate a queryset (or any iterable) without blocking the event loop."""
+    if hasattr(items, '__aiter__'):
+        return [item async for item in items]
+    return list(items)
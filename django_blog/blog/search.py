@@ -0,0 +1,326 @@
+"""
+Full-text search index for blog posts.
+
+SQLite keeps an FTS5 virtual table (``blog_post_fts``) whose rowid is the
+post id; PostgreSQL keeps a side table (``blog_post_search``) holding a
+weighted tsvector with a GIN index. Both are kept in sync from signals in
+``blog.signals`` and can be rebuilt with ``manage.py rebuild_search_index``.
+On any other database (or if the index table is missing) search falls back
+to the old ``icontains`` query.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+SQLITE_TABLE = 'blog_post_fts'
+POSTGRES_TABLE = 'blog_post_search'
+
+# Sentinels wrapped around matches by the database, swapped for <mark>
+# tags after the snippet has been HTML-escaped.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SNIPPET_WORDS = 24
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_TABLE} USING fts5("
+    "title, content, tags, tokenize = 'porter unicode61')",
+]
+SQLITE_DROP = [f"DROP TABLE IF EXISTS {SQLITE_TABLE}"]
+
+POSTGRES_CREATE = [
+    f"CREATE TABLE IF NOT EXISTS {POSTGRES_TABLE} ("
+    "post_id bigint PRIMARY KEY REFERENCES blog_post (id) ON DELETE CASCADE, "
+    "title text NOT NULL, content text NOT NULL, tags text NOT NULL, "
+    "document tsvector NOT NULL)",
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_TABLE}_document_idx "
+    f"ON {POSTGRES_TABLE} USING GIN (document)",
+]
+POSTGRES_DROP = [f"DROP TABLE IF EXISTS {POSTGRES_TABLE}"]
+
+# Title matches outrank tag matches, which outrank body matches.
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('english', %s), 'A') || "
+    "setweight(to_tsvector('english', %s), 'B') || "
+    "setweight(to_tsvector('english', %s), 'C')"
+)
+
+_available = {}
+
+
+def backend(using=None):
+    """Return 'sqlite', 'postgresql' or None for the active search index."""
+    conn = using or connection
+    if conn.vendor not in ('sqlite', 'postgresql'):
+        return None
+    if conn.alias not in _available:
+        table = SQLITE_TABLE if conn.vendor == 'sqlite' else POSTGRES_TABLE
+        with conn.cursor() as cursor:
+            tables = conn.introspection.table_names(cursor)
+        _available[conn.alias] = table in tables
+    return conn.vendor if _available[conn.alias] else None
+
+
+def create_index(schema_editor):
+    """Create the index table for the migrating database (no-op elsewhere)."""
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+    _available.pop(schema_editor.connection.alias, None)
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+    _available.pop(schema_editor.connection.alias, None)
+
+
+def _tag_text(post):
+    return ' '.join(post.tags.values_list('name', flat=True))
+
+
+def index_post(post, tags=None):
+    """Insert or replace the index row for ``post``."""
+    if tags is None:
+        tags = _tag_text(post)
+    index_posts([(post, tags)])
+
+
+def index_posts(entries):
+    """
+    Insert or replace the index rows for ``(post, tag text)`` pairs, with a
+    few statements for the whole list.
+    """
+    kind = backend()
+    if kind is None or not entries:
+        return
+    with connection.cursor() as cursor:
+        if kind == 'sqlite':
+            cursor.executemany(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [[post.pk] for post, _ in entries])
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, title, content, tags) VALUES (%s, %s, %s, %s)",
+                [[post.pk, post.title, post.content, tags] for post, tags in entries],
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (post_id, title, content, tags, document) "
+                f"VALUES (%s, %s, %s, %s, {POSTGRES_DOCUMENT}) "
+                "ON CONFLICT (post_id) DO UPDATE SET title = EXCLUDED.title, "
+                "content = EXCLUDED.content, tags = EXCLUDED.tags, document = EXCLUDED.document",
+                [[post.pk, post.title, post.content, tags, post.title, tags, post.content] for post, tags in entries],
+            )
+
+
+def unindex_post(post_id):
+    kind = backend()
+    if kind is None:
+        return
+    table, column = (SQLITE_TABLE, 'rowid') if kind == 'sqlite' else (POSTGRES_TABLE, 'post_id')
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {column} = %s", [post_id])
+
+
+def rebuild_index(batch_size=500):
+    """Re-index every post. Returns the number of posts indexed."""
+    from .models import Post
+
+    kind = backend()
+    if kind is None:
+        return 0
+    table = SQLITE_TABLE if kind == 'sqlite' else POSTGRES_TABLE
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+    count, batch = 0, []
+    posts = Post.objects.prefetch_related('tags').order_by('pk')
+    for post in posts.iterator(chunk_size=batch_size):
+        batch.append((post, ' '.join(tag.name for tag in post.tags.all())))
+        if len(batch) == batch_size:
+            index_posts(batch)
+            count += len(batch)
+            batch = []
+    index_posts(batch)
+    return count + len(batch)
+
+
+def _terms(query):
+    return re.findall(r'\w+', query)
+
+
+def _sqlite_match(terms):
+    # Each term is quoted (so FTS5 operators in user input are inert) and
+    # prefix-matched; terms are implicitly ANDed.
+    return ' '.join('"%s"*' % term.replace('"', '""') for term in terms)
+
+
+def _render_snippet(raw):
+    if not raw:
+        return ''
+    html = escape(raw).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def _tsquery(terms):
+    return ' & '.join(f"{term}:*" for term in terms)
+
+
+def _ranked_ids(query, limit=None, offset=0):
+    terms = _terms(query)
+    if not terms:
+        return []
+    kind = backend()
+    with connection.cursor() as cursor:
+        if kind == 'sqlite':
+            cursor.execute(
+                f"SELECT rowid, bm25({SQLITE_TABLE}, 10.0, 1.0, 5.0) AS rank, "
+                f"snippet({SQLITE_TABLE}, 1, %s, %s, '…', %s) "
+                f"FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s "
+                "ORDER BY rank, rowid LIMIT %s OFFSET %s",
+                # a negative LIMIT is no limit in SQLite
+                [MARK_START, MARK_END, SNIPPET_WORDS, _sqlite_match(terms), -1 if limit is None else limit, offset],
+            )
+            # bm25() is lower-is-better; flip it so callers always see
+            # higher-is-better.
+            return [(pk, -rank, snippet) for pk, rank, snippet in cursor.fetchall()]
+        # ts_headline() is slow, so it only runs on the page's rows
+        cursor.execute(
+            "SELECT post_id, rank, ts_headline('english', content, q, %s) FROM ("
+            "SELECT post_id, ts_rank(document, q) AS rank, content, q "
+            f"FROM {POSTGRES_TABLE}, to_tsquery('english', %s) q "
+            "WHERE document @@ q ORDER BY rank DESC, post_id LIMIT %s OFFSET %s"
+            ") page ORDER BY rank DESC, post_id",
+            [
+                f"StartSel={MARK_START}, StopSel={MARK_END}, MaxWords={SNIPPET_WORDS}, MinWords=8",
+                _tsquery(terms),
+                limit,
+                offset,
+            ],
+        )
+        return cursor.fetchall()
+
+
+def _fallback(query):
+    from .models import Post
+
+    return Post.objects.filter(
+        Q(title__icontains=query) |
+        Q(content__icontains=query) |
+        Q(tags__name__icontains=query)
+    ).distinct()
+
+
+def count_posts(query):
+    """The number of posts ``search_posts(query)`` returns in all."""
+    if backend() is None:
+        return _fallback(query).count()
+    terms = _terms(query)
+    if not terms:
+        return 0
+    with connection.cursor() as cursor:
+        if backend() == 'sqlite':
+            cursor.execute(
+                f"SELECT count(*) FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s", [_sqlite_match(terms)],
+            )
+        else:
+            cursor.execute(
+                f"SELECT count(*) FROM {POSTGRES_TABLE} WHERE document @@ to_tsquery('english', %s)",
+                [_tsquery(terms)],
+            )
+        return cursor.fetchone()[0]
+
+
+def search_posts(query, limit=None, offset=0):
+    """
+    Return posts matching ``query`` as a list, best match first, skipping
+    ``offset`` of them and returning at most ``limit``.
+
+    Each post carries ``search_rank`` (higher is better) and
+    ``search_snippet`` (safe HTML with matches wrapped in ``<mark>``).
+    """
+    from .models import Post
+
+    stop = None if limit is None else offset + limit
+    if backend() is None:
+        results = list(
+            _fallback(query).select_related('author').prefetch_related('tags')
+            .order_by('-published_date', '-id')[offset:stop]
+        )
+        for post in results:
+            post.search_rank = None
+            post.search_snippet = ''
+        return results
+
+    ranked = _ranked_ids(query, limit, offset)
+    by_id = Post.objects.select_related('author').prefetch_related('tags').in_bulk([pk for pk, _, _ in ranked])
+    results = []
+    for pk, rank, snippet in ranked:
+        post = by_id.get(pk)
+        if post is None:
+            continue
+        post.search_rank = rank
+        post.search_snippet = _render_snippet(snippet)
+        results.append(post)
+    return results
+
+
+class SearchResults:
+    """
+    ``search_posts(query)`` for Paginator, evaluated lazily: ``count()`` runs
+    ``count_posts`` and a slice runs the ranked query with that LIMIT and
+    OFFSET, loading only its posts.
+    """
+
+    def __init__(self, text, offset=0, limit=None):
+        self.text = text
+        self.offset = offset
+        self.limit = limit
+        self._count = None
+        self._results = None
+
+    def count(self):
+        if self._count is None:
+            if self._results is not None:
+                self._count = len(self._results)
+            else:
+                count = max(count_posts(self.text) - self.offset, 0)
+                self._count = count if self.limit is None else min(count, self.limit)
+        return self._count
+
+    async def acount(self):
+        return await sync_to_async(self.count)()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self._fetch()[key]
+        start, stop = key.start or 0, key.stop
+        if start < 0 or (stop is not None and stop < 0) or key.step not in (None, 1):
+            raise ValueError('Search results only take non-negative, unstepped slices.')
+        if self.limit is not None:
+            stop = self.limit if stop is None else min(stop, self.limit)
+        limit = None if stop is None else max(stop - start, 0)
+        return SearchResults(self.text, self.offset + start, limit)
+
+    def _fetch(self):
+        if self._results is None:
+            self._results = [] if self.limit == 0 else search_posts(self.text, self.limit, self.offset)
+        return self._results
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    async def __aiter__(self):
+        # the ranked lookup is raw FTS SQL, which has no async cursor
+        for post in await sync_to_async(self._fetch)():
+            yield post
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __bool__(self):
+        return bool(self._fetch())
@@ -1,5 +1,7 @@
 from rest_framework import serializers
-from .models import Post, User, Profile
+from taggit.models import Tag
+from taggit.serializers import TagListSerializerField
+from .models import Post, User, Profile, Comment
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,8 +10,17 @@ class UserSerializer(serializers.ModelSerializer):
                  'bio', 'location', 'birth_date', 'profile_picture']
         read_only_fields = ['id', 'username'] 
 
+class AuthorSerializer(serializers.ModelSerializer):
+    """Public, read-only view of a post or comment author."""
+    class Meta:
+        model = User
+        fields = ['id', 'username']
+        read_only_fields = fields
+
 class PostSerializer(serializers.ModelSerializer):
-    author = UserSerializer(read_only = True)
+    # expects a queryset with select_related('author') and prefetch_related('tags')
+    author = AuthorSerializer(read_only=True)
+    tags = TagListSerializerField(read_only=True)
 
     class Meta:
         model=Post
@@ -18,14 +29,29 @@ class PostSerializer(serializers.ModelSerializer):
             'title', 
             'content', 
             'author', 
-            'author_id',
-            'created_date', 
             'published_date', 
-            'status'
+            'comment_count',
+            'tags',
         ]
-        read_only_fields = ['id', 'created_date']
+        read_only_fields = fields
+
+class CommentSerializer(serializers.ModelSerializer):
+    author = AuthorSerializer(read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'post', 'author', 'content', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class TagSerializer(serializers.ModelSerializer):
+    post_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'slug', 'post_count']
+        read_only_fields = fields
 
 class ProfileSerializer(serializers.ModelSerializer):
     class Meta:
         model=Profile
-        fields ='__all__'
\ No newline at end of file
+        fields ='__all__'
@@ -0,0 +1,241 @@
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from taggit.models import Tag as TaggitTag, TaggedItem
+
+from . import autocomplete, fragments, search, tasks, timeline, versions, viewcounts
+from .models import Comment, Follow, Post, TagCount
+
+
+# SEARCH INDEX
+@receiver(post_save, sender=Post)
+def index_post_on_save(sender, instance, **kwargs):
+    search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_on_delete(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def reindex_post_on_tags_changed(sender, instance, action, **kwargs):
+    # taggit's generic TaggedItem is shared by every tagged model
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=TaggitTag)
+def reindex_posts_on_tag_rename(sender, instance, created, **kwargs):
+    if created:
+        return
+    for post in Post.objects.filter(tags=instance).prefetch_related('tags'):
+        search.index_post(post, tags=' '.join(tag.name for tag in post.tags.all()))
+
+
+# COMMENT COUNTERS
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1
+    )
+
+
+# POST VIEWS
+# Not a model change: views_count stays out of versions and fragments, so
+# counting views does not invalidate any cache.
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    viewcounts.flush_if_due()
+
+
+# TAG COUNTS
+# TaggedItem rows are written one by one on tags.add() and deleted with
+# signals on tags.remove()/clear() and when a post is deleted, so counting
+# them here covers every path.
+def _is_post_tag(item):
+    return item.content_type_id == ContentType.objects.get_for_model(Post).pk
+
+
+@receiver(post_save, sender=TaggedItem)
+def increment_tag_count(sender, instance, created, **kwargs):
+    if created and _is_post_tag(instance):
+        TagCount.objects.bulk_create([TagCount(tag_id=instance.tag_id)], ignore_conflicts=True)
+        TagCount.objects.filter(tag_id=instance.tag_id).update(post_count=F('post_count') + 1)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def decrement_tag_count(sender, instance, **kwargs):
+    if _is_post_tag(instance):
+        TagCount.objects.filter(tag_id=instance.tag_id, post_count__gt=0).update(
+            post_count=F('post_count') - 1
+        )
+
+
+# TIMELINES (fan-out on write, see blog/timeline.py)
+# Writing one entry per follower can take a while, so it is queued (see
+# blog/tasks.py); the key keeps a re-saved row from queuing it twice.
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        tasks.fan_out_post.enqueue(
+            key=f'fan-out-post:{instance.pk}', post_id=instance.pk, created_at=timezone.now().isoformat(),
+        )
+
+
+@receiver(post_save, sender=Comment)
+def fan_out_comment(sender, instance, created, **kwargs):
+    if created:
+        tasks.fan_out_comment.enqueue(key=f'fan-out-comment:{instance.pk}', comment_id=instance.pk)
+        tasks.notify_comment.enqueue(key=f'notify-comment:{instance.pk}', comment_id=instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.follower_id, instance.followed_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_timeline(sender, instance, **kwargs):
+    timeline.remove_author(instance.follower_id, instance.followed_id)
+
+
+# CHANGE TRACKING (cached counts, API ETags)
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Comment)
+def bump_version(sender, instance, **kwargs):
+    versions.bump(sender)
+    if sender is Comment:
+        # Post.comment_count changes through a signal-free UPDATE
+        versions.bump(Post)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def bump_version_on_tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Post):
+        versions.bump(Post)
+        versions.bump(TaggitTag)
+
+
+@receiver(post_save, sender=TaggitTag)
+@receiver(post_delete, sender=TaggitTag)
+def bump_version_on_tag_change(sender, instance, **kwargs):
+    versions.bump(TaggitTag)
+    versions.bump(Post)
+
+
+# post pages show whether the reader follows the author
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_version_on_follow(sender, instance, **kwargs):
+    versions.bump(Follow)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_version_on_user_save(sender, instance, created, **kwargs):
+    # posts and comments embed their author's username (see note_username_change)
+    if not created and getattr(instance, '_username_changed', False):
+        versions.bump(Post)
+        versions.bump(Comment)
+
+
+# HOME PAGE FRAGMENTS
+@receiver(post_save, sender=Post)
+def invalidate_home_on_post_save(sender, instance, created, **kwargs):
+    fragments.invalidate_recent_activity()
+    if created:
+        fragments.invalidate_first_post()
+    else:
+        # a renamed post shows up in its commenters' "recent comments"
+        commenters = Comment.objects.filter(post=instance).values_list('author_id', flat=True).distinct()
+        fragments.invalidate_user_comments(*commenters)
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_home_on_post_delete(sender, instance, **kwargs):
+    fragments.invalidate_recent_activity()
+    fragments.invalidate_first_post()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_home_on_comment_change(sender, instance, **kwargs):
+    fragments.invalidate_recent_activity()
+    fragments.invalidate_user_comments(instance.author_id)
+
+
+@receiver(pre_save, sender=get_user_model())
+def note_username_change(sender, instance, update_fields=None, **kwargs):
+    # most user saves (every login writes last_login) leave the username alone
+    if instance.pk is None or (update_fields is not None and 'username' not in update_fields):
+        instance._username_changed = False
+        return
+    previous = sender._default_manager.filter(pk=instance.pk).values_list('username', flat=True).first()
+    instance._username_changed = previous is not None and previous != instance.username
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_home_on_user_save(sender, instance, created, **kwargs):
+    # recent activity prints author usernames
+    if not created and getattr(instance, '_username_changed', False):
+        fragments.invalidate_recent_activity()
+
+
+# SEARCH SUGGESTIONS
+# Applied on commit, so a rolled back write never shows up as a suggestion.
+@receiver(post_save, sender=Post)
+def suggest_post(sender, instance, **kwargs):
+    pk, title = instance.pk, instance.title
+    transaction.on_commit(lambda: autocomplete.index.add(autocomplete.POST, pk, title, pk))
+
+
+@receiver(post_delete, sender=Post)
+def unsuggest_post(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.index.remove(autocomplete.POST, pk))
+
+
+@receiver(post_save, sender=TaggedItem)
+def suggest_tag_on_first_use(sender, instance, created, **kwargs):
+    if created and _is_post_tag(instance) and not autocomplete.is_indexed(autocomplete.TAG, instance.tag_id):
+        tag = instance.tag
+        transaction.on_commit(lambda: autocomplete.index.add(autocomplete.TAG, tag.pk, tag.name, tag.slug))
+
+
+@receiver(post_delete, sender=TaggedItem)
+def unsuggest_unused_tag(sender, instance, **kwargs):
+    if _is_post_tag(instance) and autocomplete.is_indexed(autocomplete.TAG, instance.tag_id):
+        pk = instance.tag_id
+
+        def remove_if_unused():
+            if not TagCount.objects.filter(tag_id=pk, post_count__gt=0).exists():
+                autocomplete.index.remove(autocomplete.TAG, pk)
+
+        transaction.on_commit(remove_if_unused)
+
+
+@receiver(post_save, sender=TaggitTag)
+def suggest_renamed_tag(sender, instance, **kwargs):
+    if autocomplete.is_indexed(autocomplete.TAG, instance.pk):
+        pk, name, slug = instance.pk, instance.name, instance.slug
+        transaction.on_commit(lambda: autocomplete.index.add(autocomplete.TAG, pk, name, slug))
+
+
+@receiver(post_delete, sender=TaggitTag)
+def unsuggest_tag(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.index.remove(autocomplete.TAG, pk))
@@ -1,4 +1,33 @@
 // Basic example script to demonstrate dynamic behavior
 document.addEventListener('DOMContentLoaded', function() {
     console.log('Blog page loaded');
-});
\ No newline at end of file
+});
+
+// Search bar suggestions, served from the in-memory index (blog/autocomplete.py)
+document.addEventListener('DOMContentLoaded', function() {
+    const input = document.querySelector('input[data-suggest-url]');
+    if (!input) {
+        return;
+    }
+    const list = document.getElementById(input.getAttribute('list'));
+    let timer = null;
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        timer = setTimeout(function() {
+            const query = input.value.trim();
+            if (!query) {
+                list.replaceChildren();
+                return;
+            }
+            fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(query))
+                .then(function(response) { return response.json(); })
+                .then(function(data) {
+                    list.replaceChildren(...data.results.map(function(result) {
+                        const option = document.createElement('option');
+                        option.value = result.label;
+                        return option;
+                    }));
+                });
+        }, 100);
+    });
+});
@@ -0,0 +1,55 @@
+"""
+Background work for the blog, queued from the signal handlers and views
+and run by the taskqueue worker (``manage.py run_tasks``). Every task takes
+ids rather than objects, and does nothing if the object is gone by the time
+it runs.
+"""
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+
+from taskqueue.queue import task
+
+from . import images, timeline
+from .models import Comment, Post
+
+
+@task
+def fan_out_post(post_id, created_at):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        timeline.fan_out_post(post, created_at=parse_datetime(created_at))
+
+
+@task
+def fan_out_comment(comment_id):
+    comment = Comment.objects.select_related('post', 'parent').filter(pk=comment_id).first()
+    if comment is not None:
+        timeline.fan_out_comment(comment)
+
+
+@task
+def notify_comment(comment_id):
+    """Email the post's author, and the author of the comment replied to."""
+    comment = (
+        Comment.objects.select_related('author', 'post__author', 'parent__author')
+        .filter(pk=comment_id).first()
+    )
+    if comment is None:
+        return
+    recipients = {comment.post.author}
+    if comment.parent_id:
+        recipients.add(comment.parent.author)
+    recipients.discard(comment.author)
+    url = settings.BLOG_SITE_URL + reverse('post-detail', kwargs={'pk': comment.post_id})
+    body = f'{comment.author.username} wrote:\n\n{comment.content}\n\n{url}'
+    send_mass_mail([
+        (f'New comment on "{comment.post.title}"', body, None, [user.email])
+        for user in recipients if user.email
+    ])
+
+
+@task(max_attempts=3)
+def build_picture_variants(profile_id, source_name):
+    images.generate_variants(profile_id, source_name)
@@ -1,3 +1,1444 @@
-from django.test import TestCase
+"""
+Tests for the blog app.
+"""
+import asyncio
+from datetime import date
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import autocomplete, fragments, images, loadtest, search, timeline, urls, versions, viewcounts
+from .models import Comment, Follow, Post, Profile, TagCount
+
+
+def run_tasks(**options):
+    """Run the queued background tasks in this process (see taskqueue)."""
+    options.setdefault('concurrency', 0)
+    call_command('run_tasks', burst=True, stdout=StringIO(), **options)
+
+
+class PostSearchTests(TestCase):
+    """Test suite for the full-text post search."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.django_post = Post.objects.create(
+            title='Django signals explained',
+            content='Signals let decoupled apps get notified when actions occur.',
+            author=self.user,
+        )
+        self.python_post = Post.objects.create(
+            title='Python generators',
+            content='Generators are lazy iterators. Django uses them in querysets.',
+            author=self.user,
+        )
+        self.python_post.tags.add('performance')
+
+    def test_index_is_available(self):
+        """Test that the migration created an index on SQLite/PostgreSQL."""
+        self.assertIn(search.backend(), ('sqlite', 'postgresql'))
+
+    def test_title_match_ranks_first(self):
+        """Test that a title match outranks a body match."""
+        results = search.search_posts('django')
+        self.assertEqual(results, [self.django_post, self.python_post])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
+
+    def test_prefix_match(self):
+        """Test that partial words match while typing."""
+        self.assertEqual(search.search_posts('gener'), [self.python_post])
+
+    def test_tag_match_follows_tag_changes(self):
+        """Test that the index is updated when tags are added and removed."""
+        self.assertEqual(search.search_posts('performance'), [self.python_post])
+        self.python_post.tags.remove('performance')
+        self.assertEqual(search.search_posts('performance'), [])
+        self.django_post.tags.add('performance')
+        self.assertEqual(search.search_posts('performance'), [self.django_post])
+
+    def test_index_follows_post_update_and_delete(self):
+        """Test that saving and deleting a post updates the index."""
+        self.django_post.title = 'Celery tasks'
+        self.django_post.save()
+        self.assertEqual(search.search_posts('celery'), [self.django_post])
+        self.django_post.delete()
+        self.assertEqual(search.search_posts('celery'), [])
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        """Test that snippets escape post HTML and mark the matches."""
+        Post.objects.create(title='Markup', content='<script>x</script> unicorn', author=self.user)
+        snippet = search.search_posts('unicorn')[0].search_snippet
+        self.assertIn('<mark>unicorn</mark>', snippet)
+        self.assertNotIn('<script>', snippet)
+
+    def test_query_syntax_is_inert(self):
+        """Test that FTS operators typed by users do not raise errors."""
+        self.assertEqual(search.search_posts('"django* ('), [self.django_post, self.python_post])
+        self.assertEqual(search.search_posts('!!!'), [])
+
+    def test_rebuild_index(self):
+        """Test rebuilding the index from scratch."""
+        self.assertEqual(search.rebuild_index(), 2)
+        self.assertEqual(search.search_posts('signals'), [self.django_post])
+
+    def test_search_view(self):
+        """Test the search page renders ranked results."""
+        response = self.client.get(reverse('search'), {'q': 'generators'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['posts']), [self.python_post])
+        self.assertContains(response, '<mark>')
+
+    def test_search_pages_past_the_old_cap(self):
+        """Test that every match is counted and reachable, a page of rows at a time."""
+        Post.objects.bulk_create(
+            Post(title=f'Bulk widget {i}', content='Body', author=self.user) for i in range(205)
+        )
+        search.rebuild_index()
+        self.assertEqual(search.count_posts('widget'), 205)
+        everything = search.search_posts('widget')
+        self.assertEqual(search.search_posts('widget', limit=5, offset=200), everything[200:])
+
+        # the count, one page of ranked ids, its posts and their tags
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('search'), {'q': 'widget', 'page': 21})
+        self.assertContains(response, 'Found 205 result(s)')
+        self.assertEqual(list(response.context['posts']), everything[200:])
+
+
+class PostListQueryTests(TestCase):
+    """Test suite for the post list comment counters and query count."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(title=f'Post {i}', content='Body', author=self.user)
+            Comment.objects.create(post=post, author=self.user, content='First!')
+
+    def test_comment_count_follows_comments(self):
+        """Test that creating and deleting comments updates the counter."""
+        post = Post.objects.create(title='Counted', content='Body', author=self.user)
+        first = Comment.objects.create(post=post, author=self.user, content='One')
+        Comment.objects.create(post=post, author=self.user, content='Two')
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 2)
+
+        first.content = 'Edited'
+        first.save()
+        first.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+    def test_post_list_query_count_is_constant(self):
+        """Test that the list page costs the same queries for 2 or 10 posts."""
+        # one COUNT for the paginator, one SELECT for the page
+        self.create_posts(2)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts-list'))
+        self.assertContains(response, '💬 1', count=2)
+
+        self.create_posts(8)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('posts-list'))
+        self.assertContains(response, '💬 1', count=10)
+
+
+@override_settings(BLOG_PAGINATION={'PAGINATE_BY': 3, 'MODE': 'page', 'COUNT_CACHE_TIMEOUT': 300})
+class PaginationTests(TestCase):
+    """Test suite for page and cursor pagination of the list views."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        # Several posts share a date so the id tie-breaker matters
+        self.posts = []
+        for i in range(7):
+            post = Post.objects.create(title=f'Post {i}', content='Body', author=self.user)
+            self.posts.append(post)
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[:4]]).update(published_date=date(2024, 1, 1))
+        self.newest_first = sorted(
+            Post.objects.all(), key=lambda p: (p.published_date, p.pk), reverse=True
+        )
+
+    def walk_cursor(self, url):
+        seen = []
+        response = self.client.get(url, {'cursor': ''})
+        while True:
+            seen.extend(response.context['posts'])
+            page = response.context['page_obj']
+            if not page.has_next():
+                return seen, response
+            response = self.client.get(url, {'cursor': page.next_cursor})
+
+    def test_page_mode(self):
+        """Test that page mode splits the list and caches the count."""
+        response = self.client.get(reverse('posts-list'), {'page': 3})
+        self.assertEqual(list(response.context['posts']), self.newest_first[6:])
+        self.assertEqual(response.context['paginator'].num_pages, 3)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts-list'), {'page': 2})
+
+    def test_cached_count_invalidated_on_create(self):
+        """Test that adding a post refreshes the cached count."""
+        self.client.get(reverse('posts-list'))
+        Post.objects.create(title='Another', content='Body', author=self.user)
+        response = self.client.get(reverse('posts-list'))
+        self.assertEqual(response.context['paginator'].count, 8)
+
+    def test_cursor_mode_visits_every_post_once(self):
+        """Test walking all pages forwards with the keyset cursor."""
+        seen, _ = self.walk_cursor(reverse('posts-list'))
+        self.assertEqual(seen, self.newest_first)
+
+    def test_cursor_mode_previous_page(self):
+        """Test stepping back from the last cursor page."""
+        _, last = self.walk_cursor(reverse('posts-list'))
+        page = last.context['page_obj']
+        response = self.client.get(reverse('posts-list'), {'cursor': page.previous_cursor})
+        self.assertEqual(list(response.context['posts']), self.newest_first[3:6])
+        self.assertTrue(response.context['page_obj'].has_previous())
+
+    def test_cursor_mode_runs_no_count(self):
+        """Test that cursor pages skip the COUNT query."""
+        with self.assertNumQueries(1):
+            self.client.get(reverse('posts-list'), {'cursor': ''})
+
+    def test_invalid_cursor(self):
+        """Test that a garbage cursor is a 404, not a server error."""
+        response = self.client.get(reverse('posts-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_comment_list_cursor_mode(self):
+        """Test keyset pagination of a post's comments, in thread order."""
+        post = self.posts[0]
+        comments = [Comment.objects.create(post=post, author=self.user, content=str(i)) for i in range(5)]
+        response = self.client.get(reverse('post-comments', kwargs={'pk': post.pk}), {'cursor': ''})
+        self.assertEqual(list(response.context['comments']), comments[:3])
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('post-comments', kwargs={'pk': post.pk}), {'cursor': next_cursor})
+        self.assertEqual(list(response.context['comments']), comments[3:])
+
+    def test_search_is_paginated(self):
+        """Test that ranked search results are split into pages."""
+        response = self.client.get(reverse('search'), {'q': 'post', 'page': 3})
+        self.assertEqual(len(response.context['posts']), 1)
+        self.assertContains(response, 'Found 7 result(s)')
+        self.assertContains(response, 'q=post&amp;page=1')
+
+
+class HomeCacheTests(TestCase):
+    """Test suite for the cached home page fragments."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.other = User.objects.create_user(username='reader', password='testpass123')
+        self.post = Post.objects.create(title='Cached post', content='Body', author=self.user)
+
+    def test_anonymous_home_is_served_from_cache(self):
+        """Test that a repeat anonymous hit runs no queries."""
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Cached post')
+
+    def test_new_post_invalidates_recent_activity(self):
+        """Test that creating a post shows up on the next hit."""
+        self.client.get(reverse('home'))
+        Post.objects.create(title='Fresh post', content='Body', author=self.user)
+        self.assertContains(self.client.get(reverse('home')), 'Fresh post')
+
+    def test_post_rename_invalidates_recent_activity(self):
+        """Test that editing a post refreshes the cached titles."""
+        self.client.get(reverse('home'))
+        self.post.title = 'Renamed post'
+        self.post.save()
+        self.assertContains(self.client.get(reverse('home')), 'Renamed post')
+
+    def test_comment_invalidates_fragments(self):
+        """Test that a comment refreshes recent activity and its author's list."""
+        self.client.force_login(self.other)
+        self.client.get(reverse('home'))
+        Comment.objects.create(post=self.post, author=self.other, content='Nice read')
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Nice read', count=2)
+
+    def test_user_fragments_are_per_user(self):
+        """Test that one user's cached comments never leak to another."""
+        Comment.objects.create(post=self.post, author=self.other, content='Reader comment')
+        self.client.force_login(self.other)
+        self.client.get(reverse('home'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, "You haven't made any comments yet")
+
+    def test_first_post_link_follows_deletes(self):
+        """Test that deleting the first post moves the comment link."""
+        second = Post.objects.create(title='Second', content='Body', author=self.user)
+        self.client.force_login(self.user)
+        self.client.get(reverse('home'))
+        self.post.delete()
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, reverse('comment-create', kwargs={'pk': second.pk}))
+
+    def test_login_keeps_recent_activity(self):
+        """Test that signing in (which saves last_login) leaves the shared fragment cached."""
+        self.client.get(reverse('home'))
+        key = fragments.fragment_key(fragments.RECENT_ACTIVITY)
+        self.assertIsNotNone(cache.get(key))
+        self.client.login(username='reader', password='testpass123')
+        self.assertIsNotNone(cache.get(key))
+
+        self.other.username = 'renamed'
+        self.other.save()
+        self.assertIsNone(cache.get(key))
+
+
+class QueryPlanTests(TestCase):
+    """Test suite for the blog ordering indexes."""
+
+    def test_blog_queries_use_index_order(self):
+        """Test that no blog listing sorts rows in a temporary structure."""
+        user = User.objects.create_user(username='writer', password='testpass123')
+        post = Post.objects.create(title='Indexed', content='Body', author=user)
+        Comment.objects.create(post=post, author=user, content='Hi')
+        out = StringIO()
+        call_command('explain_blog_queries', '--fail-on-sort', stdout=out)
+        self.assertIn('comment_thread_idx', out.getvalue())
+
+
+# one test process: local memory is shared by every request
+@override_settings(BLOG_SHARED_CACHE=True)
+class BlogAPITests(TestCase):
+    """Test suite for the read-only REST API."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'API post {i}', content='Body', author=self.user)
+            for i in range(3)
+        ]
+        self.posts[0].tags.add('django', 'api')
+        Comment.objects.create(post=self.posts[0], author=self.user, content='Hi')
+
+    def test_post_list_shape_and_queries(self):
+        """Test nested authors and tags without per-row queries."""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('api-post-list'))
+        self.assertEqual(response.status_code, 200)
+        first = response.json()['results'][-1]
+        self.assertEqual(first['author'], {'id': self.user.id, 'username': 'writer'})
+        self.assertEqual(sorted(first['tags']), ['api', 'django'])
+        self.assertEqual(first['comment_count'], 1)
+
+    def test_post_list_cursor_pagination(self):
+        """Test walking the post list with cursor links."""
+        response = self.client.get(reverse('api-post-list'), {'page_size': 2})
+        data = response.json()
+        self.assertEqual(len(data['results']), 2)
+        data = self.client.get(data['next']).json()
+        self.assertEqual([p['id'] for p in data['results']], [self.posts[0].id])
+        self.assertIsNone(data['next'])
+
+    def test_conditional_get_returns_304(self):
+        """Test that an unchanged list answers If-None-Match with a 304."""
+        response = self.client.get(reverse('api-post-list'))
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('api-post-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_after_write(self):
+        """Test that editing a post, comment or tag produces a new ETag."""
+        url = reverse('api-post-list')
+        etag = self.client.get(url)['ETag']
+        self.posts[1].title = 'Changed'
+        self.posts[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.posts[1], author=self.user, content='More')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)['ETag']
+        self.posts[2].tags.add('new')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_comment_list_filtered_by_post(self):
+        """Test listing comments of one post."""
+        response = self.client.get(reverse('api-comment-list'), {'post': self.posts[1].id})
+        self.assertEqual(response.json()['results'], [])
+        response = self.client.get(reverse('api-comment-list'), {'post': self.posts[0].id})
+        self.assertEqual(response.json()['results'][0]['content'], 'Hi')
+        for value in ('abc', '0', '9' * 30):
+            response = self.client.get(reverse('api-comment-list'), {'post': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('post', response.json())
+
+    def test_tag_list_counts_posts(self):
+        """Test the tag list with per-tag post counts."""
+        self.posts[1].tags.add('django')
+        results = self.client.get(reverse('api-tag-list')).json()['results']
+        self.assertEqual({t['name']: t['post_count'] for t in results}, {'api': 1, 'django': 2})
+
+
+class ProfilePictureTests(TransactionTestCase):
+    """Test suite for the background profile picture pipeline."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='writer', password='testpass123', email='w@example.com')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        run_tasks()
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, size=(1200, 900)):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', size, 'teal').save(buffer, 'PNG')
+        picture = SimpleUploadedFile('me.png', buffer.getvalue(), content_type='image/png')
+        return self.client.post(reverse('profile'), {
+            'username': 'writer', 'email': 'w@example.com', 'profile_pic': picture,
+        })
+
+    def test_upload_builds_variants_in_background(self):
+        """Test that an upload produces every resized WebP variant."""
+        response = self.upload()
+        self.assertRedirects(response, reverse('profile'))
+        # the worker's thread pool, as in production
+        run_tasks(concurrency=1)
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertEqual(set(profile.picture_variants), set(images.VARIANTS))
+        from PIL import Image
+        for name, edge in images.VARIANTS.items():
+            with Image.open(f'{self.media_root}/{images.VARIANT_DIR}/{profile.picture_variants[name]}') as variant:
+                self.assertEqual(variant.format, 'WEBP')
+                self.assertEqual(max(variant.size), edge)
+
+    def test_original_is_used_until_variants_exist(self):
+        """Test the fallback URL before the worker has finished."""
+        profile = Profile.objects.create(user=self.user, profile_pic='profile/me.png')
+        self.assertEqual(profile.small_url, profile.profile_pic.url)
+
+    def test_variants_are_served_immutable(self):
+        """Test the long-lived cache headers on a served variant."""
+        self.upload()
+        run_tasks()
+        profile = Profile.objects.get(user=self.user)
+        response = self.client.get(profile.small_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_unknown_picture_is_404(self):
+        """Test that only content-hashed variant names are served."""
+        response = self.client.get(reverse('profile-picture', kwargs={'name': '..secret.webp'}))
+        self.assertEqual(response.status_code, 404)
+
+
+class TagTests(TestCase):
+    """Test suite for tag counts, the tag cloud and posts by tag."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.first = Post.objects.create(title='First', content='Body', author=self.user)
+        self.second = Post.objects.create(title='Second', content='Body', author=self.user)
+        self.first.tags.add('django', 'python')
+        self.second.tags.add('django')
+
+    def counts(self):
+        return dict(TagCount.objects.values_list('tag__name', 'post_count'))
+
+    def test_counts_follow_add_and_remove(self):
+        """Test that tag counts change incrementally with tags.add/remove."""
+        self.assertEqual(self.counts(), {'django': 2, 'python': 1})
+        self.second.tags.remove('django')
+        self.second.tags.add('python', 'orm')
+        self.assertEqual(self.counts(), {'django': 1, 'python': 2, 'orm': 1})
+
+    def test_counts_follow_set_clear_and_delete(self):
+        """Test tags.set(), tags.clear() and deleting a tagged post."""
+        self.first.tags.set(['orm'])
+        self.assertEqual(self.counts(), {'django': 1, 'python': 0, 'orm': 1})
+        self.second.tags.clear()
+        self.first.delete()
+        self.assertEqual(self.counts(), {'django': 0, 'python': 0, 'orm': 0})
+
+    def test_posts_by_tag(self):
+        """Test listing the posts carrying a tag."""
+        response = self.client.get(reverse('posts-by-tag', kwargs={'tag_slug': 'python'}))
+        self.assertEqual(list(response.context['posts']), [self.first])
+        self.assertContains(response, 'Posts tagged "python"')
+
+    def test_posts_by_unknown_tag_is_404(self):
+        """Test that an unknown slug is a 404."""
+        response = self.client.get(reverse('posts-by-tag', kwargs={'tag_slug': 'nope'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_cloud(self):
+        """Test the cloud lists used tags by name, weighted by count, in one query."""
+        self.second.tags.remove('django')
+        self.second.tags.add('zeta')
+        self.first.tags.remove('python')
+        self.second.tags.add('python')
+        self.first.tags.add('zeta')
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('tag-cloud'))
+        tags = response.context['tags']
+        self.assertEqual([t.tag.name for t in tags], ['django', 'python', 'zeta'])
+        self.assertEqual([t.weight for t in tags], [1, 1, 5])
+
+    def test_create_post_with_tags(self):
+        """Test that the post form saves tags."""
+        self.client.force_login(self.user)
+        self.client.post(reverse('posts-create'), {'title': 'Tagged', 'content': 'Body', 'tags': 'orm, django'})
+        self.assertEqual(self.counts()['django'], 3)
+        self.assertEqual(self.counts()['orm'], 1)
+
+
+class ImportExportTests(TestCase):
+    """Test suite for the blog_export / blog_import commands."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123', email='w@example.com')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        for i in range(5):
+            post = Post.objects.create(title=f'Exported {i}', content=f'Body {i}', author=self.user)
+            post.tags.add('export', f'tag{i % 2}')
+            Comment.objects.create(post=post, author=self.reader, content=f'Comment {i}')
+        Post.objects.update(published_date=date(2023, 5, 17))
+
+    def export(self):
+        out = StringIO()
+        call_command('blog_export', stdout=out, chunk_size=2)
+        return out.getvalue()
+
+    def test_export_format(self):
+        """Test that every row becomes one JSON line, dependencies first."""
+        import json
+        records = [json.loads(line) for line in self.export().splitlines()]
+        kinds = [r['type'] for r in records]
+        self.assertEqual(kinds, ['author'] * 2 + ['tag'] * 3 + ['post'] * 5 + ['comment'] * 5)
+        post = records[5]
+        self.assertEqual(post['author'], 'writer')
+        self.assertEqual(post['published_date'], '2023-05-17')
+        self.assertEqual(sorted(post['tags']), ['export', 'tag0'])
+
+    def test_round_trip(self):
+        """Test importing an export into an empty database, in small batches."""
+        dump = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dump:
+            dump.write(self.export())
+        self.addCleanup(lambda: __import__('os').remove(dump.name))
+        User.objects.all().delete()
+        self.assertFalse(Post.objects.exists())
+
+        call_command('blog_import', dump.name, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(User.objects.get(username='writer').email, 'w@example.com')
+        self.assertFalse(User.objects.get(username='reader').has_usable_password())
+        self.assertEqual(set(Post.objects.values_list('published_date', flat=True)), {date(2023, 5, 17)})
+        self.assertEqual(set(Post.objects.values_list('comment_count', flat=True)), {1})
+        counts = dict(TagCount.objects.values_list('tag__name', 'post_count'))
+        self.assertEqual(counts, {'export': 5, 'tag0': 3, 'tag1': 2})
+        post = Post.objects.get(title='Exported 3')
+        self.assertEqual(post.comments.get().content, 'Comment 3')
+        self.assertEqual(sorted(post.tags.names()), ['export', 'tag1'])
+        self.assertEqual({p.title for p in search.search_posts('tag1')}, {'Exported 1', 'Exported 3'})
+
+    def test_import_rejects_unknown_records(self):
+        """Test that a malformed line stops the import with a clear error."""
+        from django.core.management.base import CommandError
+        dump = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dump:
+            dump.write('{"type": "widget"}\n')
+        self.addCleanup(lambda: __import__('os').remove(dump.name))
+        with self.assertRaisesMessage(CommandError, 'Line 1'):
+            call_command('blog_import', dump.name, stdout=StringIO())
+
+    def import_lines(self, records, **options):
+        import json
+        dump = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dump:
+            dump.writelines(json.dumps(record) + '\n' for record in records)
+        self.addCleanup(lambda: __import__('os').remove(dump.name))
+        err = StringIO()
+        call_command('blog_import', dump.name, stdout=StringIO(), stderr=err, **options)
+        return err.getvalue()
+
+    def test_import_dedupes_emails_ignoring_case(self):
+        """Test that emails differing only by case do not break the import."""
+        err = self.import_lines([
+            {'type': 'author', 'username': 'alice', 'email': 'Alice@Example.com'},
+            {'type': 'author', 'username': 'alice2', 'email': 'alice@example.COM'},
+            {'type': 'author', 'username': 'copycat', 'email': 'W@EXAMPLE.COM'},
+        ])
+        emails = dict(User.objects.filter(username__in=['alice', 'alice2', 'copycat']).values_list('username', 'email'))
+        self.assertEqual(emails, {'alice': 'Alice@Example.com', 'alice2': '', 'copycat': ''})
+        self.assertIn('alice2', err)
+        self.assertIn('copycat', err)
+
+    def test_import_indexes_posts_in_batches(self):
+        """Test that imported posts are indexed with a few statements per batch."""
+        records = [
+            {'type': 'post', 'author': 'writer', 'title': f'Imported {i}', 'content': 'Body', 'tags': []}
+            for i in range(20)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.import_lines(records, batch_size=50)
+        index_queries = [q for q in queries if search.SQLITE_TABLE in q['sql'] or search.POSTGRES_TABLE in q['sql']]
+        self.assertLessEqual(len(index_queries), 2)
+        self.assertEqual(len(search.search_posts('imported')), 20)
+
+
+class CommentThreadTests(TestCase):
+    """Test suite for threaded comments (materialized path)."""
+
+    def setUp(self):
+        # buffered views would be flushed during some later test
+        self.addCleanup(viewcounts.flush)
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Threads', content='Body', author=self.user)
+        self.first = Comment.objects.create(post=self.post, author=self.user, content='first')
+        self.second = Comment.objects.create(post=self.post, author=self.user, content='second')
+        self.reply = Comment.objects.create(parent=self.first, author=self.user, content='reply')
+        self.nested = Comment.objects.create(parent=self.reply, author=self.user, content='nested')
+
+    def test_paths(self):
+        """Test that a reply's path extends its parent's and inherits the post."""
+        self.reply.refresh_from_db()
+        self.assertEqual(self.reply.post, self.post)
+        self.assertEqual(self.reply.depth, 1)
+        self.assertEqual(self.reply.path, f'{self.first.path}/{self.reply.pk:010d}')
+        self.assertEqual(Comment.objects.get(pk=self.nested.pk).depth, 2)
+
+    def test_thread_is_one_ordered_query(self):
+        """Test that the thread loads depth-first, authors included, in one query."""
+        with self.assertNumQueries(1):
+            thread = [(c.content, c.depth, c.author.username) for c in Comment.thread(self.post)]
+        self.assertEqual(thread, [
+            ('first', 0, 'writer'), ('reply', 1, 'writer'), ('nested', 2, 'writer'), ('second', 0, 'writer'),
+        ])
+
+    def test_depth_is_capped(self):
+        """Test that replies past MAX_DEPTH stay at the deepest level."""
+        comment = self.nested
+        for i in range(Comment.MAX_DEPTH + 2):
+            comment = Comment.objects.create(parent=comment, author=self.user, content=f'deep {i}')
+        self.assertEqual(comment.depth, Comment.MAX_DEPTH - 1)
+        self.assertLessEqual(len(comment.path), Comment._meta.get_field('path').max_length)
+
+    def test_deleting_a_comment_deletes_its_replies(self):
+        """Test that a subtree is removed with its root and the count follows."""
+        self.first.delete()
+        self.assertEqual(list(Comment.objects.values_list('content', flat=True)), ['second'])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_reply_view(self):
+        """Test that replying through the view attaches to the parent's thread."""
+        self.client.login(username='writer', password='testpass123')
+        response = self.client.post(reverse('comment-reply', args=[self.second.pk]), {'content': 'answer'})
+        self.assertRedirects(response, reverse('post-detail', args=[self.post.pk]))
+        answer = Comment.objects.get(content='answer')
+        self.assertEqual((answer.parent, answer.post, answer.depth), (self.second, self.post, 1))
+
+        response = self.client.get(reverse('post-detail', args=[self.post.pk]))
+        self.assertEqual(
+            [c.content for c in response.context['comments']],
+            ['first', 'reply', 'nested', 'second', 'answer'],
+        )
+
+    def test_export_import_keeps_threads(self):
+        """Test that an import rebuilds the same tree under new ids."""
+        out = StringIO()
+        call_command('blog_export', stdout=out)
+        Post.objects.all().delete()
+        dump = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False)
+        with dump:
+            dump.write(out.getvalue())
+        self.addCleanup(lambda: __import__('os').remove(dump.name))
+
+        call_command('blog_import', dump.name, batch_size=10, stdout=StringIO())
+
+        post = Post.objects.get()
+        self.assertEqual(post.comment_count, 4)
+        self.assertEqual(
+            [(c.content, c.depth) for c in Comment.thread(post)],
+            [('first', 0), ('reply', 1), ('nested', 2), ('second', 0)],
+        )
+
+
+@override_settings(BLOG_VIEW_FLUSH_INTERVAL=3600, BLOG_VIEW_BUFFER_LIMIT=1000)
+class ViewCountTests(TestCase):
+    """Test suite for the buffered post view counter."""
+
+    def setUp(self):
+        # buffered views would be flushed during some later test
+        self.addCleanup(viewcounts.flush)
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user) for i in range(3)]
+        viewcounts.flush()
+
+    def test_views_are_buffered(self):
+        """Test that viewing a post does not write, yet shows the running count."""
+        url = reverse('post-detail', args=[self.posts[0].pk])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.context['post'].views_count, 2)
+        self.assertContains(response, '2 views')
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].views_count, 0)
+
+    def test_flush_batches_updates(self):
+        """Test that a flush issues one UPDATE per distinct increment."""
+        for post, views in zip(self.posts, (2, 2, 5)):
+            for _ in range(views):
+                viewcounts.record_view(post.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(viewcounts.flush(), 9)
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries), 2)
+        counts = dict(Post.objects.values_list('pk', 'views_count'))
+        self.assertEqual([counts[post.pk] for post in self.posts], [2, 2, 5])
+        self.assertEqual(viewcounts.pending(self.posts[0].pk), 0)
+
+    def test_flush_after_request_when_due(self):
+        """Test that the buffer is written once the limit is reached."""
+        with self.settings(BLOG_VIEW_BUFFER_LIMIT=2):
+            self.client.get(reverse('post-detail', args=[self.posts[0].pk]))
+            self.assertEqual(Post.objects.get(pk=self.posts[0].pk).views_count, 0)
+            self.client.get(reverse('post-detail', args=[self.posts[1].pk]))
+        counts = dict(Post.objects.values_list('pk', 'views_count'))
+        self.assertEqual((counts[self.posts[0].pk], counts[self.posts[1].pk]), (1, 1))
+
+    def test_missing_post_is_not_counted(self):
+        """Test that a 404 for a made-up pk leaves nothing in the buffer."""
+        response = self.client.get(reverse('post-detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(viewcounts.pending(999999), 0)
+
+    def test_post_edit_keeps_concurrent_counts(self):
+        """Test that saving the edit form does not write back stale counters."""
+        post = self.posts[0]
+        self.client.login(username='writer', password='testpass123')
+        url = reverse('post-update', args=[post.pk])
+        self.client.get(url)
+        # counted while the author was editing
+        Post.objects.filter(pk=post.pk).update(views_count=7, comment_count=3)
+        response = self.client.post(url, {'title': 'Edited', 'content': 'Body', 'tags': 'python'})
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.views_count, post.comment_count), ('Edited', 7, 3))
+        self.assertEqual(list(post.tags.names()), ['python'])
+
+
+# one test process: local memory is shared by every request
+@override_settings(BLOG_SHARED_CACHE=True)
+class ConditionalPageTests(TestCase):
+    """Test suite for ETag/Last-Modified on the HTML pages."""
+
+    def setUp(self):
+        # buffered views would be flushed during some later test
+        self.addCleanup(viewcounts.flush)
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Cached', content='Body', author=self.user)
+        Comment.objects.create(post=self.post, author=self.user, content='Hello')
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'], **headers)
+
+    def test_unchanged_pages_return_304_without_rendering(self):
+        """Test that a matching ETag skips the queries and the template."""
+        # the detail page looks up the post's updated_at, the lists only
+        # read versions from the cache
+        pages = [
+            (reverse('post-detail', args=[self.post.pk]), 1),
+            (reverse('posts-list'), 0),
+            (reverse('post-comments', args=[self.post.pk]), 0),
+            (reverse('comment-list'), 0),
+        ]
+        for url, queries in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('must-revalidate', response['Cache-Control'])
+                self.assertIn('Cookie', response['Vary'])
+                self.assertTrue(response.has_header('Last-Modified'))
+
+                with self.assertNumQueries(queries):
+                    response = self.revalidate(url, response)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+
+    def test_last_modified(self):
+        """Test that If-Modified-Since alone is enough for a 304."""
+        url = reverse('post-detail', args=[self.post.pk])
+        response = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_edit_changes_detail_etag(self):
+        """Test that saving the post or commenting on it invalidates the ETag."""
+        url = reverse('post-detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.post.title = 'Renamed'
+        self.post.save()
+        response = self.revalidate(url, response)
+        self.assertContains(response, 'Renamed')
+
+        Comment.objects.create(post=self.post, author=self.user, content='Second')
+        self.assertContains(self.revalidate(url, response), 'Second')
+
+    def test_etag_depends_on_user(self):
+        """Test that signing in changes the ETag and marks pages private."""
+        url = reverse('posts-list')
+        anonymous = self.client.get(url)
+        self.client.login(username='writer', password='testpass123')
+        response = self.revalidate(url, anonymous)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_pending_messages_are_rendered(self):
+        """Test that a page with a flash message is not answered with a 304."""
+        User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='other', password='testpass123')
+        url = reverse('post-detail', args=[self.post.pk])
+        response = self.client.get(url)
+        # not the author: redirected to the unchanged detail page with an error
+        self.client.get(reverse('post-update', args=[self.post.pk]))
+        response = self.revalidate(url, response)
+        self.assertContains(response, 'permissions to edit this post')
+
+    def test_revalidation_counts_a_view(self):
+        """Test that a 304 still records the view."""
+        url = reverse('post-detail', args=[self.post.pk])
+        viewcounts.flush()
+        response = self.client.get(url)
+        self.revalidate(url, response)
+        self.assertEqual(viewcounts.pending(self.post.pk), 2)
+
+    def test_unshared_cache_disables_conditional_get(self):
+        """Test that per-process versions never produce validators, and expire."""
+        url = reverse('posts-list')
+        with override_settings(BLOG_SHARED_CACHE=None):
+            self.assertFalse(versions.shared())
+            response = self.client.get(url)
+            self.assertFalse(response.has_header('ETag'))
+            self.assertFalse(response.has_header('Last-Modified'))
+            self.assertIn('must-revalidate', response['Cache-Control'])
+            self.assertEqual(versions._timeout(), versions.LOCAL_TIMEOUT)
+
+    def test_concurrent_bumps_get_distinct_versions(self):
+        """Test that bumps from several threads are all counted."""
+        from concurrent.futures import ThreadPoolExecutor
+        before = versions._state(Comment)[0]
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: versions.bump(Comment), range(50)))
+        self.assertEqual(versions._state(Comment)[0], before + 50)
+
+    def test_login_keeps_versions(self):
+        """Test that signing in does not invalidate every post and comment ETag."""
+        before = versions.version(Post), versions.version(Comment)
+        self.client.login(username='writer', password='testpass123')
+        self.assertEqual((versions.version(Post), versions.version(Comment)), before)
+
+        self.user.username = 'author'
+        self.user.save()
+        self.assertNotEqual(versions.version(Post), before[0])
+        self.assertNotEqual(versions.version(Comment), before[1])
+
+
+class AutocompleteTests(TestCase):
+    """Test suite for the in-memory search suggestions."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.post = Post.objects.create(title='Python generators', content='Body', author=self.user)
+        Post.objects.create(title='Profiling Django', content='Body', author=self.user)
+        self.post.tags.add('python')
+        autocomplete.index.build()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('search-suggest'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(r['type'], r['label']) for r in response.json()['results']]
+
+    def test_suggestions_match_word_prefixes(self):
+        """Test that any word of a title matches, tags listed first."""
+        self.assertEqual(self.suggest('py'), [('tag', 'python'), ('post', 'Python generators')])
+        self.assertEqual(self.suggest('GEN'), [('post', 'Python generators')])
+        self.assertEqual(self.suggest('pro'), [('post', 'Profiling Django')])
+        self.assertEqual(self.suggest('  '), [])
+
+    def test_suggestions_skip_the_database(self):
+        """Test that a built index answers without queries."""
+        with self.assertNumQueries(0):
+            self.suggest('p')
+
+    def test_index_follows_writes(self):
+        """Test that saves, renames and deletes update the index on commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(title='Generic views', content='Body', author=self.user)
+        self.assertEqual(self.suggest('gen'), [('post', 'Python generators'), ('post', 'Generic views')])
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = 'Class based views'
+            post.save()
+        self.assertEqual(self.suggest('gen'), [('post', 'Python generators')])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.suggest('gen'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            post.tags.add('generics')
+        self.assertEqual(self.suggest('gen'), [('tag', 'generics')])
+
+    @override_settings(BLOG_AUTOCOMPLETE={'MAX_POSTS': 2})
+    def test_index_is_bounded(self):
+        """Test that only the newest MAX_POSTS titles are kept."""
+        Post.objects.create(title='Newest entry', content='Body', author=self.user)
+        autocomplete.index.build()
+        self.assertEqual(self.suggest('p'), [('tag', 'python'), ('post', 'Profiling Django')])
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.create(title='Pandas', content='Body', author=self.user)
+        self.assertEqual(self.suggest('p'), [('tag', 'python'), ('post', 'Pandas')])
+
+    def test_unused_tag_is_dropped(self):
+        """Test that a tag no post uses any more stops being suggested."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.tags.remove('python')
+        self.assertEqual(self.suggest('py'), [('post', 'Python generators')])
+
+    def test_stale_index_is_rebuilt_once(self):
+        """Test that concurrent requests on a stale index share one rebuild."""
+        import threading
+        from unittest import mock
+        builds, started, release = [], threading.Event(), threading.Event()
+
+        def slow_build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+
+        autocomplete.index.built_at -= 3600
+        with mock.patch.object(autocomplete.index, 'build', slow_build):
+            rebuilding = threading.Thread(target=autocomplete.index.ensure_built)
+            rebuilding.start()
+            started.wait(5)
+            # served from the old index while the rebuild runs
+            autocomplete.index.ensure_built()
+            self.assertEqual(autocomplete.index.suggest('py')[0], ('tag', 'python', 'python'))
+            release.set()
+            rebuilding.join()
+        self.assertEqual(len(builds), 1)
+
+
+@override_settings(ROOT_URLCONF='blog.async_urls', BLOG_SHARED_CACHE=True)
+class AsyncViewTests(TestCase):
+    """Test suite for the async read views served under ASGI."""
+
+    def setUp(self):
+        # buffered views would be flushed during some later test
+        self.addCleanup(viewcounts.flush)
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.posts = [
+            Post.objects.create(title=f'Async post {i}', content='Body', author=self.user) for i in range(12)
+        ]
+        self.comment = Comment.objects.create(post=self.posts[0], author=self.user, content='First!')
+        Comment.objects.create(parent=self.comment, author=self.user, content='Reply')
+        search.rebuild_index()
+
+    def test_views_are_async(self):
+        """Test that the read routes resolve to async views."""
+        from django.urls import resolve
+        for url in ('/home/', '/posts/', f'/post/{self.posts[0].pk}/', '/comments/', '/search/'):
+            with self.subTest(url=url):
+                func = resolve(url).func
+                if hasattr(func, 'view_class'):
+                    self.assertTrue(func.view_class.view_is_async)
+                else:
+                    self.assertTrue(asyncio.iscoroutinefunction(func))
+
+    async def test_home(self):
+        """Test that the home page renders, with the user's comments."""
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('home'))
+        self.assertContains(response, 'Async post 11')
+        self.assertContains(response, 'On "Async post 0": "First!"')
+
+    async def test_post_list_pages(self):
+        """Test both pagination modes."""
+        response = await self.async_client.get(reverse('posts-list'), {'page': 2})
+        self.assertEqual(len(response.context['posts']), 2)
+        response = await self.async_client.get(reverse('posts-list'), {'cursor': ''})
+        self.assertEqual(len(response.context['posts']), 10)
+        next_cursor = response.context['page_obj'].next_cursor
+        response = await self.async_client.get(reverse('posts-list'), {'cursor': next_cursor})
+        self.assertEqual([p.title for p in response.context['posts']], ['Async post 1', 'Async post 0'])
+
+    async def test_post_detail_and_conditional_get(self):
+        """Test the detail page, its 304 and its 404."""
+        url = reverse('post-detail', args=[self.posts[0].pk])
+        response = await self.async_client.get(url)
+        self.assertEqual([c.content for c in response.context['comments']], ['First!', 'Reply'])
+        response = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        response = await self.async_client.get(reverse('post-detail', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_comment_lists(self):
+        """Test the global and per-post comment lists."""
+        response = await self.async_client.get(reverse('comment-list'))
+        self.assertEqual([c.content for c in response.context['comments']], ['Reply', 'First!'])
+        response = await self.async_client.get(reverse('post-comments', args=[self.posts[0].pk]))
+        self.assertEqual(response.context['post'], self.posts[0])
+        self.assertEqual([c.content for c in response.context['comments']], ['First!', 'Reply'])
+
+    async def test_search(self):
+        """Test that search results come back ranked."""
+        response = await self.async_client.get(reverse('search'), {'q': 'async'})
+        self.assertEqual(len(response.context['posts']), 10)
+        self.assertContains(response, 'Found 12 result(s)')
+
+
+class HandlerBenchmarkTests(TransactionTestCase):
+    """Test suite for the benchmark_handlers command."""
+
+    def test_single_interface_run(self):
+        """Test that a run reports throughput for every request made."""
+        import json
+        self.addCleanup(viewcounts.flush)
+        user = User.objects.create_user(username='writer', password='testpass123')
+        Post.objects.create(title='Benchmark', content='Body', author=user)
+        out = StringIO()
+        call_command('benchmark_handlers', interface='wsgi', requests=12, concurrency=3, json=True, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual((result['interface'], result['requests'], result['errors']), ('wsgi', 12, 0))
+        self.assertGreater(result['rps'], 0)
+
+
+class TimelineTests(TestCase):
+    """Test suite for follows and the fan-out activity feed."""
+
+    def setUp(self):
+        self.addCleanup(viewcounts.flush)
+        cache.clear()
+        self.author = User.objects.create_user(username='author', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+
+    def feed_of(self, user):
+        return list(timeline.feed(user).values_list('kind', 'actor__username', 'post__title'))
+
+    def test_new_post_reaches_followers(self):
+        """Test that a post adds an entry to every follower's feed, and only theirs."""
+        Follow.objects.create(follower=self.reader, followed=self.author)
+        Post.objects.create(title='Fresh', content='Body', author=self.author)
+        run_tasks()
+        self.assertEqual(self.feed_of(self.reader), [('post', 'author', 'Fresh')])
+        self.assertEqual(self.feed_of(self.other), [])
+        self.assertEqual(self.feed_of(self.author), [])
+
+    def test_replies_reach_post_and_parent_authors(self):
+        """Test that a reply tells the post's author and the replied-to commenter."""
+        post = Post.objects.create(title='Talk', content='Body', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.reader, content='First')
+        run_tasks()
+        self.assertEqual(self.feed_of(self.author), [('reply', 'reader', 'Talk')])
+
+        Comment.objects.create(parent=comment, author=self.other, content='Answer')
+        run_tasks()
+        self.assertEqual(self.feed_of(self.reader), [('reply', 'other', 'Talk')])
+        self.assertEqual(len(self.feed_of(self.author)), 2)
+        # replying to yourself adds nothing
+        Comment.objects.create(post=post, author=self.author, content='Thanks')
+        run_tasks()
+        self.assertEqual(len(self.feed_of(self.author)), 2)
+
+    def test_follow_backfills_and_unfollow_clears(self):
+        """Test that following copies in recent posts and unfollowing removes them."""
+        for i in range(3):
+            Post.objects.create(title=f'Old {i}', content='Body', author=self.author)
+        with override_settings(BLOG_TIMELINE={'BACKFILL': 2}):
+            follow = Follow.objects.create(follower=self.reader, followed=self.author)
+        self.assertEqual([title for _, _, title in self.feed_of(self.reader)], ['Old 2', 'Old 1'])
+
+        follow.delete()
+        self.assertEqual(self.feed_of(self.reader), [])
+
+    @override_settings(BLOG_TIMELINE={'LENGTH': 3, 'TRIM_EVERY': 1})
+    def test_feeds_are_trimmed(self):
+        """Test that a feed keeps only its newest LENGTH entries."""
+        Follow.objects.create(follower=self.reader, followed=self.author)
+        for i in range(5):
+            Post.objects.create(title=f'Post {i}', content='Body', author=self.author)
+        run_tasks()
+        self.assertEqual([title for _, _, title in self.feed_of(self.reader)], ['Post 4', 'Post 3', 'Post 2'])
+
+    def test_feed_page_is_one_query(self):
+        """Test that the feed reads entries, authors and posts in one query, a page at a time."""
+        Follow.objects.create(follower=self.reader, followed=self.author)
+        for i in range(12):
+            Post.objects.create(title=f'Post {i}', content='Body', author=self.author)
+        run_tasks()
+        self.client.login(username='reader', password='testpass123')
+        url = reverse('feed')
+        self.client.get(url)  # session and user lookups
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        feed_queries = [q['sql'] for q in queries if 'blog_timelineentry' in q['sql']]
+        self.assertEqual(len(feed_queries), 1)
+        self.assertEqual(len(response.context['entries']), 10)
+        self.assertContains(response, 'Post 11')
+
+        response = self.client.get(url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(
+            [entry.post.title for entry in response.context['entries']], ['Post 1', 'Post 0']
+        )
+
+    def test_feed_requires_login(self):
+        """Test that anonymous visitors are sent to the login page."""
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_follow_view_toggles(self):
+        """Test that the follow button follows, then unfollows."""
+        self.client.login(username='reader', password='testpass123')
+        url = reverse('author-follow', args=['author'])
+        response = self.client.post(url, {'next': '/posts/'})
+        self.assertRedirects(response, '/posts/', fetch_redirect_response=False)
+        self.assertTrue(Follow.objects.filter(follower=self.reader, followed=self.author).exists())
+
+        self.client.post(url)
+        self.assertFalse(Follow.objects.filter(follower=self.reader, followed=self.author).exists())
+
+    def test_follow_view_rejects_self_and_offsite_next(self):
+        """Test that users cannot follow themselves or be redirected off site."""
+        self.client.login(username='author', password='testpass123')
+        response = self.client.post(reverse('author-follow', args=['author']), {'next': 'https://evil.example/'})
+        self.assertRedirects(response, reverse('feed'), fetch_redirect_response=False)
+        self.assertFalse(Follow.objects.exists())
+
+    @override_settings(BLOG_SHARED_CACHE=True)
+    def test_follow_changes_detail_etag(self):
+        """Test that the follow button on the post page is not served stale."""
+        post = Post.objects.create(title='Followable', content='Body', author=self.author)
+        self.client.login(username='reader', password='testpass123')
+        url = reverse('post-detail', args=[post.pk])
+        response = self.client.get(url)
+        self.assertContains(response, '>Follow<')
+
+        Follow.objects.create(follower=self.reader, followed=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, '>Unfollow<')
+
+
+class LoadTestTests(TransactionTestCase):
+    """Test suite for the loadtest command and its baseline check."""
+
+    scale = {'users': 3, 'posts': 6, 'comments': 12, 'tags': 3}
+
+    def setUp(self):
+        self.addCleanup(viewcounts.flush)
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.baseline = f'{directory}/baseline.json'
+
+    def loadtest(self, **options):
+        import json
+        out = StringIO()
+        call_command(
+            'loadtest', use_current_db=True, requests=2, concurrency=1, json=True,
+            baseline=self.baseline, stdout=out, stderr=StringIO(), **options,
+        )
+        return json.loads(out.getvalue())
+
+    def test_seed_and_plan_cover_every_url(self):
+        """Test that every URL in blog/urls.py is requested or skipped on purpose."""
+        loadtest.seed(**self.scale)
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 12)
+        self.assertTrue(Comment.objects.filter(parent__isnull=False).exists())
+
+        planned = {name for name, _ in loadtest.plan(loadtest.bench_user())}
+        self.assertEqual(planned | loadtest.SKIPPED.keys(), {p.name for p in urls.urlpatterns})
+        self.assertFalse(planned & loadtest.SKIPPED.keys())
+
+    def test_reports_and_checks_baseline(self):
+        """Test that a run reports every page and fails once over the baseline."""
+        import json
+        result = self.loadtest(update_baseline=True, **self.scale)
+        home = result['pages']['home']
+        self.assertEqual((home['requests'], home['errors']), (2, 0))
+        self.assertLessEqual(home['p50_ms'], home['p95_ms'])
+        self.assertGreater(home['memory_kib'], 0)
+        self.assertEqual(result['regressions'], [])
+
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+        self.assertEqual(baseline['pages']['home']['queries'], home['queries'])
+        baseline['pages']['home']['queries'] = 0
+        with open(self.baseline, 'w') as f:
+            json.dump(baseline, f)
+        with self.assertRaisesMessage(CommandError, 'home: queries'):
+            self.loadtest(no_seed=True, **self.scale)
+
+
+class InstrumentationTests(TestCase):
+    """Test suite for the query and timing instrumentation middleware."""
+
+    def setUp(self):
+        self.addCleanup(viewcounts.flush)
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='testpass123')
+        self.posts = [Post.objects.create(title=f'Post {i}', content='Body', author=self.user) for i in range(6)]
+
+    def test_server_timing_header(self):
+        """Test that responses report their query count and timings."""
+        response = self.client.get(reverse('posts-list'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries, \d+ repeated"')
+        self.assertRegex(timing, r'view;dur=[\d.]+')
+
+    def test_repeated_queries_are_flagged(self):
+        """Test that running one statement many times is counted and logged."""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from django_blog.instrumentation import InstrumentationMiddleware
+
+        def n_plus_one(request):
+            for post in Post.objects.all():
+                post.author.username  # one query per post
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(n_plus_one)
+        with self.assertLogs('django_blog.instrumentation', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/n-plus-one/'))
+        self.assertIn('desc="7 queries, 5 repeated"', response['Server-Timing'])
+        self.assertIn('ran the same query 6 times', logs.output[0])
+
+    def test_histogram_window(self):
+        """Test that observations leave the histogram once the window has passed."""
+        from django_blog.instrumentation import RollingHistogram
+        histogram = RollingHistogram('test_seconds', 'Test.', (0.1, 1))
+        labels = (('route', 'x'),)
+        with override_settings(INSTRUMENTATION={'WINDOW': 60, 'SLOTS': 6}):
+            histogram.observe(labels, 0.05, now=100)
+            histogram.observe(labels, 0.5, now=125)
+            histogram.observe(labels, 5, now=125)
+            self.assertEqual(histogram.snapshot(now=130)[labels], ([1, 2, 3], 3, 5.55))
+            # the first slot has dropped out of the window
+            self.assertEqual(histogram.snapshot(now=165)[labels][:2], ([0, 1, 2], 2))
+            self.assertEqual(histogram.snapshot(now=200), {})
+
+    @override_settings(INTERNAL_IPS=['127.0.0.1'])
+    def test_metrics_endpoint(self):
+        """Test that the histograms are served in the Prometheus text format."""
+        self.client.get(reverse('posts-list'))
+        response = self.client.get('/metrics/')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE django_request_duration_seconds histogram', body)
+        self.assertIn('django_request_queries_count{method="GET",route="posts/"}', body)
+        self.assertIn('django_request_duration_seconds_bucket{method="GET",route="posts/",le="+Inf"}', body)
+
+    def test_metrics_endpoint_is_restricted(self):
+        """Test that only staff, internal addresses and the scrape token see the metrics."""
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        with override_settings(INSTRUMENTATION={'METRICS_TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.client.force_login(User.objects.create_user(username='reader', password='testpass123'))
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.client.force_login(User.objects.create_user(username='ops', password='testpass123', is_staff=True))
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+
+class EmailUniquenessTests(TestCase):
+    """Test suite for case-insensitive unique email addresses."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='writer', email='Writer@Example.com', password='testpass123')
+
+    def register(self, username, email):
+        return self.client.post(reverse('register'), {
+            'username': username, 'email': email,
+            'password1': 'a-long-Passphrase-42', 'password2': 'a-long-Passphrase-42',
+        })
+
+    def test_registration_rejects_taken_email(self):
+        """Test that sign-up refuses an address in use, whatever its case."""
+        response = self.register('newcomer', 'writer@example.COM')
+        self.assertContains(response, 'This email is already in use.')
+        self.assertRedirects(self.register('newcomer', 'newcomer@example.com'), reverse('login'))
+
+    def test_profile_update(self):
+        """Test that users keep their own address but cannot take someone else's."""
+        User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.login(username='writer', password='testpass123')
+        url = reverse('profile')
+        # renaming while keeping the address (in another case) is fine
+        response = self.client.post(url, {'username': 'renamed', 'email': 'writer@example.com'})
+        self.assertRedirects(response, url)
+        response = self.client.post(url, {'username': 'renamed', 'email': 'OTHER@example.com'})
+        self.assertContains(response, 'This email is already in use.')
+
+    def test_index_enforces_uniqueness(self):
+        """Test that the database refuses a clash the forms did not see."""
+        from django.db import IntegrityError
+        # accounts without an address are not affected
+        User.objects.create_user(username='blank1')
+        User.objects.create_user(username='blank2')
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(username='clash', email='WRITER@example.com')
+
+    def test_lookup_uses_index(self):
+        """Test that the shared email lookup is an index search on a large table."""
+        from .accounts import EMAIL_CONSTRAINT, users_with_email
+        User.objects.bulk_create(
+            [User(username=f'user{i}', email=f'User{i}@Example.com' if i % 4 else '') for i in range(20000)],
+            batch_size=2000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        plan = users_with_email('user12345@example.com').explain()
+        self.assertIn(EMAIL_CONSTRAINT.name, plan)
+        self.assertEqual(users_with_email('USER12345@example.com').get().username, 'user12345')
+
+
+class CommentNotificationTests(TestCase):
+    """Test suite for the comment side effects run by the task worker."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author', email='author@example.com', password='testpass123')
+        self.reader = User.objects.create_user(username='reader', email='reader@example.com', password='testpass123')
+        self.post = Post.objects.create(title='Queued', content='Body', author=self.author)
+        run_tasks()
+
+    def test_comment_view_only_enqueues(self):
+        """Test that posting a comment queues its emails instead of sending them."""
+        from django.core import mail
+        from taskqueue.models import Task
+        self.client.login(username='reader', password='testpass123')
+        self.client.post(reverse('comment-create', args=[self.post.pk]), {'content': 'Nice post'})
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(
+            set(Task.objects.filter(status=Task.QUEUED).values_list('name', flat=True)),
+            {'blog.tasks.fan_out_comment', 'blog.tasks.notify_comment'},
+        )
+
+        run_tasks()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['author@example.com'])
+        self.assertIn('Nice post', mail.outbox[0].body)
+        self.assertIn(f'/post/{self.post.pk}/', mail.outbox[0].body)
+
+    def test_reply_notifies_parent_author(self):
+        """Test that a reply also emails the author of the comment replied to."""
+        from django.core import mail
+        comment = Comment.objects.create(post=self.post, author=self.reader, content='First')
+        other = User.objects.create_user(username='other', email='other@example.com')
+        Comment.objects.create(parent=comment, author=other, content='Answer')
+        run_tasks()
+        recipients = sorted(address for message in mail.outbox for address in message.to)
+        # the first comment told the author; the reply told them and the reader
+        self.assertEqual(recipients, ['author@example.com', 'author@example.com', 'reader@example.com'])
+
+
+class StaticAssetTests(TestCase):
+    """Test suite for the static build (collectstatic) and its serving view."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.static_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(STATIC_ROOT=cls.static_root)
+        cls.settings_override.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        cls.styles = staticfiles_storage.stored_name('css/styles.css')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.static_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_build_writes_hashed_minified_files(self):
+        """Test that the build stores minified CSS under a content hash, with a gzip sibling."""
+        import gzip
+        import json
+        import os
+        from django.conf import settings
+        self.assertRegex(self.styles, r'^css/styles\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.static_root, 'staticfiles.json')) as manifest:
+            self.assertEqual(json.load(manifest)['paths']['css/styles.css'], self.styles)
+        with open(os.path.join(self.static_root, self.styles), 'rb') as built:
+            css = built.read()
+        with open(settings.BASE_DIR / 'static' / 'css' / 'styles.css', 'rb') as source:
+            self.assertLess(len(css), len(source.read()))
+        self.assertNotIn(b'/*', css)
+        self.assertNotIn(b'\n', css)
+        with open(os.path.join(self.static_root, self.styles + '.gz'), 'rb') as compressed:
+            self.assertEqual(gzip.decompress(compressed.read()), css)
+
+    def test_minify_css_keeps_meaning(self):
+        """Test that minifying leaves strings, descendant pseudo-classes and calc() intact."""
+        from .assets import minify_css
+        self.assertEqual(
+            minify_css('/* x */ a :hover , b > i {\n  content: "a ;  b" ;\n  width: calc(100% - 1px);\n}'),
+            'a :hover,b>i{content:"a ;  b";width:calc(100% - 1px)}',
+        )
+
+    def test_pages_link_hashed_names(self):
+        """Test that templates link the hashed file from the manifest."""
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, f'/static/{self.styles}')
+
+    def test_serves_precompressed_variant_immutable(self):
+        """Test that a hashed file is sent gzipped to clients that accept it, cached for good."""
+        response = self.client.get(f'/static/{self.styles}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        plain = self.client.get(f'/static/{self.styles}', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertNotIn(b'/*', b''.join(plain.streaming_content))
+
+    def test_unhashed_and_missing_files(self):
+        """Test that plain names are revalidated and unknown or escaping paths are 404s."""
+        response = self.client.get('/static/css/styles.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
@@ -0,0 +1,125 @@
+"""
+Per-user feeds, built on write.
+
+When an author publishes, one ``TimelineEntry`` per follower is inserted
+(``fan_out_post``); a comment adds an entry for the author of the post and
+of the comment it replies to (``fan_out_comment``). Both run as background
+tasks (blog/tasks.py) and may be repeated safely. Reading a feed is then
+a keyset page over ``(owner, created_at, id)`` - one indexed range query,
+however many authors the reader follows.
+
+Feeds are capped at ``BLOG_TIMELINE['LENGTH']`` entries. Trimming a feed
+costs two queries, so it happens on about one write in ``TRIM_EVERY`` per
+recipient and a feed may briefly hold up to that many extra entries.
+Following an author copies their latest ``BACKFILL`` posts in; unfollowing
+removes them.
+"""
+import datetime
+import random
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Follow, Post, TimelineEntry
+
+DEFAULTS = {
+    'LENGTH': 500,
+    'BACKFILL': 20,
+    'TRIM_EVERY': 10,
+    'BATCH_SIZE': 1000,
+}
+FEED_ORDERING = ('-created_at', '-id')
+
+
+def timeline_setting(name):
+    return getattr(settings, 'BLOG_TIMELINE', {}).get(name, DEFAULTS[name])
+
+
+def _write(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=timeline_setting('BATCH_SIZE'))
+    every = timeline_setting('TRIM_EVERY')
+    owners = {entry.owner_id for entry in entries}
+    trim(owner for owner in owners if every <= 1 or random.randrange(every) == 0)
+
+
+def fan_out_post(post, created_at=None):
+    """
+    Add ``post`` to the feed of everyone following its author. Feeds that
+    already hold it (a retry, or a backfill from a newer follow) are skipped.
+    """
+    created_at = created_at or timezone.now()
+    followers = (
+        Follow.objects.filter(followed_id=post.author_id)
+        .exclude(follower_id__in=TimelineEntry.objects.filter(post=post, kind=TimelineEntry.POST).values('owner_id'))
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=timeline_setting('BATCH_SIZE'))
+    )
+    batch = []
+    for follower_id in followers:
+        batch.append(TimelineEntry(
+            owner_id=follower_id, actor_id=post.author_id, kind=TimelineEntry.POST,
+            post=post, created_at=created_at,
+        ))
+        if len(batch) >= timeline_setting('BATCH_SIZE'):
+            _write(batch)
+            batch = []
+    if batch:
+        _write(batch)
+
+
+def fan_out_comment(comment):
+    """Tell the post's author, and the author of the comment replied to."""
+    owners = {comment.post.author_id}
+    if comment.parent_id:
+        owners.add(comment.parent.author_id)
+    owners.discard(comment.author_id)
+    owners.difference_update(TimelineEntry.objects.filter(comment=comment).values_list('owner_id', flat=True))
+    _write([
+        TimelineEntry(
+            owner_id=owner_id, actor_id=comment.author_id, kind=TimelineEntry.REPLY,
+            post_id=comment.post_id, comment=comment, created_at=comment.created_at,
+        )
+        for owner_id in owners
+    ])
+
+
+def backfill(follower_id, author_id):
+    """Copy the author's latest posts into a new follower's feed."""
+    posts = (
+        Post.objects.filter(author_id=author_id).order_by('-published_date', '-id')
+        .values_list('pk', 'published_date')[:timeline_setting('BACKFILL')]
+    )
+    # Posts only carry a date, so entries of one day tie on created_at and
+    # fall back to id order: insert the oldest first.
+    _write([
+        TimelineEntry(
+            owner_id=follower_id, actor_id=author_id, kind=TimelineEntry.POST, post_id=pk,
+            created_at=datetime.datetime.combine(published, datetime.time.min, tzinfo=datetime.timezone.utc),
+        )
+        for pk, published in reversed(list(posts))
+    ])
+
+
+def remove_author(follower_id, author_id):
+    TimelineEntry.objects.filter(owner_id=follower_id, actor_id=author_id, kind=TimelineEntry.POST).delete()
+
+
+def trim(owner_ids):
+    """Drop everything past the newest LENGTH entries of each owner's feed."""
+    length = timeline_setting('LENGTH')
+    for owner_id in owner_ids:
+        feed = TimelineEntry.objects.filter(owner_id=owner_id)
+        boundary = feed.order_by(*FEED_ORDERING).values_list('created_at', 'id')[length:length + 1].first()
+        if boundary is not None:
+            created_at, pk = boundary
+            feed.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=pk)).delete()
+
+
+def feed(user):
+    """The queryset a feed page is cut from, newest first."""
+    return (
+        TimelineEntry.objects.filter(owner=user)
+        .select_related('actor', 'post', 'comment')
+        .order_by(*FEED_ORDERING)
+    )
@@ -18,8 +18,13 @@ urlpatterns = [
     path('post/<int:pk>/update/', views.PostUpdateView.as_view(), name='post-update'),  
     path('post/<int:pk>/delete/', views.PostDeleteView.as_view(), name='post-delete'),  
     
+    # Follows and personal feed
+    path('feed/', views.FeedView.as_view(), name='feed'),
+    path('authors/<str:username>/follow/', views.follow_author, name='author-follow'),
+
     # Profile
     path('profile/', views.profile, name='profile'),
+    path('profile/pictures/<str:name>', views.profile_picture, name='profile-picture'),
 
     # Comment URLs - Improved version
     # List all comments (optional)
@@ -31,12 +36,21 @@ urlpatterns = [
     
     # Individual comment operations
     path('comment/<int:pk>/', views.CommentDetailView.as_view(), name='comment-detail'),
+    path('comment/<int:pk>/reply/', views.CommentReplyView.as_view(), name='comment-reply'),
     path('comment/<int:pk>/update/', views.CommentUpdateView.as_view(), name='comment-update'),
     path('comment/<int:pk>/delete/', views.CommentDeleteView.as_view(), name='comment-delete'),
 
     # Search bar
     path('search/', views.PostSearchView.as_view(), name='search'),
+    path('search/suggest/', views.search_suggestions, name='search-suggest'),
 
     # tags
+    path('tags/', views.TagCloudView.as_view(), name='tag-cloud'),
     path('tags/<slug:tag_slug>/', views.PostByTagListView.as_view(), name='posts-by-tag'),
+
+    # REST API (read-only)
+    path('api/posts/', views.PostListAPIView.as_view(), name='api-post-list'),
+    path('api/posts/<int:pk>/', views.PostDetailAPIView.as_view(), name='api-post-detail'),
+    path('api/comments/', views.CommentListAPIView.as_view(), name='api-comment-list'),
+    path('api/tags/', views.TagListAPIView.as_view(), name='api-tag-list'),
 ]
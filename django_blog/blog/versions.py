@@ -0,0 +1,94 @@
+"""
+Per-model change tracking in the cache.
+
+Every write to a tracked model bumps its version and records when it
+happened (see ``blog.signals``). Cached counts use the version to know when
+they are stale, and the conditional views turn versions into ETags and
+timestamps into Last-Modified headers.
+
+The state is only trustworthy when every process sees the same cache.
+``shared()`` tells whether it does: ``BLOG_SHARED_CACHE`` when set, else
+true for any backend but local memory and dummy. Conditional GET is only
+answered with a shared cache (blog/conditional.py); otherwise the state
+expires after ``LOCAL_TIMEOUT`` seconds, which bounds how long another
+process can serve counts cached under its old version.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+LOCAL_TIMEOUT = 5
+
+
+def shared():
+    """Whether the default cache is one store for every process."""
+    setting = getattr(settings, 'BLOG_SHARED_CACHE', None)
+    if setting is not None:
+        return setting
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_BACKENDS
+
+
+def _keys(model):
+    key = f'blog:version:{model._meta.label_lower}'
+    return f'{key}:number', f'{key}:at'
+
+
+def _timeout():
+    return None if shared() else LOCAL_TIMEOUT
+
+
+def bump(model):
+    """Record that rows of ``model`` were added, changed or removed."""
+    number_key, at_key = _keys(model)
+    timeout = _timeout()
+    # incr() is atomic on Redis and memcached, so concurrent bumps never
+    # share a number
+    cache.add(number_key, 0, timeout)
+    try:
+        cache.incr(number_key)
+    except ValueError:
+        # expired or evicted since add()
+        cache.add(number_key, 1, timeout)
+    cache.set(at_key, timezone.now(), timeout)
+
+
+def _state(model):
+    number_key, at_key = _keys(model)
+    state = cache.get_many([number_key, at_key])
+    if at_key not in state:
+        # Nothing recorded (fresh, cleared or expired cache): start a new
+        # epoch now so clients revalidate rather than trusting an old
+        # Last-Modified, and numbers counted from 0 again differ from the
+        # previous epoch's.
+        at = timezone.now().replace(microsecond=0)
+        if not cache.add(at_key, at, _timeout()):
+            at = cache.get(at_key, at)
+        state[at_key] = at
+    return state.get(number_key, 0), state[at_key]
+
+
+def version(model):
+    """A token that changes whenever rows of ``model`` do."""
+    number, at = _state(model)
+    return f'{number}.{at.timestamp()}'
+
+
+def last_modified(*models):
+    return max(_state(model)[1] for model in models)
+
+
+def etag(request, *models, extra=()):
+    """
+    An ETag for ``request`` that changes whenever any of ``models`` does, or
+    any of the ``extra`` strings.
+    """
+    parts = [request.get_full_path(), request.headers.get('Accept', '')]
+    parts += [f'{model._meta.label_lower}:{version(model)}' for model in models]
+    parts += [str(part) for part in extra]
+    return hashlib.md5('|'.join(parts).encode()).hexdigest()
@@ -0,0 +1,80 @@
+"""
+Buffered post view counting.
+
+``record_view`` only bumps an in-process counter, so a page view never
+writes to the database. The buffer is flushed into ``Post.views_count``
+with one UPDATE per distinct increment (see ``flush``), after a request
+finishes once ``BLOG_VIEW_FLUSH_INTERVAL`` seconds have
+passed since the last flush or ``BLOG_VIEW_BUFFER_LIMIT`` posts are pending
+(see signals.flush_view_counts). The flush runs after the response has been
+sent, so it never delays a page.
+
+A restart loses at most the views of one flush interval. Each process keeps
+its own buffer; the UPDATEs add to the column, so several workers can
+flush side by side.
+"""
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+_buffer = Counter()
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record_view(post_id):
+    with _lock:
+        _buffer[post_id] += 1
+
+
+def pending(post_id):
+    """Views of ``post_id`` recorded by this process but not yet written."""
+    return _buffer.get(post_id, 0)
+
+
+def is_due():
+    interval = getattr(settings, 'BLOG_VIEW_FLUSH_INTERVAL', 10)
+    limit = getattr(settings, 'BLOG_VIEW_BUFFER_LIMIT', 1000)
+    return bool(_buffer) and (
+        len(_buffer) >= limit or time.monotonic() - _last_flush >= interval
+    )
+
+
+def flush():
+    """Write the buffered views; returns the number of views written."""
+    global _last_flush
+    from .models import Post
+
+    with _lock:
+        counts = dict(_buffer)
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not counts:
+        return 0
+
+    by_amount = defaultdict(list)
+    for post_id, amount in counts.items():
+        by_amount[amount].append(post_id)
+    try:
+        with transaction.atomic():
+            for amount, post_ids in by_amount.items():
+                Post.objects.filter(pk__in=post_ids).update(views_count=F('views_count') + amount)
+    except Exception:
+        # put the views back for the next attempt
+        with _lock:
+            _buffer.update(counts)
+        logger.exception('Could not write %d buffered post views', sum(counts.values()))
+        return 0
+    return sum(counts.values())
+
+
+def flush_if_due():
+    if is_due():
+        flush()
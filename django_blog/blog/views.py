@@ -1,45 +1,83 @@
+import re
+
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, UpdateView, DetailView, ListView, DeleteView
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
 from django.contrib import messages
 from django.contrib.auth import get_user_model
-from rest_framework.generics import RetrieveUpdateAPIView
+from django.utils.cache import patch_cache_control
+from django.utils.http import url_has_allowed_host_and_scheme
+from rest_framework import serializers
+from rest_framework.generics import ListAPIView, RetrieveAPIView, RetrieveUpdateAPIView
+from rest_framework.pagination import CursorPagination
+from taggit.models import Tag
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin 
-from .models import Post, Comment
-from .serializers import UserSerializer
-from .forms import UserUpdateForm, ProfileUpdateForm, CustomUserCreationForm
-from django.db.models import Q
+from .models import Post, Comment, Follow, Profile, TagCount
+from .serializers import UserSerializer, PostSerializer, CommentSerializer, TagSerializer
+from .forms import UserUpdateForm, ProfileUpdateForm, CustomUserCreationForm, PostForm
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .search import SearchResults
+from .accounts import email_in_use
+from .conditional import ConditionalGetMixin
+from .pagination import PaginationMixin
+from . import autocomplete, fragments, images, timeline, viewcounts
 User = get_user_model()
 
+PICTURE_NAME = re.compile(r'\d+-[a-z]+-[0-9a-f]{16}\.webp')
+
 # Create your views here.
 def home(request):
-    posts = Post.objects.all().order_by('-published_date')[:5]
-    comments = Comment.objects.all().order_by('-created_at')[:5]
-    first_post = Post.objects.first()
+    # The querysets are lazy: they only run when the {% cache %} fragments
+    # in home.html miss, see blog/fragments.py.
+    posts = Post.objects.select_related('author').order_by('-published_date', '-id')[:5]
+    comments = Comment.objects.select_related('author', 'post').order_by('-created_at', '-id')[:5]
     
     user_comments = []
     if request.user.is_authenticated:
-        user_comments = Comment.objects.filter(author=request.user).order_by('-created_at')[:5]
+        user_comments = (
+            Comment.objects.filter(author=request.user)
+            .select_related('post')
+            .order_by('-created_at', '-id')[:5]
+        )
     
     context = {
         'posts': posts,
         'comments': comments,
-        'first_post': first_post,
+        'first_post_id': fragments.first_post_id(),
         'user_comments': user_comments,
+        'fragment_timeout': fragments.fragment_timeout(),
+        'fragment_version': fragments.FRAGMENT_VERSION,
     }
     return render(request, 'blog/home.html', context)
 
 class SignupView(CreateView):
     form_class = CustomUserCreationForm
     success_url = reverse_lazy('login')
-    template_name = 'registration/register.html'
+    template_name = 'blog/register.html'
+
+    def form_valid(self, form):
+        # Two sign-ups with one address can both pass clean_email; the
+        # unique email index turns the second away here.
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError:
+            if not email_in_use(form.cleaned_data['email']):
+                raise
+            form.add_error('email', 'This email is already in use.')
+            return self.form_invalid(form)
 
 # CRUD OPERATION FOR POST
 class PostsCreateView(LoginRequiredMixin, CreateView):
     model = Post
-    fields = ['title', 'content']
+    form_class = PostForm
     template_name = 'blog/post_form.html'
     success_url = reverse_lazy('posts-list')
 
@@ -47,29 +85,82 @@ class PostsCreateView(LoginRequiredMixin, CreateView):
         form.instance.author = self.request.user
         return super().form_valid(form)
     
-class PostListView(ListView):
+class PostListView(ConditionalGetMixin, PaginationMixin, ListView):
     model = Post
     template_name = 'blog/post_list.html'
     context_object_name = 'posts'
-    ordering = ['-published_date'] 
+    ordering = ['-published_date', '-id']
+    keyset_ordering = ('-published_date', '-id')
+    conditional_models = (Post,)
+    conditional_per_user = True
+
+    def get_queryset(self):
+        # comment counts come from the denormalized Post.comment_count,
+        # so a page of posts renders from this one query
+        return super().get_queryset().select_related('author')
 
-class PostDetailView(DetailView):
+class PostDetailView(ConditionalGetMixin, DetailView):
     model = Post
     template_name = 'blog/post_details.html'
     context_object_name = 'post'
+    # the post's own changes come from updated_at; the comment thread (and
+    # the counter and usernames it shows) from the Comment version, the
+    # follow button from the Follow version
+    conditional_models = (Comment, Follow)
+    conditional_per_user = True
+
+    def get_validators(self, request, *args, **kwargs):
+        updated_at = Post.objects.filter(pk=kwargs['pk']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        # a revalidated (304) view is still a view
+        self.count_view(kwargs['pk'])
+        return [updated_at.isoformat()], updated_at
+
+    def count_view(self, pk):
+        # once per request, and only once the post is known to exist
+        if self.request.method == 'GET' and not getattr(self, '_view_counted', False):
+            viewcounts.record_view(pk)
+            self._view_counted = True
 
     def get_object(self):
-        return super().get_object()
+        post = super().get_object()
+        self.count_view(post.pk)
+        # include this process's unflushed views, this one among them
+        post.views_count += viewcounts.pending(post.pk)
+        return post
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments'] = Comment.thread(self.object)
+        return context
+
+    def viewer_follows_author(self):
+        # called from the template, so async views run it off the event loop
+        return Follow.objects.filter(follower=self.request.user, followed_id=self.object.author_id).exists()
     
 class PostUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
     model = Post
-    fields = ['title', 'content']
+    form_class = PostForm
     template_name = 'blog/post_update.html'
     success_url= reverse_lazy('posts-list')
 
+    # moved by F() updates elsewhere; saving the values read with the form
+    # would undo the views and comments counted in the meantime
+    counter_fields = ('comment_count', 'views_count')
+
     def test_func(self):
         post = self.get_object()
         return self.request.user == post.author
+
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=[
+            field.name for field in Post._meta.concrete_fields
+            if not field.primary_key and field.name not in self.counter_fields
+        ])
+        form.save_m2m()
+        return redirect(self.get_success_url())
     
     def handle_no_permission(self):
         if not self.request.user.is_authenticated:
@@ -108,62 +199,145 @@ class UserProfileView(RetrieveUpdateAPIView):
 # FIXED PROFILE VIEW
 @login_required
 def profile(request):  # Changed from Profile to profile (lowercase)
+    user_profile, _ = Profile.objects.get_or_create(user=request.user)
     if request.method == 'POST':
         user_form = UserUpdateForm(request.POST, instance=request.user)
-        profile_form = ProfileUpdateForm(request.POST, request.FILES, instance=request.user.profile)
+        profile_form = ProfileUpdateForm(request.POST, request.FILES, instance=user_profile)
         
         # Fixed indentation - this should be inside the POST block
         if user_form.is_valid() and profile_form.is_valid():
             user_form.save()  # Save user data
+            new_picture = 'profile_pic' in profile_form.changed_data
+            if new_picture:
+                # serve the original until the resized copies are ready
+                profile_form.instance.picture_variants = {}
             profile_form.save()  # Save profile data
+            if new_picture:
+                images.schedule_variants(profile_form.instance)
             messages.success(request, 'Profile updated successfully!')
             return redirect('profile')
     else:
         # Handle GET request - display forms
         user_form = UserUpdateForm(instance=request.user)
-        profile_form = ProfileUpdateForm(instance=request.user.profile)
+        profile_form = ProfileUpdateForm(instance=user_profile)
     
     context = {
         'user_form': user_form,
-        'profile_form': profile_form
+        'profile_form': profile_form,
+        'profile': user_profile,
     }
     return render(request, 'blog/profile.html', context)
 
+
+def profile_picture(request, name):
+    """Serve a resized profile picture; names are content-hashed, so cache forever."""
+    if not PICTURE_NAME.fullmatch(name):
+        raise Http404
+    path = f'{images.VARIANT_DIR}/{name}'
+    if not default_storage.exists(path):
+        raise Http404
+    response = FileResponse(default_storage.open(path, 'rb'), content_type='image/webp')
+    patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    return response
+
+# FOLLOWS AND FEED
+@login_required
+@require_POST
+def follow_author(request, username):
+    """Follow ``username``, or stop following if already doing so."""
+    author = get_object_or_404(get_user_model(), username=username)
+    if author == request.user:
+        messages.error(request, "You can't follow yourself")
+    else:
+        deleted, _ = Follow.objects.filter(follower=request.user, followed=author).delete()
+        if deleted:
+            messages.success(request, f'You no longer follow {author.username}')
+        else:
+            Follow.objects.create(follower=request.user, followed=author)
+            messages.success(request, f'You now follow {author.username}')
+    next_url = request.POST.get('next')
+    if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+        next_url = 'feed'
+    return redirect(next_url)
+
+
+class FeedView(LoginRequiredMixin, PaginationMixin, ListView):
+    """New posts by followed authors and replies to the reader, newest first."""
+    template_name = 'blog/feed.html'
+    context_object_name = 'entries'
+    # a feed page is always a keyset range over the owner's index
+    pagination_mode = 'cursor'
+    keyset_ordering = timeline.FEED_ORDERING
+
+    def get_queryset(self):
+        return timeline.feed(self.request.user)
+
+
 # CRUD OPERATION FOR COMMENTS
-class CommentCreateView(CreateView):
+class CommentCreateView(LoginRequiredMixin, CreateView):
     model= Comment
     fields = ['content']
     template_name ='blog/comment_form.html'
 
+    # not ``self.post``: that would shadow the post() handler
     def dispatch(self, request, *args, **kwargs):
-        self.post = get_object_or_404(Post, pk=self.kwargs['pk'])
+        self.blog_post = get_object_or_404(Post, pk=self.kwargs['pk'])
         return super().dispatch(request, *args, **kwargs)
     
     def form_valid(self, form):
         form.instance.author = self.request.user
-        form.instance.post = self.post 
+        form.instance.post = self.blog_post
         return super().form_valid(form)
     
     def get_success_url(self):
-        return reverse_lazy('post-detail', kwargs={'pk': self.post.pk})
+        return reverse_lazy('post-detail', kwargs={'pk': self.blog_post.pk})
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['post'] = self.post
+        context['post'] = self.blog_post
+        return context
+
+
+class CommentReplyView(CommentCreateView):
+    """Reply to a comment; the reply joins the same post's thread."""
+
+    def dispatch(self, request, *args, **kwargs):
+        self.parent = get_object_or_404(Comment.objects.select_related('post'), pk=self.kwargs['pk'])
+        self.blog_post = self.parent.post
+        return super(CommentCreateView, self).dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        form.instance.parent = self.parent
+        return super().form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['parent'] = self.parent
         return context
 
-class CommentListView(ListView):
+class CommentListView(ConditionalGetMixin, PaginationMixin, ListView):
     model= Comment
     fields = ['content']
     template_name ='blog/comment_list.html'
-    context_object_name = 'comment'
-    ordering = ['-created_at']
+    context_object_name = 'comments'
+    ordering = ['-created_at', '-id']
+    keyset_ordering = ('-created_at', '-id')
+    conditional_models = (Comment, Post)
+    conditional_per_user = True
 
     def get_queryset(self):
         if 'pk' in self.kwargs:
             self.post = get_object_or_404(Post, pk=self.kwargs['pk'])
-            return Comment.objects.filter(post=self.post).order_by('-created_at')
-        return Comment.objects.all().order_by('-created_at')
+        return self.comments_queryset()
+
+    def comments_queryset(self):
+        queryset = Comment.objects.select_related('author').order_by(*self.ordering)
+        if getattr(self, 'post', None):
+            # a single post's comments are listed as a thread; path is
+            # unique, so it works as a keyset on its own
+            self.keyset_ordering = ('path',)
+            return queryset.filter(post=self.post).order_by('path')
+        return queryset
 
     
     def get_context_data(self, **kwargs):
@@ -216,22 +390,136 @@ class CommentDetailView(DetailView):
 
 
 # search view
-class PostSearchView(ListView):
+class PostSearchView(PaginationMixin, ListView):
     model = Post
     template_name = 'blog/search_results.html'
     context_object_name = 'posts'
     
     def get_queryset(self):
-        query = self.request.GET.get('q')
+        query = self.request.GET.get('q', '').strip()
         if query:
-            return Post.objects.filter(
-                Q(title__icontains=query) |
-                Q(content__icontains=query) |
-                Q(tags__name__icontains=query)
-            ).distinct().order_by('-published_date')
+            # ranked through the full-text index a page at a time, see blog/search.py
+            return SearchResults(query)
         return Post.objects.none()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['query'] = self.request.GET.get('q', '')
-        return context
\ No newline at end of file
+        return context
+
+
+def search_suggestions(request):
+    """Title and tag suggestions for the search bar, from the in-memory index."""
+    try:
+        limit = min(int(request.GET.get('limit', 10)), 20)
+    except ValueError:
+        limit = 10
+    query = request.GET.get('q', '')
+    response = JsonResponse({'query': query, 'results': autocomplete.suggest(query, max(limit, 1))})
+    patch_cache_control(response, public=True, max_age=60)
+    return response
+
+
+class PostByTagListView(PaginationMixin, ListView):
+    model = Post
+    template_name = 'blog/post_list.html'
+    context_object_name = 'posts'
+    keyset_ordering = ('-published_date', '-id')
+
+    def get_queryset(self):
+        # resolve the tag through its unique slug index first, so the post
+        # query filters on tag_id instead of joining through taggit_tag
+        self.tag = get_object_or_404(Tag, slug=self.kwargs['tag_slug'])
+        return (
+            Post.objects.filter(tags=self.tag)
+            .select_related('author')
+            .order_by('-published_date', '-id')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag'] = self.tag
+        return context
+
+
+class TagCloudView(ListView):
+    template_name = 'blog/tag_cloud.html'
+    context_object_name = 'tags'
+    # number of font-size steps in the cloud
+    weights = 5
+
+    def get_queryset(self):
+        limit = getattr(settings, 'BLOG_TAG_CLOUD_SIZE', 50)
+        return list(
+            TagCount.objects.filter(post_count__gt=0)
+            .select_related('tag')
+            .order_by('-post_count')[:limit]
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        tags = context['tags']
+        if tags:
+            low, high = tags[-1].post_count, tags[0].post_count
+            spread = max(high - low, 1)
+            for tag_count in tags:
+                tag_count.weight = 1 + round((tag_count.post_count - low) * (self.weights - 1) / spread)
+        context['tags'] = sorted(tags, key=lambda tag_count: tag_count.tag.name.lower())
+        return context
+
+
+# REST API (read-only)
+class PostCursorPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-published_date', '-id')
+
+
+class CommentCursorPagination(PostCursorPagination):
+    ordering = ('-created_at', '-id')
+
+
+class TagCursorPagination(PostCursorPagination):
+    ordering = ('name',)
+
+
+class PostListAPIView(ConditionalGetMixin, ListAPIView):
+    serializer_class = PostSerializer
+    pagination_class = PostCursorPagination
+    conditional_models = (Post, Tag)
+    queryset = Post.objects.select_related('author').prefetch_related('tags')
+
+
+class PostDetailAPIView(ConditionalGetMixin, RetrieveAPIView):
+    serializer_class = PostSerializer
+    conditional_models = (Post, Tag)
+    queryset = Post.objects.select_related('author').prefetch_related('tags')
+
+
+class CommentListAPIView(ConditionalGetMixin, ListAPIView):
+    serializer_class = CommentSerializer
+    pagination_class = CommentCursorPagination
+    conditional_models = (Comment,)
+    post_filter = serializers.IntegerField(min_value=1, max_value=2 ** 63 - 1)
+
+    def get_queryset(self):
+        queryset = Comment.objects.select_related('author')
+        post = self.request.query_params.get('post')
+        if post:
+            try:
+                post = self.post_filter.run_validation(post)
+            except serializers.ValidationError as exc:
+                raise serializers.ValidationError({'post': exc.detail})
+            queryset = queryset.filter(post_id=post)
+        return queryset
+
+
+class TagListAPIView(ConditionalGetMixin, ListAPIView):
+    serializer_class = TagSerializer
+    pagination_class = TagCursorPagination
+    conditional_models = (Tag,)
+
+    def get_queryset(self):
+        # post counts are materialized in TagCount
+        return Tag.objects.filter(blog_count__post_count__gt=0).annotate(post_count=F('blog_count__post_count'))
@@ -41,9 +41,11 @@ INSTALLED_APPS = [
     'blog',
     'rest_framework',
     'taggit',
+    'taskqueue',
 ]
 
 MIDDLEWARE = [
+    'django_blog.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -89,6 +91,38 @@ DATABASES = {
 
 
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# BLOG_CACHE_BACKEND picks local memory (default), a shared file cache or
+# Redis. Bump BLOG_CACHE_VERSION to orphan every key written by older code.
+# Conditional GET needs a cache every process shares (blog/versions.py);
+# set BLOG_SHARED_CACHE to override the guess made from the backend.
+
+BLOG_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+BLOG_CACHE_BACKEND = os.environ.get('BLOG_CACHE_BACKEND', 'locmem')
+BLOG_CACHE_LOCATIONS = {
+    'locmem': 'django_blog',
+    'file': str(BASE_DIR / 'cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': BLOG_CACHE_BACKENDS[BLOG_CACHE_BACKEND],
+        'LOCATION': os.environ.get('BLOG_CACHE_LOCATION', BLOG_CACHE_LOCATIONS[BLOG_CACHE_BACKEND]),
+        'KEY_PREFIX': 'django_blog',
+        'VERSION': int(os.environ.get('BLOG_CACHE_VERSION', 1)),
+    }
+}
+
+# Home page fragments are invalidated by signals; this is only a safety net.
+BLOG_FRAGMENT_CACHE_TIMEOUT = 600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -129,6 +163,89 @@ STATICFILES_DIRS = [
     BASE_DIR / "static",
 ]
 
+# `manage.py collectstatic` is the build: it writes minified, content-hashed
+# files with .gz (and .br, with the brotli package) siblings and a manifest
+# to STATIC_ROOT, served by blog/assets.py with a year-long Cache-Control.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'blog.assets.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# User uploads (profile pictures)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Background tasks (taskqueue app), run by `manage.py run_tasks`. Failed
+# tasks are retried after BACKOFF_BASE * 2**(attempt - 1) seconds, at most
+# BACKOFF_MAX, until MAX_ATTEMPTS; a task running longer than LEASE seconds
+# is assumed lost and queued again.
+TASKQUEUE = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'POLL_INTERVAL': 1,
+    'LEASE': 600,
+    'KEEP_FINISHED': 7 * 24 * 3600,
+}
+
+# Links in notification emails
+BLOG_SITE_URL = os.environ.get('BLOG_SITE_URL', 'http://localhost:8000')
+
+
+# Blog list pagination, see blog/pagination.py.
+# MODE is 'page' (?page=N, cached counts) or 'cursor' (keyset, no OFFSET).
+BLOG_PAGINATION = {
+    'PAGINATE_BY': 10,
+    'MODE': 'page',
+    'COUNT_CACHE_TIMEOUT': 300,
+}
+
+# Post views are buffered in memory and written every FLUSH_INTERVAL seconds
+# or once BUFFER_LIMIT posts are pending, see blog/viewcounts.py
+BLOG_VIEW_FLUSH_INTERVAL = 10
+BLOG_VIEW_BUFFER_LIMIT = 1000
+
+# Search-bar suggestions, see blog/autocomplete.py. The index holds the
+# newest MAX_POSTS titles and MAX_TAGS most used tags, and is rebuilt every
+# MAX_AGE seconds to pick up writes from other processes.
+BLOG_AUTOCOMPLETE = {
+    'MAX_POSTS': 10000,
+    'MAX_TAGS': 5000,
+    'MAX_AGE': 600,
+}
+
+# Per-request SQL and timing numbers, see django_blog/instrumentation.py.
+# Histograms at /metrics/ cover the last WINDOW seconds; a request running
+# one statement DUPLICATE_LIMIT times is logged as a likely N+1.
+INSTRUMENTATION = {
+    'WINDOW': 60,
+    'SLOTS': 6,
+    'DUPLICATE_LIMIT': 5,
+    # /metrics/ is open to staff, INTERNAL_IPS and this bearer token
+    'METRICS_TOKEN': os.environ.get('INSTRUMENTATION_METRICS_TOKEN'),
+}
+
+# Activity feeds, see blog/timeline.py. Each feed keeps the newest LENGTH
+# entries (trimmed on about one write in TRIM_EVERY); following an author
+# copies in their latest BACKFILL posts.
+BLOG_TIMELINE = {
+    'LENGTH': 500,
+    'BACKFILL': 20,
+    'TRIM_EVERY': 10,
+    'BATCH_SIZE': 1000,
+}
+
+# Serve the async read views (blog/async_views.py); asgi.py turns this on
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASYNC_VIEWS', '0') == '1'
+
+# Most used tags shown in the tag cloud
+BLOG_TAG_CLOUD_SIZE = 50
 
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'  # Redirect to home page after login
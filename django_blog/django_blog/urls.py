@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from blog import assets
+from django_blog import instrumentation
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', include('blog.urls'))
-]
+    path('metrics/', instrumentation.metrics, name='metrics'),
+    path(f"{settings.STATIC_URL.lstrip('/')}<path:path>", assets.serve, name='static-asset'),
+    path('', include('blog.async_urls' if settings.BLOG_ASYNC_VIEWS else 'blog.urls'))
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TaskQueueConfig(AppConfig):
+    name = 'taskqueue'
+    verbose_name = 'Task queue'
+
+    def ready(self):
+        # register the @task functions of every app (``<app>/tasks.py``)
+        autodiscover_modules('tasks')
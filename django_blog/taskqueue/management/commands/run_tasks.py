@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from taskqueue.worker import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Run queued background tasks (see taskqueue/queue.py). Stops on '
+        'SIGINT/SIGTERM once the running tasks are done.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread')
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help="Tasks run at once; 0 runs them one by one in the worker's own thread.",
+        )
+        parser.add_argument('--name', help='Worker name recorded on claimed tasks (default host:pid).')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due.')
+
+    def handle(self, *args, **options):
+        worker = Worker(pool=options['pool'], concurrency=options['concurrency'], name=options['name'])
+        if not options['burst']:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: worker.stop())
+        processed = worker.run(burst=options['burst'])
+        self.stdout.write(f'Processed {processed} task{"s" if processed != 1 else ""}.')
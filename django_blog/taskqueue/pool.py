@@ -0,0 +1,15 @@
+"""
+Entry points for ``run_tasks --pool process``. Pool processes are spawned
+from a bare interpreter and unpickle these functions before Django is set
+up, so this module imports nothing from Django at the top.
+"""
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def execute(task_id):
+    from .worker import execute_in_pool
+    return execute_in_pool(task_id)
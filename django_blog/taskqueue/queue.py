@@ -0,0 +1,83 @@
+"""
+A small database-backed task queue.
+
+Functions decorated with ``@task`` (in an app's ``tasks.py``, found when the
+app registry loads) can be queued with ``enqueue`` or ``func.enqueue``.
+Arguments are keyword-only and must be JSON serializable. Queuing inserts a
+``Task`` row in the caller's transaction, so a request that rolls back
+leaves no task behind and the worker only sees committed work.
+
+An ``idempotency key`` makes a second enqueue return the first task instead
+of adding another, e.g. one notification per comment however often the
+signal fires. Tasks may still run more than once (a worker can die after
+the work but before recording it), so they should be safe to repeat.
+
+``run_tasks`` (taskqueue/worker.py) runs them; failures are retried with
+exponential backoff up to the task's ``max_attempts``.
+"""
+import datetime
+import functools
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Task
+
+DEFAULTS = {
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 10,
+    'BACKOFF_MAX': 3600,
+    'POLL_INTERVAL': 1,
+    'LEASE': 600,
+    'KEEP_FINISHED': 7 * 24 * 3600,
+}
+
+registry = {}
+
+
+def queue_setting(name):
+    return getattr(settings, 'TASKQUEUE', {}).get(name, DEFAULTS[name])
+
+
+def task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def task(func=None, *, max_attempts=None):
+    """Register ``func`` as a task; adds ``func.enqueue(**kwargs)``."""
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    func.task_name = task_name(func)
+    func.max_attempts = max_attempts
+    func.enqueue = functools.partial(enqueue, func)
+    registry[func.task_name] = func
+    return func
+
+
+def enqueue(func, *, key=None, delay=None, **kwargs):
+    """
+    Queue a call of the task ``func`` (the function or its registered name)
+    with ``kwargs``, ``delay`` seconds from now.
+    """
+    name = func if isinstance(func, str) else getattr(func, 'task_name', None)
+    if name not in registry:
+        raise LookupError(f'{func!r} is not a registered task')
+    fields = {
+        'name': name,
+        'kwargs': kwargs,
+        'max_attempts': registry[name].max_attempts or queue_setting('MAX_ATTEMPTS'),
+        'run_at': timezone.now() + datetime.timedelta(seconds=delay or 0),
+    }
+    if key is None:
+        return Task.objects.create(**fields)
+    try:
+        with transaction.atomic():
+            return Task.objects.create(idempotency_key=key, **fields)
+    except IntegrityError:
+        return Task.objects.get(idempotency_key=key)
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a task that failed ``attempts`` times."""
+    return min(queue_setting('BACKOFF_MAX'), queue_setting('BACKOFF_BASE') * 2 ** (attempts - 1))
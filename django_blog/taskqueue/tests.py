@@ -0,0 +1,138 @@
+import datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .queue import enqueue, task
+from .worker import Worker
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=3)
+def explode():
+    raise ValueError('boom')
+
+
+def run_tasks(**options):
+    options.setdefault('concurrency', 0)
+    out = StringIO()
+    call_command('run_tasks', burst=True, stdout=out, **options)
+    return out.getvalue()
+
+
+class QueueTests(TestCase):
+    """Test suite for enqueuing and running tasks in process."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Test that the worker runs queued tasks with their arguments."""
+        first = record.enqueue(value='a')
+        enqueue('taskqueue.tests.record', value='b')
+        self.assertEqual(first.status, Task.QUEUED)
+        self.assertEqual(run_tasks(), 'Processed 2 tasks.\n')
+        self.assertEqual(calls, ['a', 'b'])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), (Task.DONE, 1))
+
+    def test_idempotency_key(self):
+        """Test that a second enqueue with the same key returns the first task."""
+        first = record.enqueue(key='once', value='a')
+        second = record.enqueue(key='once', value='b')
+        self.assertEqual(first.pk, second.pk)
+        run_tasks()
+        # still deduplicated after the task has run
+        record.enqueue(key='once', value='c')
+        run_tasks()
+        self.assertEqual(calls, ['a'])
+
+    def test_delayed_task_waits(self):
+        """Test that a task is not run before its time."""
+        record.enqueue(delay=60, value='later')
+        run_tasks()
+        self.assertEqual(calls, [])
+
+    def test_unknown_task(self):
+        """Test that only registered functions can be queued."""
+        with self.assertRaises(LookupError):
+            enqueue(print)
+        with self.assertRaises(LookupError):
+            enqueue('no.such.task')
+
+    @override_settings(TASKQUEUE={'BACKOFF_BASE': 30, 'BACKOFF_MAX': 45})
+    def test_retries_with_backoff(self):
+        """Test that a failing task is retried later, then marked failed."""
+        failing = explode.enqueue()
+        with self.assertLogs('taskqueue.worker', 'WARNING'):
+            run_tasks()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.QUEUED, 1))
+        self.assertAlmostEqual(
+            (failing.run_at - timezone.now()).total_seconds(), 30, delta=5,
+        )
+        self.assertIn('ValueError: boom', failing.last_error)
+
+        with self.assertLogs('taskqueue.worker', 'WARNING') as logs:
+            for _ in range(2):
+                # make the retry due instead of waiting for it
+                Task.objects.filter(pk=failing.pk).update(run_at=timezone.now())
+                run_tasks()
+        self.assertIn('retrying in 45s', logs.output[0])  # capped by BACKOFF_MAX
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Task.FAILED, 3))
+
+    def test_lost_task_is_requeued(self):
+        """Test that a task whose worker died runs again after the lease."""
+        lost = record.enqueue(value='again')
+        Task.objects.filter(pk=lost.pk).update(
+            status=Task.RUNNING, attempts=1, started_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        with self.assertLogs('taskqueue.worker', 'WARNING'):
+            run_tasks()
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.attempts), (Task.DONE, 2))
+
+    def test_lost_task_on_last_attempt_fails(self):
+        """Test that a task that keeps losing its worker is not requeued forever."""
+        lost = record.enqueue(value='crash')
+        Task.objects.filter(pk=lost.pk).update(
+            status=Task.RUNNING, attempts=lost.max_attempts, started_at=timezone.now() - datetime.timedelta(hours=1),
+        )
+        with self.assertLogs('taskqueue.worker', 'ERROR'):
+            run_tasks()
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.attempts), (Task.FAILED, lost.max_attempts))
+        self.assertIn('worker went away', lost.last_error)
+
+    def test_claim_is_exclusive(self):
+        """Test that two workers never claim the same task."""
+        for i in range(3):
+            record.enqueue(value=i)
+        first, second = Worker(name='one'), Worker(name='two')
+        claimed = first.claim(2) + second.claim(2)
+        self.assertEqual(len(claimed), len(set(claimed)))
+        self.assertEqual(Task.objects.filter(worker='one').count(), 2)
+        self.assertEqual(Task.objects.filter(worker='two').count(), 1)
+
+
+class ThreadPoolTests(TransactionTestCase):
+    """Test suite for running tasks in the worker's thread pool."""
+
+    def test_thread_pool(self):
+        """Test that pooled tasks run and are recorded."""
+        calls.clear()
+        for i in range(5):
+            record.enqueue(value=i)
+        self.assertEqual(run_tasks(pool='thread', concurrency=1), 'Processed 5 tasks.\n')
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertFalse(Task.objects.exclude(status=Task.DONE).exists())
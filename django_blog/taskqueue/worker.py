@@ -0,0 +1,161 @@
+"""
+The task worker behind the run_tasks command.
+
+The worker's own thread polls for due tasks and claims each with a
+conditional UPDATE (``status = 'queued'``), so several workers can share
+one queue on any database. Claimed tasks run in a thread or process pool
+of ``concurrency`` slots; with a concurrency of 0 they run in the worker's
+thread, one at a time. A task left running longer than ``LEASE`` seconds
+(its worker died) is queued again, or failed if that was its last attempt.
+"""
+import datetime
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import pool
+from .models import Task
+from .queue import backoff, queue_setting, registry
+
+logger = logging.getLogger(__name__)
+
+# the end of a traceback is the useful part
+ERROR_LENGTH = 4000
+
+
+def execute(task_id):
+    """Run one claimed task and record the outcome."""
+    task = Task.objects.get(pk=task_id)
+    try:
+        func = registry.get(task.name)
+        if func is None:
+            raise LookupError(f'No task is registered as {task.name}')
+        func(**task.kwargs)
+    except Exception as exc:
+        error = ''.join(traceback.format_exception(exc))[-ERROR_LENGTH:]
+        now = timezone.now()
+        if task.attempts < task.max_attempts:
+            delay = backoff(task.attempts)
+            Task.objects.filter(pk=task_id).update(
+                status=Task.QUEUED, run_at=now + datetime.timedelta(seconds=delay), last_error=error,
+            )
+            logger.warning('Task %s #%d failed (attempt %d), retrying in %ss', task.name, task_id, task.attempts, delay)
+        else:
+            Task.objects.filter(pk=task_id).update(status=Task.FAILED, finished_at=now, last_error=error)
+            logger.error('Task %s #%d failed after %d attempts', task.name, task_id, task.attempts, exc_info=exc)
+        return False
+    Task.objects.filter(pk=task_id).update(status=Task.DONE, finished_at=timezone.now())
+    return True
+
+
+def execute_in_pool(task_id):
+    close_old_connections()
+    try:
+        return execute(task_id)
+    finally:
+        close_old_connections()
+
+
+class Worker:
+    def __init__(self, pool='thread', concurrency=4, name=None):
+        self.pool = pool
+        self.concurrency = concurrency
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.last_purge = None
+        self.processed = 0
+
+    def stop(self):
+        """Stop claiming tasks; the ones running are finished first."""
+        self.stopping.set()
+
+    def claim(self, limit):
+        """Mark up to ``limit`` due tasks as ours and return their ids."""
+        now = timezone.now()
+        due = Task.objects.filter(status=Task.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+        claimed = []
+        for pk in due.values_list('pk', flat=True)[:limit * 2]:
+            won = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+                status=Task.RUNNING, worker=self.name, started_at=now, attempts=F('attempts') + 1,
+            )
+            if won:
+                claimed.append(pk)
+                if len(claimed) == limit:
+                    break
+        return claimed
+
+    def housekeeping(self):
+        now = timezone.now()
+        stale = Task.objects.filter(
+            status=Task.RUNNING, started_at__lt=now - datetime.timedelta(seconds=queue_setting('LEASE')),
+        )
+        # a task that takes its worker down with it must not be retried forever
+        lost = stale.filter(attempts__gte=F('max_attempts')).update(
+            status=Task.FAILED, finished_at=now, last_error='The worker went away while running the task.',
+        )
+        if lost:
+            logger.error('Failed %d tasks whose worker went away on their last attempt', lost)
+        requeued = stale.update(status=Task.QUEUED, run_at=now)
+        if requeued:
+            logger.warning('Requeued %d tasks whose worker went away', requeued)
+        if self.last_purge is None or time.monotonic() - self.last_purge > 3600:
+            Task.objects.filter(
+                status__in=(Task.DONE, Task.FAILED),
+                finished_at__lt=now - datetime.timedelta(seconds=queue_setting('KEEP_FINISHED')),
+            ).delete()
+            self.last_purge = time.monotonic()
+
+    def run(self, burst=False):
+        """Work until stopped, or with ``burst`` until no task is due."""
+        if self.concurrency <= 0:
+            return self.run_inline(burst)
+        if self.pool == 'process':
+            executor = ProcessPoolExecutor(
+                self.concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=pool.setup,
+            )
+            target = pool.execute
+        else:
+            executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix='taskqueue')
+            target = execute_in_pool
+        running = set()
+        with executor:
+            while True:
+                if not running:
+                    self.housekeeping()
+                free = 0 if self.stopping.is_set() else self.concurrency - len(running)
+                claimed = self.claim(free) if free else []
+                running.update(executor.submit(target, pk) for pk in claimed)
+                if not running:
+                    if burst or self.stopping.is_set():
+                        break
+                    self.stopping.wait(queue_setting('POLL_INTERVAL'))
+                    continue
+                done, running = wait(running, timeout=queue_setting('POLL_INTERVAL'), return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.processed += 1
+                    if future.exception() is not None:
+                        # the task's own errors are recorded by execute()
+                        logger.error('Worker could not run a task', exc_info=future.exception())
+        return self.processed
+
+    def run_inline(self, burst):
+        while not self.stopping.is_set():
+            self.housekeeping()
+            claimed = self.claim(1)
+            if claimed:
+                execute(claimed[0])
+                self.processed += 1
+            elif burst:
+                break
+            else:
+                self.stopping.wait(queue_setting('POLL_INTERVAL'))
+        return self.processed